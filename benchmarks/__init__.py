@@ -0,0 +1,6 @@
+"""
+Бенчмарки расчета стоимости: синтетический прайс заданного размера, набор
+запросов, похожий на реальный трафик, и замер PricingEngine на SQLite/PostgreSQL.
+
+Запуск: python -m benchmarks.run --help
+"""
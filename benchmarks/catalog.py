@@ -0,0 +1,164 @@
+import random
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, List
+
+from sqlalchemy.orm import Session
+
+from src import models
+from src.bulk_loader import load_rows
+from src.price_catalog import publish_catalog_version, rebuild_base_price_lookup
+
+
+# Коды, которые принимает CalculateRequestSchema: на них приходится весь реальный трафик
+REQUEST_TECHS = ('panel', 'frame')
+REQUEST_BRANDS = ('izobel', 'neman_plus', 'technonicol')
+REQUEST_THICKNESSES = (100, 150, 200)
+STOREY_TYPES = ('one', 'mansard')
+CEILING_HEIGHTS = ('2.4', '2.5', '2.6', '2.7', '2.8', '3.0')
+RIDGE_DELTAS_CM = (10, 20, 30, 40, 50, 60)
+OVERHANGS_CM = (30, 40, 50)
+ADDON_CALC_MODES = ('AREA', 'RUN_M', 'PERIMETER', 'COUNT', 'ROOF_L_SIDES', 'M2_PER_HOUSE')
+WINDOW_TYPES = ('gluh', 'povorot', 'povorot_otkid')
+
+
+@dataclass(frozen=True)
+class CatalogSize:
+    """
+    Размер синтетического прайса. Матрица базовых цен - полное произведение
+    технологий, контуров, брендов, толщин, этажности и floor_no; дополнительные
+    бренды/толщины/контуры в запросы не попадают, но загружаются в снимок прайса.
+    """
+    addons: int
+    window_widths: int
+    window_heights: int
+    extra_brands: int
+    extra_thicknesses: int
+    contours: int
+    floors: int
+
+    @property
+    def base_price_rows(self) -> int:
+        return (len(REQUEST_TECHS) * self.contours * (len(REQUEST_BRANDS) + self.extra_brands)
+                * (len(REQUEST_THICKNESSES) + self.extra_thicknesses) * len(STOREY_TYPES) * self.floors)
+
+    @property
+    def window_prices(self) -> int:
+        return self.window_widths * self.window_heights * len(WINDOW_TYPES)
+
+
+CATALOG_SIZES = {
+    # Примерно как текущий прайс
+    "small": CatalogSize(addons=40, window_widths=8, window_heights=8, extra_brands=0, extra_thicknesses=0, contours=1, floors=1),
+    "medium": CatalogSize(addons=300, window_widths=20, window_heights=20, extra_brands=7, extra_thicknesses=4, contours=3, floors=3),
+    "large": CatalogSize(addons=3000, window_widths=40, window_heights=40, extra_brands=27, extra_thicknesses=12, contours=5, floors=6),
+}
+
+
+@dataclass(frozen=True)
+class SyntheticCatalog:
+    """Что было засеяно: коды и размеры, из которых генерируются запросы."""
+    size: CatalogSize
+    addon_codes: List[str]
+    window_widths: List[int]
+    window_heights: List[int]
+
+
+def _window_sizes(count: int) -> List[int]:
+    # Шаг 10 см начиная с 50: при count >= 6 в сетке есть стандартное окно 100×100
+    return list(range(50, 50 + 10 * count, 10))
+
+
+def describe_catalog(size: CatalogSize) -> SyntheticCatalog:
+    """Коды и размеры синтетического прайса без обращения к БД (для генерации запросов)."""
+    return SyntheticCatalog(
+        size=size,
+        addon_codes=[f'ADDON_{i:05d}' for i in range(size.addons)],
+        window_widths=_window_sizes(size.window_widths),
+        window_heights=_window_sizes(size.window_heights),
+    )
+
+
+def _add_references(db: Session, model: Any, column: str, values: List[Any]) -> Dict[Any, int]:
+    rows = [model(**{column: value}) if column == 'mm' else model(code=value, title=str(value)) for value in values]
+    db.add_all(rows)
+    db.flush()
+    return {getattr(row, column): row.id for row in rows}
+
+
+def seed_synthetic_catalog(db: Session, size: CatalogSize, seed: int = 0) -> SyntheticCatalog:
+    """
+    Заполняет пустую БД синтетическим прайсом и публикует версию каталога.
+    Строки матриц грузятся через load_rows (COPY в PostgreSQL). Коммитит сам.
+    """
+    rnd = random.Random(seed)
+    synthetic = describe_catalog(size)
+
+    tech_ids = _add_references(db, models.BuildTechnology, 'code', list(REQUEST_TECHS))
+    storey_ids = _add_references(db, models.StoreyType, 'code', list(STOREY_TYPES))
+    contour_ids = _add_references(db, models.Contour, 'code', ['warm'] + [f'contour_{i}' for i in range(1, size.contours)])
+    brand_ids = _add_references(
+        db, models.InsulationBrand, 'code', list(REQUEST_BRANDS) + [f'brand_{i}' for i in range(size.extra_brands)])
+    thickness_ids = _add_references(
+        db, models.InsulationThickness, 'mm', list(REQUEST_THICKNESSES) + [250 + 50 * i for i in range(size.extra_thicknesses)])
+    floors = [None] + list(range(2, size.floors + 1))
+
+    base_rows = [
+        {
+            'tech_id': tech_id, 'contour_id': contour_id, 'brand_id': brand_id, 'thickness_id': thickness_id,
+            'storey_type_id': storey_id, 'floor_no': floor_no, 'frame_thickness_mm': None,
+            'price_rub': Decimal(rnd.randrange(8000, 30000, 50)),
+        }
+        for tech_id in tech_ids.values()
+        for contour_id in contour_ids.values()
+        for brand_id in brand_ids.values()
+        for thickness_id in thickness_ids.values()
+        for storey_id in storey_ids.values()
+        for floor_no in floors
+    ]
+    load_rows(db, models.BasePriceM2.__table__, base_rows)
+
+    db.add_all(
+        [models.CeilingHeightPrice(height_m=Decimal(h), price_per_m2=Decimal(100 * i)) for i, h in enumerate(CEILING_HEIGHTS)]
+        + [models.RidgeHeightPrice(ridge_height_m=Decimal('1.5') + Decimal(d) / 10, price_per_m2=Decimal(5 * d)) for d in RIDGE_DELTAS_CM]
+        + [models.RoofOverhangPrice(overhang_cm=cm, price_per_m2=Decimal(5 * cm)) for cm in OVERHANGS_CM]
+        + [models.PartitionPrice(type=t, price_per_pm=Decimal(p)) for t, p in (('plain', 1000), ('insul50', 1500), ('insul100', 2000))]
+        + [models.WindowModifier(two_chambers=two, laminated=lam, multiplier=Decimal(m))
+           for two, lam, m in ((False, False, '1.0'), (True, False, '1.2'), (False, True, '1.3'), (True, True, '1.6'))]
+        + [models.DeliveryRule(free_km=100, rate_per_km=Decimal('120'))]
+    )
+
+    addon_rows = []
+    for i, code in enumerate(synthetic.addon_codes):
+        calc_mode = ADDON_CALC_MODES[i % len(ADDON_CALC_MODES)]
+        params = {'sides': 2, 'reserve_m': 1.5} if calc_mode == 'ROOF_L_SIDES' else {}
+        addon_rows.append({
+            'code': code, 'title': f'Дополнение {i}', 'calc_mode': models.AddonCalcModeEnum[calc_mode],
+            'price': Decimal(rnd.randrange(50, 20000, 10)), 'params': params, 'active': True,
+        })
+    load_rows(db, models.Addon.__table__, addon_rows)
+
+    widths = synthetic.window_widths
+    heights = synthetic.window_heights
+    window_rows = [
+        {'width_cm': w, 'height_cm': h, 'type': models.WindowTypeEnum(t),
+         'base_price_rub': Decimal(w * h // 2 + 1000 * k)}
+        for w in widths for h in heights for k, t in enumerate(WINDOW_TYPES)
+    ]
+    load_rows(db, models.WindowBasePrice.__table__, window_rows)
+
+    db.add_all([
+        models.StdInclusion(
+            tech_id=tech_id, contour_id=contour_id, storey_type_id=storey_id,
+            included_window_width_cm=100, included_window_height_cm=100, included_window_type='povorot_otkid',
+            area_to_qty=[{"max_m2": 36, "qty": 2}, {"max_m2": 60, "qty": 3}, {"max_m2": 9999, "qty": 4}],
+        )
+        for tech_id in tech_ids.values()
+        for contour_id in contour_ids.values()
+        for storey_id in storey_ids.values()
+    ])
+    db.flush()
+    rebuild_base_price_lookup(db)
+    db.commit()
+    publish_catalog_version(db)
+    return synthetic
@@ -0,0 +1,327 @@
+"""
+Нагрузочный прогон HTTP API: записанные (или сгенерированные) запросы /calculate
+отправляются на локальный uvicorn с фиксированной частотой (открытая модель)
+или N параллельными клиентами (закрытая модель).
+
+    # поднять uvicorn на SQLite с синтетическим прайсом и дать 200 запросов/с в течение 30 с
+    python -m benchmarks.replay --serve --rate 200 --duration 30
+
+    # 16 клиентов против уже запущенного сервиса, трафик из файла
+    python -m benchmarks.replay --url http://127.0.0.1:8000 --traffic traffic.jsonl --clients 16 --requests 20000
+
+Файл трафика - JSONL, в каждой строке тело запроса /calculate (или объект
+с этим телом в поле "payload"/"body"); остальные строки пропускаются.
+Работает без сети: только стандартная библиотека и локальный сервис.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+from benchmarks.catalog import CATALOG_SIZES, describe_catalog
+from benchmarks.request_mix import generate_payloads
+from benchmarks.stats import latency_summary
+
+CALCULATE_PATH = "/calculate"
+
+# Ширина столбца графика задержек (символов)
+CHART_WIDTH = 40
+
+
+@dataclass
+class Sample:
+    """Один запрос: момент отправки (от начала прогона), задержка и HTTP-статус (0 - ошибка соединения)."""
+    sent_at: float
+    latency: float
+    status: int
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+def load_payloads(path: str) -> List[bytes]:
+    """Читает тела запросов /calculate из JSONL; строки другого формата пропускаются."""
+    payloads = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and "house" not in record:
+                record = record.get("payload") or record.get("body")
+            if isinstance(record, dict) and "house" in record:
+                payloads.append(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+    return payloads
+
+
+class _HttpClient:
+    """Keep-alive соединение на поток; после ошибки соединение открывается заново."""
+
+    def __init__(self, url: str, timeout: float):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def post(self, path: str, body: bytes) -> int:
+        conn = self._connection()
+        try:
+            conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            return 0
+
+
+def run_open_loop(client: _HttpClient, payloads: Sequence[bytes], rate: float, count: int,
+                  max_in_flight: int = 256) -> tuple[List[Sample], float]:
+    """
+    Открытая модель: запрос i отправляется в момент i / rate независимо от ответов.
+    Задержка считается от запланированного момента, поэтому очередь при
+    перегрузке сервиса попадает в перцентили (без coordinated omission).
+    """
+    samples: List[Sample] = []
+    lock = threading.Lock()
+
+    def send(scheduled: float, body: bytes):
+        status = client.post(CALCULATE_PATH, body)
+        latency = time.perf_counter() - started - scheduled
+        with lock:
+            samples.append(Sample(scheduled, latency, status))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for i, body in zip(range(count), itertools.cycle(payloads)):
+            scheduled = i / rate
+            delay = scheduled - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, scheduled, body)
+    return samples, time.perf_counter() - started
+
+
+def run_closed_loop(client: _HttpClient, payloads: Sequence[bytes], clients: int,
+                    count: int) -> tuple[List[Sample], float]:
+    """Закрытая модель: clients потоков, каждый отправляет следующий запрос сразу после ответа."""
+    samples: List[Sample] = []
+    lock = threading.Lock()
+    indexes = itertools.count()
+
+    def worker():
+        local = []
+        while True:
+            i = next(indexes)
+            if i >= count:
+                break
+            sent = time.perf_counter()
+            status = client.post(CALCULATE_PATH, payloads[i % len(payloads)])
+            local.append(Sample(sent - started, time.perf_counter() - sent, status))
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples: Sequence[Sample], elapsed: float) -> Dict[str, Any]:
+    errors = sum(1 for s in samples if not s.ok)
+    return {
+        "requests": len(samples),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed > 0 else 0.0,
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "statuses": dict(sorted(Counter(s.status for s in samples).items())),
+        "latency_ms": latency_summary([s.latency for s in samples]),
+    }
+
+
+def latency_chart(samples: Sequence[Sample], max_rows: int = 30) -> str:
+    """
+    Задержка по ходу прогона в виде текста: строка на интервал времени,
+    длина столбца - p99 интервала относительно максимального p99.
+    """
+    if not samples:
+        return ""
+    duration = max(s.sent_at for s in samples)
+    step = max(duration / max_rows, 0.001)
+    windows: Dict[int, List[Sample]] = {}
+    for sample in samples:
+        windows.setdefault(min(int(sample.sent_at / step), max_rows - 1), []).append(sample)
+
+    rows = [(index * step, latency_summary([s.latency for s in group]), len(group),
+             sum(1 for s in group if not s.ok)) for index, group in sorted(windows.items())]
+    peak = max(summary["p99"] for _, summary, _, _ in rows) or 1.0
+    lines = [f"{'t, s':>8} | {'p99':<{CHART_WIDTH}} | p50 ms   p99 ms      n  err"]
+    for start, summary, n, errors in rows:
+        bar = "█" * max(1, round(summary["p99"] / peak * CHART_WIDTH))
+        lines.append(f"{start:8.2f} | {bar:<{CHART_WIDTH}} | {summary['p50']:7.2f} {summary['p99']:8.2f} {n:6d} {errors:4d}")
+    return "\n".join(lines)
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    latency = report["latency_ms"]
+    return "\n".join([
+        f"requests: {report['requests']} in {report['elapsed_s']} s, throughput {report['throughput_rps']} req/s",
+        f"errors: {report['errors']} ({report['error_rate']:.2%}), statuses: {report['statuses']}",
+        "latency ms: " + "  ".join(f"{key} {latency[key]:.2f}" for key in ("p50", "p95", "p99", "max")),
+    ])
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url: str, process: subprocess.Popen, timeout_s: float = 60) -> None:
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn завершился с кодом {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=1)
+            conn.request("GET", "/admin/catalog")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("uvicorn не ответил за отведенное время")
+
+
+def start_local_service(database_url: str, size_name: str, workers: int = 1) -> tuple[subprocess.Popen, str]:
+    """
+    Создает схему и синтетический прайс в database_url (SQLite-файл или
+    отдельная база PostgreSQL - таблицы пересоздаются) и запускает uvicorn.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from benchmarks.catalog import seed_synthetic_catalog
+    from src import models
+
+    engine = create_engine(database_url)
+    try:
+        models.Base.metadata.drop_all(bind=engine)
+        models.Base.metadata.create_all(bind=engine)
+        with Session(engine) as db:
+            seed_synthetic_catalog(db, CATALOG_SIZES[size_name])
+    finally:
+        engine.dispose()
+
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "DATABASE_URL": database_url}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        _wait_until_ready(url, process)
+    except Exception:
+        process.terminate()
+        raise
+    return process, url
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон /calculate")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="адрес уже запущенного сервиса, например http://127.0.0.1:8000")
+    target.add_argument("--serve", action="store_true", help="поднять локальный uvicorn с синтетическим прайсом")
+    parser.add_argument("--database-url", help="база для --serve (по умолчанию временный SQLite-файл; таблицы пересоздаются!)")
+    parser.add_argument("--workers", type=int, default=1, help="воркеры uvicorn для --serve")
+    parser.add_argument("--size", choices=sorted(CATALOG_SIZES), default="small", help="размер синтетического прайса")
+    parser.add_argument("--traffic", help="JSONL с телами запросов /calculate; без него запросы генерируются")
+    parser.add_argument("--record", help="сохранить сгенерированные запросы в JSONL для повторных прогонов")
+    parser.add_argument("--seed", type=int, default=0)
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--rate", type=float, help="открытая модель: запросов в секунду")
+    mode.add_argument("--clients", type=int, help="закрытая модель: число параллельных клиентов")
+    parser.add_argument("--requests", type=int, help="сколько запросов отправить")
+    parser.add_argument("--duration", type=float, help="длительность для --rate, с (вместо --requests)")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--json", dest="json_path", help="сохранить сводку в JSON")
+    args = parser.parse_args(argv)
+
+    if args.requests is None:
+        if args.rate and args.duration:
+            args.requests = int(args.rate * args.duration)
+        else:
+            parser.error("укажите --requests (или --duration вместе с --rate)")
+
+    if args.traffic:
+        payloads = load_payloads(args.traffic)
+        if not payloads:
+            parser.error(f"в {args.traffic} нет запросов /calculate")
+    else:
+        generated = generate_payloads(describe_catalog(CATALOG_SIZES[args.size]), min(args.requests, 10000), seed=args.seed)
+        payloads = [json.dumps(p, ensure_ascii=False).encode("utf-8") for p in generated]
+        if args.record:
+            with open(args.record, "w", encoding="utf-8") as f:
+                f.writelines(p.decode("utf-8") + "\n" for p in payloads)
+
+    process = None
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            if args.serve:
+                database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'replay.db')}"
+                process, url = start_local_service(database_url, args.size, args.workers)
+            else:
+                url = args.url
+            client = _HttpClient(url, args.timeout)
+            if args.rate:
+                samples, elapsed = run_open_loop(client, payloads, args.rate, args.requests)
+            else:
+                samples, elapsed = run_closed_loop(client, payloads, args.clients, args.requests)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+
+    report = summarize(samples, elapsed)
+    print(format_report(report))
+    print()
+    print(latency_chart(samples))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0 if report["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
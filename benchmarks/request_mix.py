@@ -0,0 +1,80 @@
+import random
+from typing import Any, Dict, List
+
+from src.schemas import CalculateRequestSchema
+
+from benchmarks.catalog import (
+    CEILING_HEIGHTS, OVERHANGS_CM, REQUEST_BRANDS, REQUEST_TECHS, REQUEST_THICKNESSES,
+    RIDGE_DELTAS_CM, WINDOW_TYPES, SyntheticCatalog,
+)
+
+
+def _weighted(rnd: random.Random, choices: Dict[Any, float]) -> Any:
+    return rnd.choices(list(choices), weights=list(choices.values()))[0]
+
+
+def generate_payload(rnd: random.Random, catalog: SyntheticCatalog) -> Dict[str, Any]:
+    """
+    Один запрос /calculate в виде JSON-словаря. Распределения подобраны под
+    типичный трафик: дома 6-12 м, чаще плоский потолок 2.5 м, 0-8 допов,
+    0-6 позиций окон; небольшая доля кодов и размеров, которых нет в прайсе.
+    """
+    ceiling_type = _weighted(rnd, {'flat': 0.7, 'rafters': 0.3})
+    ceiling = {
+        'type': ceiling_type,
+        'height_m': float(_weighted(rnd, {h: w for h, w in zip(CEILING_HEIGHTS, (3, 6, 2, 2, 1, 1))})),
+    }
+    if ceiling_type == 'flat' and rnd.random() < 0.3:
+        ceiling['ridge_delta_cm'] = rnd.choice(RIDGE_DELTAS_CM)
+
+    payload: Dict[str, Any] = {
+        'house': {'length_m': rnd.randrange(12, 25) / 2, 'width_m': rnd.randrange(12, 25) / 2},
+        'ceiling': ceiling,
+        'roof': {'overhang_cm': _weighted(rnd, {'std': 0.6, **{str(cm): 0.4 / len(OVERHANGS_CM) for cm in OVERHANGS_CM}})},
+        'insulation': {
+            'brand': rnd.choice(REQUEST_BRANDS),
+            'mm': rnd.choice(REQUEST_THICKNESSES),
+            'build_tech': _weighted(rnd, {t: w for t, w in zip(REQUEST_TECHS, (0.6, 0.4))}),
+        },
+        'delivery': {'distance_km': round(rnd.expovariate(1 / 120), 1)},
+        'commission_rub': rnd.choice((0, 0, 10000, 30000)),
+    }
+
+    if rnd.random() < 0.6:
+        payload['partitions'] = {'enabled': True, 'type': rnd.choice(('plain', 'insul50', 'insul100')), 'run_m': rnd.randrange(4, 40)}
+    else:
+        payload['partitions'] = {'enabled': False}
+
+    for section, probability in (('terrace', 0.3), ('porch', 0.4)):
+        if rnd.random() < probability:
+            payload[section] = {'primary': {'enabled': True, 'length_m': rnd.randrange(2, 13) / 2, 'width_m': rnd.randrange(2, 7) / 2}}
+
+    addons = []
+    for _ in range(min(rnd.randrange(0, 9), len(catalog.addon_codes))):
+        code = rnd.choice(catalog.addon_codes) if rnd.random() > 0.02 else 'UNKNOWN_ADDON'
+        addons.append({'code': code, 'quantity': rnd.randrange(1, 5)})
+    payload['addons'] = addons
+
+    windows = []
+    for _ in range(rnd.choice((0, 0, 1, 2, 3, 4, 5, 6))):
+        on_grid = rnd.random() > 0.03
+        windows.append({
+            'width_cm': rnd.choice(catalog.window_widths) if on_grid else 999,
+            'height_cm': rnd.choice(catalog.window_heights) if on_grid else 999,
+            'type': rnd.choice(WINDOW_TYPES),
+            'quantity': rnd.randrange(1, 4),
+            'dual_chamber': rnd.random() < 0.4,
+            'laminated': rnd.random() < 0.2,
+        })
+    payload['windows'] = windows
+    return payload
+
+
+def generate_payloads(catalog: SyntheticCatalog, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    return [generate_payload(rnd, catalog) for _ in range(count)]
+
+
+def generate_requests(catalog: SyntheticCatalog, count: int, seed: int = 0) -> List[CalculateRequestSchema]:
+    """Тот же набор, что generate_payloads, уже провалидированный схемой."""
+    return [CalculateRequestSchema.model_validate(payload) for payload in generate_payloads(catalog, count, seed)]
@@ -0,0 +1,25 @@
+import math
+from typing import Dict, Sequence
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Перцентиль q (0..100) по отсортированной выборке, с линейной интерполяцией."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return sorted_values[lower]
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def latency_summary(latencies_s: Sequence[float]) -> Dict[str, float]:
+    """Сводка задержек в миллисекундах: p50/p90/p95/p99/max/mean."""
+    values = sorted(latencies_s)
+    if not values:
+        return {"p50": 0.0, "p90": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0, "mean": 0.0}
+    summary = {f"p{q}": percentile(values, q) for q in (50, 90, 95, 99)}
+    summary["max"] = values[-1]
+    summary["mean"] = sum(values) / len(values)
+    return {key: round(value * 1000, 4) for key, value in summary.items()}
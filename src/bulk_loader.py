@@ -0,0 +1,150 @@
+import enum
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Boolean, Table, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.types import JSON
+
+
+# Размер пачки для executemany, когда COPY недоступен (SQLite, другие драйверы)
+BULK_LOAD_CHUNK_SIZE = int(os.getenv("BULK_LOAD_CHUNK_SIZE", "5000"))
+
+
+@dataclass
+class LoadReport:
+    """Итог одной загрузки: сколько строк, за сколько секунд и каким способом."""
+    table: str
+    rows: int
+    seconds: float
+    method: str
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "table": self.table,
+            "rows": self.rows,
+            "seconds": round(self.seconds, 4),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+            "method": self.method,
+        }
+
+
+def _csv_field(column_type: Any, value: Any) -> str:
+    """
+    Одно поле CSV для COPY: NULL - пустое поле без кавычек, всё остальное в кавычках
+    (в формате csv PostgreSQL значение в кавычках никогда не считается NULL).
+    """
+    if value is None:
+        return ''
+    if isinstance(column_type, JSON):
+        value = json.dumps(value, ensure_ascii=False)
+    elif isinstance(column_type, Boolean):
+        value = 't' if value else 'f'
+    elif isinstance(value, enum.Enum):
+        value = value.value
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def iter_csv_lines(table: Table, columns: Sequence[str], rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    types = [table.c[name].type for name in columns]
+    for row in rows:
+        yield ','.join(_csv_field(col_type, row.get(name)) for name, col_type in zip(columns, types)) + '\n'
+
+
+class _CsvStream:
+    """
+    Файлоподобный поток строк CSV для cursor.copy_expert: строки формируются
+    по мере чтения, весь набор данных в памяти не собирается.
+    """
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buffer = ''
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            chunk, self._buffer = self._buffer, ''
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def _copy_rows(db: Session, table: Table, columns: Sequence[str], rows: Iterable[Dict[str, Any]]) -> bool:
+    """
+    Загружает строки через COPY FROM STDIN в текущей транзакции сессии.
+    Возвращает False, если драйвер не поддерживает COPY.
+    """
+    dialect = db.get_bind().dialect
+    quote = dialect.identifier_preparer.quote
+    sql = (
+        f"COPY {dialect.identifier_preparer.format_table(table)} "
+        f"({', '.join(quote(name) for name in columns)}) FROM STDIN WITH (FORMAT csv)"
+    )
+    cursor = db.connection().connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2
+            cursor.copy_expert(sql, _CsvStream(iter_csv_lines(table, columns, rows)))
+        elif hasattr(cursor, 'copy'):
+            # psycopg 3
+            with cursor.copy(sql) as copy:
+                for line in iter_csv_lines(table, columns, rows):
+                    copy.write(line)
+        else:
+            return False
+    finally:
+        cursor.close()
+    return True
+
+
+def _chunks(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_rows(
+    db: Session,
+    table: Table,
+    rows: Sequence[Dict[str, Any]],
+    chunk_size: Optional[int] = None,
+) -> LoadReport:
+    """
+    Массовая вставка строк (у всех строк одинаковый набор колонок) в текущей
+    транзакции сессии, без ORM.
+
+    В PostgreSQL строки потоком уходят в COPY FROM STDIN; в остальных базах
+    (и если драйвер не умеет COPY) - executemany пачками по chunk_size строк.
+    """
+    started = time.perf_counter()
+    if not rows:
+        return LoadReport(table.name, 0, 0.0, "none")
+
+    columns = list(rows[0])
+    method = None
+    if db.get_bind().dialect.name == 'postgresql' and _copy_rows(db, table, columns, rows):
+        method = "copy"
+    if method is None:
+        method = "executemany"
+        statement = insert(table)
+        for chunk in _chunks(rows, chunk_size or BULK_LOAD_CHUNK_SIZE):
+            db.execute(statement, chunk)
+
+    return LoadReport(table.name, len(rows), time.perf_counter() - started, method)
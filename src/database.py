@@ -1,8 +1,21 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+import logging
 import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
 from dotenv import load_dotenv
 
+from src.pool_metrics import PoolStats, instrumented_pool_class
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
 # Загружаем переменные окружения из файла .env
 load_dotenv()
 
@@ -11,10 +24,114 @@ DATABASE_URL = os.getenv(
     "postgresql://user:password@db:5432/mydatabase"  # Значение по умолчанию для Docker
 )
 
-engine = create_engine(DATABASE_URL)
+# Асинхронные драйверы для тех же баз данных, что и синхронный DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# Настройки пула соединений (на один процесс uvicorn)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("true", "1", "yes")
+
+pool_stats = PoolStats("sync")
+async_pool_stats = PoolStats("async")
+
+
+def engine_options(url: str, stats: PoolStats, base_pool_class=QueuePool) -> dict:
+    """
+    Параметры create_engine с настройками пула из окружения.
+    Для SQLite оставляем пул по умолчанию: QueuePool-параметры к нему неприменимы.
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": instrumented_pool_class(base_pool_class, stats),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+# Запросы дольше порога (мс) пишутся в лог вместе с параметрами; 0 - не логировать
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+
+# Параметры медленного запроса в логе обрезаются до этой длины (executemany может передать тысячи строк)
+SLOW_QUERY_PARAMS_MAX_CHARS = 2000
+
+
+@dataclass
+class QueryStats:
+    """Количество и суммарное время SQL-запросов в рамках одного HTTP-запроса."""
+    count: int = 0
+    seconds: float = 0.0
+
+
+_current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Считает запросы к БД, выполненные внутри блока (в том числе в потоках
+    и задачах, запущенных из него - статистика передается через contextvars).
+    """
+    stats = QueryStats()
+    token = _current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_query_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = _current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        params = repr(parameters)
+        if len(params) > SLOW_QUERY_PARAMS_MAX_CHARS:
+            params = params[:SLOW_QUERY_PARAMS_MAX_CHARS] + "..."
+        logger.warning("Медленный запрос (%.1f мс): %s | параметры: %s", elapsed * 1000, statement, params)
+
+
+def instrument_queries(target_engine) -> None:
+    """Подключает к engine учет запросов (track_queries), лог медленных запросов и метрики."""
+    event.listen(target_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target_engine, "after_cursor_execute", _after_cursor_execute)
+    metrics.count_queries(target_engine)
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, pool_stats))
+pool_stats.attach(engine.pool)
+instrument_queries(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def create_schema(bind=None) -> None:
+    """
+    Создает недостающие таблицы. Вызывается при старте приложения (DB_CREATE_ALL)
+    или отдельным шагом перед выкаткой: python -m src.database create-schema
+    """
+    from src import models
+    models.Base.metadata.create_all(bind=bind or engine)
+
 # Dependency для получения сессии БД в эндпоинтах
 def get_db():
     db = SessionLocal()
@@ -22,3 +139,68 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def to_async_url(url: str) -> str:
+    """
+    Преобразует синхронный URL (postgresql://, sqlite://) в URL асинхронного драйвера.
+    Можно переопределить переменной окружения ASYNC_DATABASE_URL.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Асинхронный драйвер для '{backend}' не настроен")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# Асинхронный engine создается лениво: sqlalchemy.ext.asyncio и драйвер
+# (asyncpg/aiosqlite) импортируются только когда асинхронный путь используется
+_async_engine = None
+_async_session_factory = None
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            **engine_options(ASYNC_DATABASE_URL, async_pool_stats, AsyncAdaptedQueuePool)
+        )
+        async_pool_stats.attach(_async_engine.sync_engine.pool)
+        instrument_queries(_async_engine.sync_engine)
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        _async_session_factory = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _async_session_factory()
+
+
+# Dependency для получения асинхронной сессии БД в эндпоинтах
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_pool_stats() -> dict:
+    """Состояние и счетчики пулов соединений для мониторинга."""
+    stats = {"sync": pool_stats.snapshot()}
+    if _async_engine is not None:
+        stats["async"] = async_pool_stats.snapshot()
+    return stats
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["create-schema"]:
+        sys.exit("Использование: python -m src.database create-schema")
+    create_schema()
+    print(f"Схема создана: {make_url(DATABASE_URL).render_as_string(hide_password=True)}")
@@ -0,0 +1,55 @@
+"""
+Быстрая сериализация ответов API в JSON.
+
+dumps дает те же байты, что JSONResponse FastAPI (json.dumps с
+ensure_ascii=False и компактными разделителями, UTF-8), но через orjson,
+который пишет UTF-8 сразу и в разы быстрее. Без orjson используется json.
+"""
+import json
+import re
+from typing import Any
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson - необязательная зависимость
+    orjson = None
+
+
+# orjson пишет экспоненту иначе, чем json (1e-6 вместо 1e-06, 1e16 вместо 1e+16),
+# числа от 1e-5 до 1e-4 - без экспоненты (0.000025 вместо 2.5e-05), а NaN/Infinity -
+# как null, тогда как JSONResponse на них падает. Цены и площади в таких числах
+# почти не встречаются; если встретились (или такой текст есть в строке) - ответ
+# пересобирается через json
+_MISMATCH = re.compile(rb'e[-0-9]|(?<![0-9])0\.0000')
+
+
+def _dumps_stdlib(content: Any) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON ответа: байт в байт как JSONResponse(content).body."""
+    if orjson is None:
+        return _dumps_stdlib(content)
+    try:
+        data = orjson.dumps(content)
+    except TypeError:
+        # Типы, которых нет у orjson (или ключи не-строки) - пусть решает json
+        return _dumps_stdlib(content)
+    if b'null' in data or _MISMATCH.search(data):
+        return _dumps_stdlib(content)
+    return data
+
+
+class RawJSONResponse(Response):
+    """Ответ из уже сериализованного JSON (bytes), например из кэша расчетов."""
+    media_type = "application/json"
+
+
+class FastJSONResponse(RawJSONResponse):
+    """JSONResponse, сериализующий содержимое через dumps."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
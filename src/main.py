@@ -1,62 +1,268 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
 
-from src.schemas import CalculateRequestSchema, CalculateResponseSchema
-from src.database import get_db, engine
-from src import models
-from src.pricing_engine import PricingEngine
-from src.sync_service import sync_google_sheets_to_db
+from typing import Any, List, Union
+
+from fastapi import FastAPI, Depends, HTTPException, Body, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from src.schemas import (
+    CalculateRequestSchema,
+    CalculateResponseSchema,
+    CalculateSectionsResponseSchema,
+    CalculateTotalsResponseSchema,
+    BatchCalculateResponseSchema,
+    DetailLevel,
+)
+from src.database import get_pool_stats, SessionLocal, track_queries, create_schema
+from src import metrics
+from src.pricing_engine import PricingEngine, AsyncPricingEngine
+from src.price_catalog import PriceCatalog, catalog_store, get_catalog, ensure_base_price_lookup
+from src.quote_cache import quote_cache
+from src.json_response import RawJSONResponse, dumps
+from src.sync_jobs import sync_jobs
+
+logger = logging.getLogger(__name__)
+
+# Создавать недостающие таблицы при старте воркера. В продакшене схему создает
+# отдельный шаг (python -m src.database create-schema), и здесь ставится false
+DB_CREATE_ALL = os.getenv("DB_CREATE_ALL", "true").lower() in ("true", "1", "yes")
+
+# Загрузить снимок прайса сразу после старта: до загрузки /ready отвечает 503
+CATALOG_WARMUP = os.getenv("CATALOG_WARMUP", "true").lower() in ("true", "1", "yes")
+
+# Как часто (в секундах) воркер проверяет, не опубликована ли новая версия прайса
+CATALOG_POLL_INTERVAL_S = float(os.getenv("CATALOG_POLL_INTERVAL_S", "5"))
+
+# Как часто (в секундах) проверять, изменились ли листы Google Sheets, и
+# синхронизировать изменившиеся; 0 - выключено. Включайте в одном процессе
+SYNC_SCHEDULE_INTERVAL_S = float(os.getenv("SYNC_SCHEDULE_INTERVAL_S", "0"))
+
+# Максимальное количество расчетов в одном запросе /calculate/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+# Режим отладки: ответы содержат заголовки X-DB-Query-Count и X-DB-Time-Ms
+APP_DEBUG = os.getenv("APP_DEBUG", "false").lower() in ("true", "1", "yes")
+
+async_pricing_engine = AsyncPricingEngine(catalog_store, cache=quote_cache)
+
+
+def _prepare_database() -> None:
+    if DB_CREATE_ALL:
+        create_schema()
+    db = SessionLocal()
+    try:
+        ensure_base_price_lookup(db)
+    finally:
+        db.close()
+
+
+async def _warm_up() -> None:
+    try:
+        await catalog_store.get_async()
+    except Exception:
+        # /ready отвечает 503, пока снимок не загрузится при первом расчете или опросе версий
+        logger.exception("Не удалось загрузить прайс при старте")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Подготовка БД - в потоке, чтобы не блокировать event loop
+    await asyncio.to_thread(_prepare_database)
+    warmup = asyncio.create_task(_warm_up()) if CATALOG_WARMUP else None
+    catalog_store.start_polling(CATALOG_POLL_INTERVAL_S)
+    sync_jobs.start_schedule(SYNC_SCHEDULE_INTERVAL_S)
+    yield
+    if warmup is not None:
+        warmup.cancel()
+    sync_jobs.stop_schedule()
+    catalog_store.stop_polling()
 
-# Эта строка создаст таблицы в БД при первом запуске, если их нет
-models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="imm0rtal | Калькулятор стоимости каркасного дома",
-    version="1.1.0"
+    version="1.1.0",
+    lifespan=lifespan
 )
 
-@app.post("/calculate", response_model=CalculateResponseSchema, summary="Рассчитать стоимость")
-def calculate(request: CalculateRequestSchema, db: Session = Depends(get_db)):
+
+if APP_DEBUG:
+    @app.middleware("http")
+    async def db_query_headers(request: Request, call_next):
+        """Количество и суммарное время SQL-запросов, выполненных при обработке запроса."""
+        with track_queries() as stats:
+            response = await call_next(request)
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.seconds * 1000:.2f}"
+        return response
+
+@app.get("/ready", summary="Готовность воркера принимать расчеты")
+def ready():
+    """
+    200, когда воркер запущен и снимок прайса загружен (при CATALOG_WARMUP=true);
+    503, пока прайс загружается. Используется как readiness-проба балансировщика.
+    Готовность следует за снимком: если прогрев не удался, воркер станет готов,
+    как только прайс загрузит первый расчет или опрос версий.
+    """
+    catalog = catalog_store.peek()
+    if CATALOG_WARMUP and catalog is None:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", "catalog_version": catalog.version if catalog is not None else None}
+
+
+@app.post("/calculate",
+          response_model=Union[CalculateResponseSchema, CalculateSectionsResponseSchema, CalculateTotalsResponseSchema],
+          response_class=RawJSONResponse, summary="Рассчитать стоимость")
+async def calculate(
+    request: CalculateRequestSchema,
+    detail: DetailLevel = Query('full', description=(
+        "Объем ответа: full - полная разбивка, sections - итоги по разделам без строк "
+        "Дополнения и Стандартные_окна, totals - только Итоговая_стоимость"
+    )),
+):
     """
     Эндпоинт для расчета стоимости дома.
     
     Принимает параметры дома и возвращает детальный расчет.
+    Цены берутся из снимка прайса в памяти, сессия БД не открывается.
+    Обработчик асинхронный: расчет занимает микросекунды и не занимает пул потоков.
+    Ответ собирается без валидации и сериализуется через orjson (response_model
+    остается для схемы OpenAPI); повторяющиеся конфигурации отдаются из кэша
+    готовым JSON (ключ - запрос + версия прайса).
+
+    Конфигураторам, пересчитывающим цену на каждое движение ползунка, достаточно
+    detail=totals или detail=sections: строки разбивки и тексты Расчёт тогда
+    не строятся вовсе.
     """
-    engine = PricingEngine()
-    response = engine.calculate_total(db, request)
-    return response
+    return RawJSONResponse(await async_pricing_engine.calculate_json(request, detail))
 
-@app.post("/admin/sync-prices", summary="Синхронизировать цены из Google Sheets")
-def sync_prices(db: Session = Depends(get_db)):
+@app.post("/calculate/batch", response_model=BatchCalculateResponseSchema, response_class=RawJSONResponse,
+          summary="Пакетный расчет стоимости")
+def calculate_batch(
+    requests: List[Any] = Body(..., description="Список параметров в формате CalculateRequestSchema"),
+    detail: DetailLevel = Query('full', description=(
+        "Объем результатов, как в /calculate; totals считается векторно по всему пакету"
+    )),
+    catalog: PriceCatalog = Depends(get_catalog)
+):
     """
-    Административный эндпоинт для синхронизации данных из Google Sheets в базу данных.
+    Эндпоинт для пакетного пересчета (например, ночной перерасчет лидов в CRM).
     
-    Этот эндпоинт:
-    1. Подключается к Google Sheets (KM_ADM_TABLE)
-    2. Читает данные из следующих листов:
-       - addons
-       - window_base_prices
-       - window_modifiers
-       - doors
-       - delivery_rules
-    3. Очищает соответствующие таблицы в БД
-    4. Загружает новые данные из Google Sheets
-    
-    Требуется файл gspread_credentials.json с учетными данными сервисного аккаунта Google.
+    Все элементы считаются по одной версии прайса. Результаты возвращаются
+    в том же порядке; ошибка в элементе (в том числе элемент - не объект)
+    не прерывает пакет и возвращается в поле Ошибка этого элемента.
+    Каждый элемент валидируется один раз, ответ собирается без валидации
+    (как в /calculate; response_model - для схемы OpenAPI).
+
+    Для ночного перерасчета достаточно detail=totals: итоги всех корректных
+    элементов считаются одним векторным проходом (VectorizedPricingEngine).
     """
-    try:
-        sync_google_sheets_to_db(db)
-        return {
-            "status": "success",
-            "message": "Синхронизация данных из Google Sheets завершена успешно"
-        }
-    except FileNotFoundError as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Ошибка: файл учетных данных не найден. Убедитесь, что файл gspread_credentials.json существует. {str(e)}"
-        )
-    except Exception as e:
+    if len(requests) > MAX_BATCH_SIZE:
         raise HTTPException(
-            status_code=500,
-            detail=f"Ошибка при синхронизации: {str(e)}"
+            status_code=413,
+            detail=f"Слишком большой пакет: {len(requests)} элементов, максимум {MAX_BATCH_SIZE}"
         )
+    engine = PricingEngine()
+    return RawJSONResponse(dumps({
+        "Версия_прайса": catalog.version,
+        "Результаты": engine.calculate_batch(catalog, requests, detail),
+    }))
+
+@app.get("/admin/catalog", summary="Текущая версия прайса")
+def catalog_info(catalog: PriceCatalog = Depends(get_catalog)):
+    """
+    Возвращает версию и хэш содержимого снимка прайса, с которым работает воркер.
+    """
+    return {
+        "version": catalog.version,
+        "content_hash": catalog.content_hash
+    }
+
+@app.get("/admin/quote-cache", summary="Статистика кэша расчетов")
+def quote_cache_stats():
+    """
+    Возвращает счетчики кэша расчетов: попадания, промахи, вытеснения, размер.
+    """
+    return quote_cache.stats()
+
+@app.get("/admin/db-pool", summary="Статистика пула соединений БД")
+def db_pool_stats():
+    """
+    Возвращает состояние пулов соединений (занято, overflow) и счетчики:
+    выдачи, таймауты, открытые/закрытые соединения, гистограмму ожидания.
+    """
+    return get_pool_stats()
+
+
+def _pool_gauges():
+    return {
+        (("engine", stats["engine"]), ("counter", key)): stats[key]
+        for stats in get_pool_stats().values()
+        for key in ("checkouts", "timeouts", "checked_out")
+        if stats.get(key) is not None
+    }
+
+
+def _quote_cache_gauges():
+    stats = quote_cache.stats()
+    return {(("counter", key),): stats[key] for key in ("hits", "misses", "entries", "evictions") if key in stats}
+
+
+metrics.registry.register_collector("db_pool", "Счетчики пула соединений БД", _pool_gauges)
+metrics.registry.register_collector("quote_cache", "Счетчики кэша расчетов", _quote_cache_gauges)
+
+
+@app.get("/metrics", summary="Метрики в формате Prometheus", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Время и количество запросов к БД по этапам расчета (pricing_stage_*),
+    счетчики пула соединений и кэша расчетов в текстовом формате Prometheus.
+    """
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/admin/sync-prices", status_code=202, summary="Запустить синхронизацию цен из Google Sheets")
+def sync_prices():
+    """
+    Запускает синхронизацию данных из Google Sheets в базу данных в фоне и
+    сразу возвращает ID задания; прогресс - GET /admin/sync-jobs/{job_id}.
+
+    Синхронизация:
+    1. Подключается к Google Sheets (KM_ADM_TABLE) и читает все листы
+    2. Сравнивает строки листов с таблицами БД по естественному ключу
+    3. Записывает только вставки, изменения и удаления (с журналом в price_audit)
+    4. Если что-то изменилось, публикует новую версию прайса; воркеры подменяют снимок в фоне
+
+    Одновременно выполняется одна синхронизация: запрос, пришедший до начала
+    чтения листов, объединяется с ней (merged=true), а пришедший позже - со
+    следующей в очереди, которая прочитает листы заново.
+    Требуется файл gspread_credentials.json с учетными данными сервисного аккаунта Google.
+    """
+    job, merged = sync_jobs.submit()
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "merged": merged,
+        "requests": job.requests,
+        "status_url": f"/admin/sync-jobs/{job.id}",
+    }
+
+
+@app.get("/admin/sync-jobs", summary="Последние задания синхронизации")
+def list_sync_jobs():
+    return sync_jobs.jobs()
+
+
+@app.get("/admin/sync-jobs/{job_id}", summary="Прогресс задания синхронизации")
+def get_sync_job(job_id: str):
+    """
+    Статус задания (queued, running, succeeded, failed), текущий этап
+    (fetching, writing, publishing) и прогресс по листам: прочитано,
+    преобразовано и отклонено строк, вставки/изменения/удаления, время этапов,
+    ошибки. После завершения - полный отчет синхронизации в поле report.
+    """
+    job = sync_jobs.snapshot(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Задание синхронизации {job_id} не найдено")
+    return job
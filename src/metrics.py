@@ -0,0 +1,254 @@
+import bisect
+import functools
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+# Метрики расчета (этапы PricingEngine, эндпоинт /metrics); METRICS_ENABLED=false отключает их полностью
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Границы корзин по умолчанию (секунды) - от долей миллисекунды до секунд
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами (кумулятивно, как в Prometheus).
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def cumulative_counts(self) -> List[int]:
+        """Количество наблюдений <= каждой границы; последний элемент - +Inf."""
+        with self._lock:
+            counts = list(self._counts)
+        total = 0
+        cumulative = []
+        for count in counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+    def snapshot(self) -> Dict[str, object]:
+        cumulative = self.cumulative_counts()
+        labels = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "count": self._count,
+            "sum": round(self._sum, 6),
+            "buckets": dict(zip(labels, cumulative)),
+        }
+
+
+class Counter:
+    """Монотонный счетчик."""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class MetricFamily:
+    """
+    Метрика с метками: по дочерней метрике (Counter/Histogram) на каждый набор
+    значений меток. Дочерние метрики создаются при первом обращении и кэшируются.
+    """
+
+    def __init__(self, name: str, help_text: str, kind: str, labelnames: Sequence[str], factory: Callable[[], Any]):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Any:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def children(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса с выводом в текстовом формате Prometheus.
+    Помимо счетчиков и гистограмм принимает collectors - функции, которые при
+    выводе возвращают текущие значения (gauge) из других модулей.
+    """
+
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._collectors: List[Tuple[str, str, Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]]] = []
+        self._lock = threading.Lock()
+
+    def _family(self, name: str, help_text: str, kind: str, labelnames: Sequence[str], factory: Callable[[], Any]) -> MetricFamily:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(name, help_text, kind, labelnames, factory)
+            return family
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._family(name, help_text, 'counter', labelnames, Counter)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> MetricFamily:
+        return self._family(name, help_text, 'histogram', labelnames, lambda: Histogram(buckets))
+
+    def register_collector(self, name: str, help_text: str,
+                           collect: Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]) -> None:
+        """collect() возвращает {((метка, значение), ...): значение} для gauge-метрики name."""
+        with self._lock:
+            self._collectors = [c for c in self._collectors if c[0] != name] + [(name, help_text, collect)]
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            families = list(self._families.values())
+            collectors = list(self._collectors)
+        for family in families:
+            lines.append(f'# HELP {family.name} {family.help}')
+            lines.append(f'# TYPE {family.name} {family.kind}')
+            for values, child in family.children():
+                if family.kind == 'counter':
+                    lines.append(f'{family.name}_total{_format_labels(family.labelnames, values)} {_format_number(child.value)}')
+                    continue
+                bounds = list(child.buckets) + [float('inf')]
+                for bound, count in zip(bounds, child.cumulative_counts()):
+                    le = _format_number(bound)
+                    lines.append(f'{family.name}_bucket{_format_labels(family.labelnames, values, ("le", le))} {count}')
+                lines.append(f'{family.name}_sum{_format_labels(family.labelnames, values)} {_format_number(child.sum)}')
+                lines.append(f'{family.name}_count{_format_labels(family.labelnames, values)} {child.count}')
+        for name, help_text, collect in collectors:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in collect().items():
+                names = [label for label, _ in labels]
+                values = [label_value for _, label_value in labels]
+                lines.append(f'{name}{_format_labels(names, values)} {_format_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Запросы к БД в текущем потоке: счетчик увеличивает хук engine в src/database.py.
+# Этапы расчета синхронные, поэтому разница счетчика до и после этапа - его запросы.
+class _ThreadQueries(threading.local):
+    count = 0
+
+
+_thread_queries = _ThreadQueries()
+
+
+def record_query() -> None:
+    _thread_queries.count += 1
+
+
+def thread_query_count() -> int:
+    return _thread_queries.count
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    record_query()
+
+
+def count_queries(engine) -> None:
+    """Подключает подсчет запросов к engine (если метрики включены)."""
+    if METRICS_ENABLED:
+        event.listen(engine, "after_cursor_execute", _count_query)
+
+
+# Корзины для этапов расчета: этапы идут в памяти и укладываются в микросекунды
+STAGE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25)
+
+registry = MetricsRegistry()
+
+
+def instrument_methods(cls: type, stages: Dict[str, str], duration: MetricFamily, queries: MetricFamily) -> None:
+    """
+    Оборачивает методы класса (этап -> имя метода) замером времени и количества
+    запросов к БД. Обертки ставятся один раз на класс: если метрики выключены,
+    instrument_methods не вызывается и методы остаются без изменений.
+    """
+    for stage, method_name in stages.items():
+        method = getattr(cls, method_name)
+        if getattr(method, '__instrumented_stage__', None) is not None:
+            if method_name in cls.__dict__:
+                continue
+            # Метод унаследован от уже размеченного класса - размечаем исходный
+            method = method.__wrapped__
+        setattr(cls, method_name, _timed_method(method, duration.labels(stage), queries.labels(stage), stage))
+
+
+def _timed_method(method: Callable, histogram: Histogram, counter: Counter, stage: str) -> Callable:
+    perf_counter = time.perf_counter
+    queries = _thread_queries
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        queries_before = queries.count
+        started = perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            histogram.observe(perf_counter() - started)
+            executed = queries.count - queries_before
+            if executed:
+                counter.inc(executed)
+
+    wrapper.__instrumented_stage__ = stage
+    return wrapper
@@ -13,6 +13,7 @@ from sqlalchemy import (
     BigInteger,
     Text,
     UniqueConstraint,
+    Index,
     CheckConstraint,
     func
 )
@@ -97,6 +98,30 @@ class BasePriceM2(Base):
     #                      name='uniq_base_price'),
     # )
 
+class BasePriceLookup(Base):
+    """
+    Плоская копия base_price_m2 с кодами справочников вместо ID.
+    Пересобирается из base_price_m2 при синхронизации (rebuild_base_price_lookup),
+    вручную не редактируется.
+    """
+    __tablename__ = 'base_price_lookup'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # ID исходной строки base_price_m2 (без FK: строки base_price_m2 удаляются до пересборки)
+    base_price_id = Column(Integer, nullable=False)
+    build_tech = Column(Text, nullable=False)
+    brand = Column(Text)
+    mm = Column(Integer)
+    storey_type_code = Column(Text, nullable=False)
+    contour_code = Column(Text, nullable=False)
+    floor_no = Column(SmallInteger)
+    frame_thickness_mm = Column(SmallInteger)
+    price_rub = Column(Numeric(12, 2), nullable=False)
+
+    __table_args__ = (
+        Index('uniq_base_price_lookup', 'build_tech', 'brand', 'mm', 'storey_type_code', 'contour_code',
+              'floor_no', 'frame_thickness_mm', unique=True, postgresql_nulls_not_distinct=True),
+    )
+
 # 3) Dedicated price tables
 class CeilingHeightPrice(Base):
     __tablename__ = 'ceiling_height_prices'
@@ -217,9 +242,27 @@ class GlobalDefault(Base):
 # 11) Audit
 class PriceAudit(Base):
     __tablename__ = 'price_audit'
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
     entity = Column(Text, nullable=False)
     entity_id = Column(BigInteger, nullable=False)
     action = Column(Text, nullable=False)
     changed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     payload = Column(JSON, nullable=False)
+
+# 12) Catalog versions
+class CatalogVersion(Base):
+    __tablename__ = 'catalog_versions'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    content_hash = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+# 13) Sheet checksums of the last successful sync, per source (change-detected scheduled sync)
+class SheetChecksum(Base):
+    __tablename__ = 'sheet_checksums'
+    # SheetSource.source_id: 'google:KM_ADM_TABLE', 'xlsx:/path/file.xlsx', 'csv:/path/folder'
+    source = Column(Text, primary_key=True)
+    sheet = Column(Text, primary_key=True)
+    checksum = Column(Text, nullable=False)
+    # Drive modifiedTime of the spreadsheet the checksum was confirmed at (None - unknown)
+    revision = Column(Text)
+    synced_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
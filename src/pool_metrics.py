@@ -0,0 +1,84 @@
+import threading
+import time
+from typing import Any, Dict, Type
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool
+
+from src.metrics import Histogram
+
+
+class PoolStats:
+    """
+    Счетчики пула соединений одного engine: выдачи, ожидание свободного
+    соединения (гистограмма), таймауты и оборот соединений (открыто/закрыто).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wait_seconds = Histogram()
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._pool: Pool | None = None
+
+    def _incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def attach(self, pool: Pool) -> None:
+        """Подписывается на события пула. События переживают pool.recreate()."""
+        self._pool = pool
+        event.listen(pool, "connect", lambda *args: self._incr("connects"))
+        event.listen(pool, "close", lambda *args: self._incr("closes"))
+        event.listen(pool, "close_detached", lambda *args: self._incr("closes"))
+        event.listen(pool, "checkout", lambda *args: self._incr("checkouts"))
+        event.listen(pool, "checkin", lambda *args: self._incr("checkins"))
+        event.listen(pool, "invalidate", lambda *args: self._incr("invalidations"))
+
+    def snapshot(self) -> Dict[str, Any]:
+        pool = self._pool
+        state: Dict[str, Any] = {"pool_class": type(pool).__name__ if pool is not None else None}
+        # QueuePool сообщает размер и overflow; у SQLite-пулов этих методов может не быть
+        for key, method in (("size", "size"), ("checked_in", "checkedin"), ("checked_out", "checkedout"), ("overflow", "overflow")):
+            fn = getattr(pool, method, None)
+            state[key] = fn() if callable(fn) else None
+        if state["overflow"] is not None:
+            state["overflow_in_use"] = max(state["overflow"], 0)
+        return {
+            "engine": self.name,
+            **state,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "closes": self.closes,
+            "invalidations": self.invalidations,
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
+
+
+def instrumented_pool_class(base: Type[Pool], stats: PoolStats) -> Type[Pool]:
+    """
+    Возвращает подкласс пула, который меряет время получения соединения
+    (ожидание в очереди или создание нового) и считает таймауты.
+    """
+
+    class InstrumentedPool(base):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            except exc.TimeoutError:
+                stats._incr("timeouts")
+                raise
+            finally:
+                stats.wait_seconds.observe(time.perf_counter() - start)
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    InstrumentedPool.__qualname__ = InstrumentedPool.__name__
+    return InstrumentedPool
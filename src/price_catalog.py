@@ -0,0 +1,592 @@
+import asyncio
+import enum
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import dataclass, fields, is_dataclass
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from src import models
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AddonEntry:
+    code: str
+    title: str
+    calc_mode: str
+    price: Decimal
+    params: Mapping[str, Any]
+
+
+@dataclass(frozen=True)
+class PartitionEntry:
+    type: str
+    price_per_pm: Decimal
+
+
+@dataclass(frozen=True)
+class StdInclusionEntry:
+    window_width_cm: int
+    window_height_cm: int
+    window_type: str
+    area_to_qty: Any
+
+
+def height_key(value: Any) -> Decimal:
+    """
+    Нормализует высоту (потолка/конька) к ключу с одним знаком после запятой,
+    как в колонках Numeric(3, 1).
+    """
+    return Decimal(str(value)).quantize(Decimal('0.1'))
+
+
+def _enum_value(value: Any) -> Any:
+    return getattr(value, 'value', value)
+
+
+def _canonical(value: Any) -> Any:
+    """Приводит содержимое каталога к детерминированному JSON-совместимому виду."""
+    if isinstance(value, Mapping):
+        return sorted([_canonical(k), _canonical(v)] for k, v in value.items())
+    if is_dataclass(value):
+        return [_canonical(getattr(value, f.name)) for f in fields(value)]
+    if isinstance(value, (tuple, list)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def latest_catalog_version(db: Session) -> Optional[models.CatalogVersion]:
+    return db.query(models.CatalogVersion).order_by(models.CatalogVersion.id.desc()).first()
+
+
+def latest_catalog_version_id(db: Session) -> int:
+    return db.query(func.max(models.CatalogVersion.id)).scalar() or 0
+
+
+# --- Загрузка разделов прайса. Каждая функция читает свою группу таблиц и
+# возвращает именованные аргументы для конструктора PriceCatalog.
+
+def rebuild_base_price_lookup(db: Session) -> int:
+    """
+    Пересобирает base_price_lookup из base_price_m2 и справочников в текущей
+    транзакции (один DELETE и один INSERT ... SELECT на стороне БД).
+    При дублях по ключу остается строка с меньшим ID. Возвращает число строк.
+    """
+    price = models.BasePriceM2
+    lookup = models.BasePriceLookup.__table__
+    first_ids = select(func.min(price.id).label('id')).group_by(
+        price.tech_id, price.contour_id, price.brand_id, price.thickness_id,
+        price.storey_type_id, price.floor_no, price.frame_thickness_mm,
+    ).subquery()
+    source = select(
+        price.id,
+        models.BuildTechnology.code,
+        models.InsulationBrand.code,
+        models.InsulationThickness.mm,
+        models.StoreyType.code,
+        models.Contour.code,
+        price.floor_no,
+        price.frame_thickness_mm,
+        price.price_rub,
+    ).join_from(
+        first_ids, price, price.id == first_ids.c.id
+    ).join(
+        models.BuildTechnology, price.tech_id == models.BuildTechnology.id
+    ).join(
+        models.StoreyType, price.storey_type_id == models.StoreyType.id
+    ).join(
+        models.Contour, price.contour_id == models.Contour.id
+    ).outerjoin(
+        models.InsulationBrand, price.brand_id == models.InsulationBrand.id
+    ).outerjoin(
+        models.InsulationThickness, price.thickness_id == models.InsulationThickness.id
+    )
+    db.execute(lookup.delete())
+    db.execute(insert(lookup).from_select(
+        ['base_price_id', 'build_tech', 'brand', 'mm', 'storey_type_code', 'contour_code',
+         'floor_no', 'frame_thickness_mm', 'price_rub'],
+        source,
+    ))
+    return db.scalar(select(func.count()).select_from(lookup))
+
+
+def ensure_base_price_lookup(db: Session) -> bool:
+    """
+    Собирает base_price_lookup, если она пуста, а base_price_m2 - нет
+    (первый запуск после обновления, до первой синхронизации). Коммитит сам.
+    """
+    if db.scalar(select(models.BasePriceLookup.id).limit(1)) is not None:
+        return False
+    if db.scalar(select(models.BasePriceM2.id).limit(1)) is None:
+        return False
+    rebuild_base_price_lookup(db)
+    db.commit()
+    return True
+
+
+def _load_base_prices(db: Session) -> Dict[str, Any]:
+    # Одна таблица без JOIN-ов; строки без бренда или толщины не участвуют в расчете
+    lookup = models.BasePriceLookup
+    base_prices = {}
+    base_rows = db.query(
+        lookup.build_tech,
+        lookup.brand,
+        lookup.mm,
+        lookup.storey_type_code,
+        lookup.contour_code,
+        lookup.price_rub,
+    ).filter(
+        lookup.brand.isnot(None), lookup.mm.isnot(None)
+    ).order_by(lookup.base_price_id).all()
+    for tech, brand, mm, storey, contour, price in base_rows:
+        base_prices.setdefault((tech, brand, mm, storey, contour), price)
+    return {'base_prices': base_prices}
+
+
+def _load_roof_prices(db: Session) -> Dict[str, Any]:
+    ceiling_height_prices = {}
+    for row in db.query(models.CeilingHeightPrice).order_by(models.CeilingHeightPrice.id):
+        ceiling_height_prices.setdefault(height_key(row.height_m), row.price_per_m2)
+
+    ridge_height_prices = {}
+    for row in db.query(models.RidgeHeightPrice).order_by(models.RidgeHeightPrice.id):
+        ridge_height_prices.setdefault(height_key(row.ridge_height_m), row.price_per_m2)
+
+    roof_overhang_prices = {}
+    for row in db.query(models.RoofOverhangPrice).order_by(models.RoofOverhangPrice.id):
+        roof_overhang_prices.setdefault(row.overhang_cm, row.price_per_m2)
+
+    return {
+        'ceiling_height_prices': ceiling_height_prices,
+        'ridge_height_prices': ridge_height_prices,
+        'roof_overhang_prices': roof_overhang_prices,
+    }
+
+
+def _load_partition_prices(db: Session) -> Dict[str, Any]:
+    partition_prices = {}
+    for row in db.query(models.PartitionPrice).order_by(models.PartitionPrice.id):
+        type_value = _enum_value(row.type)
+        partition_prices.setdefault(type_value, PartitionEntry(type=type_value, price_per_pm=row.price_per_pm))
+    return {'partition_prices': partition_prices}
+
+
+def _load_addons(db: Session) -> Dict[str, Any]:
+    addons = {}
+    for row in db.query(models.Addon).order_by(models.Addon.id):
+        addons.setdefault(row.code, AddonEntry(
+            code=row.code,
+            title=row.title,
+            calc_mode=row.calc_mode.name,
+            price=row.price,
+            params=MappingProxyType(dict(row.params or {})),
+        ))
+    return {'addons': addons}
+
+
+def _load_windows(db: Session) -> Dict[str, Any]:
+    window_base_prices = {}
+    for row in db.query(models.WindowBasePrice).order_by(models.WindowBasePrice.id):
+        key = (row.width_cm, row.height_cm, _enum_value(row.type))
+        window_base_prices.setdefault(key, row.base_price_rub)
+
+    window_modifiers = {}
+    for row in db.query(models.WindowModifier).order_by(models.WindowModifier.id):
+        window_modifiers.setdefault((bool(row.two_chambers), bool(row.laminated)), row.multiplier)
+
+    std_inclusions = {}
+    std_rows = db.query(
+        models.BuildTechnology.code,
+        models.Contour.code,
+        models.StoreyType.code,
+        models.StdInclusion,
+    ).join(
+        models.BuildTechnology, models.StdInclusion.tech_id == models.BuildTechnology.id
+    ).join(
+        models.Contour, models.StdInclusion.contour_id == models.Contour.id
+    ).join(
+        models.StoreyType, models.StdInclusion.storey_type_id == models.StoreyType.id
+    ).order_by(models.StdInclusion.id).all()
+    for tech, contour, storey, row in std_rows:
+        std_inclusions.setdefault((tech, contour, storey), StdInclusionEntry(
+            window_width_cm=row.included_window_width_cm,
+            window_height_cm=row.included_window_height_cm,
+            window_type=_enum_value(row.included_window_type),
+            area_to_qty=row.area_to_qty,
+        ))
+
+    return {
+        'window_base_prices': window_base_prices,
+        'window_modifiers': window_modifiers,
+        'std_inclusions': std_inclusions,
+    }
+
+
+CATALOG_SECTIONS = (
+    _load_base_prices,
+    _load_roof_prices,
+    _load_partition_prices,
+    _load_addons,
+    _load_windows,
+)
+
+
+class PriceCatalog:
+    """
+    Неизменяемый снимок всех прайсовых таблиц, проиндексированный по кодам.
+
+    Загружается из БД один раз (см. PriceCatalog.load) и далее используется
+    PricingEngine без обращений к базе данных.
+    """
+
+    __slots__ = (
+        'base_prices',
+        'ceiling_height_prices',
+        'ridge_height_prices',
+        'roof_overhang_prices',
+        'partition_prices',
+        'addons',
+        'window_base_prices',
+        'window_modifiers',
+        'std_inclusions',
+        'window_unit_prices',
+        'version',
+        'content_hash',
+    )
+
+    # Производные индексы, которые строятся из основных таблиц и не входят в хэш содержимого
+    _DERIVED = ('window_unit_prices', 'version', 'content_hash')
+
+    def __init__(
+        self,
+        base_prices: Dict[Tuple[str, str, int, str, str], Decimal],
+        ceiling_height_prices: Dict[Decimal, Decimal],
+        ridge_height_prices: Dict[Decimal, Decimal],
+        roof_overhang_prices: Dict[int, Decimal],
+        partition_prices: Dict[str, PartitionEntry],
+        addons: Dict[str, AddonEntry],
+        window_base_prices: Dict[Tuple[int, int, str], Decimal],
+        window_modifiers: Dict[Tuple[bool, bool], Decimal],
+        std_inclusions: Dict[Tuple[str, str, str], StdInclusionEntry],
+        version: int = 0,
+    ):
+        # (build_tech, brand, mm, storey_type_code, contour_code) -> цена за м²
+        object.__setattr__(self, 'base_prices', MappingProxyType(dict(base_prices)))
+        object.__setattr__(self, 'ceiling_height_prices', MappingProxyType(dict(ceiling_height_prices)))
+        object.__setattr__(self, 'ridge_height_prices', MappingProxyType(dict(ridge_height_prices)))
+        object.__setattr__(self, 'roof_overhang_prices', MappingProxyType(dict(roof_overhang_prices)))
+        object.__setattr__(self, 'partition_prices', MappingProxyType(dict(partition_prices)))
+        object.__setattr__(self, 'addons', MappingProxyType(dict(addons)))
+        # (width_cm, height_cm, type) -> базовая цена окна
+        object.__setattr__(self, 'window_base_prices', MappingProxyType(dict(window_base_prices)))
+        # (two_chambers, laminated) -> multiplier
+        object.__setattr__(self, 'window_modifiers', MappingProxyType(dict(window_modifiers)))
+        # (build_tech, contour_code, storey_type_code) -> стандартное включение
+        object.__setattr__(self, 'std_inclusions', MappingProxyType(dict(std_inclusions)))
+        # Готовая сетка цен окна за штуку: (width_cm, height_cm, type, two_chambers, laminated) -> цена
+        object.__setattr__(self, 'window_unit_prices', MappingProxyType(self._build_window_unit_prices()))
+        # Монотонный номер версии из catalog_versions (0 - версия ещё не публиковалась)
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'content_hash', self._compute_content_hash())
+
+    def _build_window_unit_prices(self) -> Dict[Tuple[int, int, str, bool, bool], float]:
+        """
+        Перемножает базовые цены окон на все комбинации модификаторов один раз
+        при загрузке, чтобы расчет окон был одним поиском в словаре на строку.
+        Если комбинации модификаторов нет в прайсе, используется множитель 1.0.
+        """
+        multipliers = {}
+        for two_chambers in (False, True):
+            for laminated in (False, True):
+                modifier = self.window_modifiers.get((two_chambers, laminated))
+                multipliers[(two_chambers, laminated)] = float(modifier) if modifier is not None else 1.0
+
+        unit_prices = {}
+        for (width_cm, height_cm, window_type), base_price in self.window_base_prices.items():
+            for (two_chambers, laminated), multiplier in multipliers.items():
+                unit_prices[(width_cm, height_cm, window_type, two_chambers, laminated)] = float(base_price) * multiplier
+        return unit_prices
+
+    def _compute_content_hash(self) -> str:
+        content = {name: _canonical(getattr(self, name)) for name in self.__slots__ if name not in self._DERIVED}
+        payload = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PriceCatalog is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("PriceCatalog is immutable")
+
+    @classmethod
+    def empty(cls) -> "PriceCatalog":
+        return cls({}, {}, {}, {}, {}, {}, {}, {}, {})
+
+    @classmethod
+    def load(cls, db: Session) -> "PriceCatalog":
+        """
+        Читает все прайсовые таблицы и строит индексированный снимок.
+        При дублях по ключу выигрывает первая строка (как .first() в старых запросах).
+        """
+        version = latest_catalog_version_id(db)
+        sections = {}
+        for load_section in CATALOG_SECTIONS:
+            sections.update(load_section(db))
+        return cls(version=version, **sections)
+
+    @classmethod
+    async def load_async(cls, session_factory: Callable[[], Any], max_attempts: int = 3) -> "PriceCatalog":
+        """
+        Асинхронная загрузка: разделы прайса (база, кровля, перегородки, допы, окна)
+        читаются параллельно, каждый в своей AsyncSession.
+
+        Так как разделы читаются в разных соединениях, номер версии проверяется
+        до и после загрузки; если за это время опубликована новая версия,
+        загрузка повторяется, чтобы не собрать снимок из разных версий.
+        Если версия менялась во всех max_attempts попытках, снимок читается
+        последовательно в одной транзакции (begin_snapshot), как в load.
+        """
+        async def run(fn):
+            async with session_factory() as session:
+                return await session.run_sync(fn)
+
+        for _ in range(max_attempts):
+            version = await run(latest_catalog_version_id)
+            results = await asyncio.gather(*(run(load_section) for load_section in CATALOG_SECTIONS))
+            if await run(latest_catalog_version_id) == version:
+                break
+        else:
+            return await run(lambda db: cls.load(begin_snapshot(db)))
+        sections = {}
+        for result in results:
+            sections.update(result)
+        return cls(version=version, **sections)
+
+    # --- Точечные поиски, используемые PricingEngine ---
+
+    def base_price(self, build_tech: str, brand: str, mm: int, storey_type_code: str, contour_code: str) -> Optional[Decimal]:
+        return self.base_prices.get((build_tech, brand, mm, storey_type_code, contour_code))
+
+    def ceiling_height_price(self, height_m: Any) -> Optional[Decimal]:
+        return self.ceiling_height_prices.get(height_key(height_m))
+
+    def ridge_height_price(self, ridge_height_m: Any) -> Optional[Decimal]:
+        return self.ridge_height_prices.get(height_key(ridge_height_m))
+
+    def roof_overhang_price(self, overhang_cm: int) -> Optional[Decimal]:
+        return self.roof_overhang_prices.get(overhang_cm)
+
+    def partition_price(self, partition_type: str) -> Optional[PartitionEntry]:
+        return self.partition_prices.get(partition_type)
+
+    def addon(self, code: str) -> Optional[AddonEntry]:
+        return self.addons.get(code)
+
+    def window_base_price(self, width_cm: int, height_cm: int, window_type: str) -> Optional[Decimal]:
+        return self.window_base_prices.get((width_cm, height_cm, window_type))
+
+    def window_modifier(self, two_chambers: bool, laminated: bool) -> Optional[Decimal]:
+        return self.window_modifiers.get((two_chambers, laminated))
+
+    def window_unit_price(self, width_cm: int, height_cm: int, window_type: str, two_chambers: bool, laminated: bool) -> Optional[float]:
+        """Цена окна за штуку с учетом модификатора или None, если размера нет в прайсе."""
+        return self.window_unit_prices.get((width_cm, height_cm, window_type, two_chambers, laminated))
+
+    def std_inclusion(self, build_tech: str, contour_code: str, storey_type_code: str) -> Optional[StdInclusionEntry]:
+        return self.std_inclusions.get((build_tech, contour_code, storey_type_code))
+
+
+def begin_snapshot(db: Session) -> Session:
+    """
+    Начинает транзакцию сессии как один согласованный снимок БД.
+
+    В PostgreSQL это REPEATABLE READ: все SELECT загрузки прайса видят одно и то же
+    состояние, даже если синхронизация закоммитит новую версию посреди загрузки,
+    и при этом не ждут писателя. SQLite и так не видит чужие незакоммиченные
+    изменения, а синхронизация пишет всё одной транзакцией.
+    """
+    if db.get_bind().dialect.name == 'postgresql':
+        db.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+    return db
+
+
+def publish_catalog_version(db: Session, commit: bool = True) -> models.CatalogVersion:
+    """
+    Публикует новую версию каталога после синхронизации цен.
+
+    Вызывается в той же транзакции, что и запись таблиц: строка версии
+    коммитится вместе с данными, поэтому номер версии всегда соответствует
+    содержимому. Если содержимое прайса не изменилось (совпадает хэш), новая
+    версия не создаётся и возвращается последняя опубликованная.
+    С commit=False коммит остаётся за вызывающим (строка версии только flush-ится).
+    """
+    content_hash = PriceCatalog.load(db).content_hash
+    latest = latest_catalog_version(db)
+    if latest is not None and latest.content_hash == content_hash:
+        return latest
+
+    version = models.CatalogVersion(content_hash=content_hash)
+    db.add(version)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return version
+
+
+class CatalogStore:
+    """
+    Держит текущий снимок PriceCatalog процесса.
+
+    Снимок загружается лениво при первом обращении. Новые версии, которые
+    публикует синхронизация, собираются в фоне и подменяются целиком
+    (присваивание ссылки атомарно), поэтому запросы в полёте досчитываются
+    на той версии, с которой начали.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], async_session_factory: Optional[Callable[[], Any]] = None):
+        self._session_factory = session_factory
+        self._async_session_factory = async_session_factory
+        self._catalog: Optional[PriceCatalog] = None
+        self._lock = threading.Lock()
+        self._async_lock: Optional[asyncio.Lock] = None
+        self._refreshing = threading.Lock()
+        self._stop = threading.Event()
+        self._poller: Optional[threading.Thread] = None
+
+    def get(self) -> PriceCatalog:
+        catalog = self._catalog
+        if catalog is not None:
+            return catalog
+        with self._lock:
+            if self._catalog is None:
+                self._catalog = self._load()
+            return self._catalog
+
+    def peek(self) -> Optional[PriceCatalog]:
+        """Текущий снимок без загрузки: None, если прайс еще не загружен."""
+        return self._catalog
+
+    async def get_async(self) -> PriceCatalog:
+        """
+        Асинхронный вариант get(): при холодном старте снимок загружается через
+        асинхронный engine, не блокируя event loop и пул потоков.
+        """
+        catalog = self._catalog
+        if catalog is not None:
+            return catalog
+        if self._async_session_factory is None:
+            return await asyncio.to_thread(self.get)
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            if self._catalog is None:
+                self._swap(await PriceCatalog.load_async(self._async_session_factory))
+            return self._catalog
+
+    def _load(self) -> PriceCatalog:
+        db = self._session_factory()
+        try:
+            return PriceCatalog.load(begin_snapshot(db))
+        finally:
+            db.close()
+
+    def _swap(self, catalog: PriceCatalog) -> PriceCatalog:
+        with self._lock:
+            # Не откатываемся на более старую версию, если фоновые сборки обогнали друг друга
+            if self._catalog is None or catalog.version >= self._catalog.version:
+                self._catalog = catalog
+            return self._catalog
+
+    def reload(self, db: Session) -> PriceCatalog:
+        """Перечитывает снимок из переданной сессии (после синхронизации цен)."""
+        return self._swap(PriceCatalog.load(db))
+
+    def set(self, catalog: PriceCatalog) -> None:
+        with self._lock:
+            self._catalog = catalog
+
+    def refresh(self) -> bool:
+        """
+        Проверяет, опубликована ли более новая версия, и если да - собирает
+        новый снимок и подменяет текущий. Возвращает True, если снимок заменён.
+        """
+        if not self._refreshing.acquire(blocking=False):
+            # Сборка уже идёт в другом потоке
+            return False
+        try:
+            db = self._session_factory()
+            try:
+                begin_snapshot(db)
+                latest_id = latest_catalog_version_id(db)
+                current = self._catalog
+                if current is not None and latest_id <= current.version:
+                    return False
+                catalog = PriceCatalog.load(db)
+            finally:
+                db.close()
+            return self._swap(catalog) is catalog
+        finally:
+            self._refreshing.release()
+
+    def refresh_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.refresh, name="catalog-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def start_polling(self, interval_s: float) -> None:
+        """Запускает фоновый поток, который раз в interval_s секунд проверяет новую версию."""
+        if self._poller is not None or interval_s <= 0:
+            return
+        self._stop.clear()
+
+        def _poll():
+            while not self._stop.wait(interval_s):
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception("Catalog refresh failed")
+
+        self._poller = threading.Thread(target=_poll, name="catalog-poller", daemon=True)
+        self._poller.start()
+
+    def stop_polling(self) -> None:
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join(timeout=5)
+            self._poller = None
+
+
+def _default_session_factory() -> Session:
+    from src.database import SessionLocal
+    return SessionLocal()
+
+
+def _default_async_session_factory():
+    from src.database import AsyncSessionLocal
+    return AsyncSessionLocal()
+
+
+catalog_store = CatalogStore(_default_session_factory, _default_async_session_factory)
+
+
+def get_catalog() -> PriceCatalog:
+    """Dependency для получения текущего снимка прайса в эндпоинтах."""
+    return catalog_store.get()
+
+
+async def get_catalog_async() -> PriceCatalog:
+    """Dependency для асинхронных эндпоинтов."""
+    return await catalog_store.get_async()
@@ -1,27 +1,61 @@
 import math
-from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Sequence
+from pydantic import ValidationError
 from src.schemas import (
     CalculateRequestSchema,
     CalculateResponseSchema,
-    GabaritySchema,
-    OknaIDveriSchema,
-    KonstruktivSchema,
-    ItogovayaStoimostSchema,
-    DopolneniyaItem,
-    StandardWindowItem
+    DetailLevel,
 )
-from src import models
+from src.price_catalog import PriceCatalog, CatalogStore
+from src import json_response, metrics
+
+
+WINDOW_TYPE_TITLES = {
+    'gluh': 'глухое',
+    'povorot': 'поворотное',
+    'povorot_otkid': 'поворотно-откидное'
+}
+
+
+def _batch_error(index: int, kind: str, message: str, details: Any = None) -> Dict[str, Any]:
+    """Элемент пакета с ошибкой (поля и типы BatchCalculateItemSchema)."""
+    return {"Индекс": index, "Результат": None, "Ошибка": {"Тип": kind, "Сообщение": message, "Детали": details}}
+
+
+def _addon_item(code: str, title: str, calc: str, cost: float) -> Dict[str, Any]:
+    """Строка раздела Дополнения (поля и типы DopolneniyaItem)."""
+    return {"Код": code, "Наименование": title, "Расчёт": calc, "Сумма_руб": float(cost)}
 
 
 class PricingEngine:
     """
     Основной класс для расчёта стоимости проекта на основе бизнес-логики.
+
+    Ответ собирается без валидации: calculate_document возвращает обычные
+    dict/list/float/str в порядке и с типами полей CalculateResponseSchema
+    (готово к сериализации в JSON), calculate_total - ту же структуру,
+    провалидированную в CalculateResponseSchema.
+
+    Методы разделов возвращают (стоимость, строки разбивки); с with_details=False
+    строки (и тексты Расчёт) не строятся - так считаются сокращенные ответы
+    calculate_document(detail='sections' | 'totals').
     """
 
-    def calculate_total(self, db: Session, req: CalculateRequestSchema) -> CalculateResponseSchema:
+    def calculate_total(self, catalog: PriceCatalog, req: CalculateRequestSchema) -> CalculateResponseSchema:
+        """Рассчитывает полную стоимость проекта (см. calculate_document) в виде CalculateResponseSchema."""
+        return CalculateResponseSchema.model_validate(self.calculate_document(catalog, req))
+
+    def calculate_document(self, catalog: PriceCatalog, req: CalculateRequestSchema,
+                           detail: DetailLevel = 'full') -> Dict[str, Any]:
         """
         Рассчитывает полную стоимость проекта, вызывая все необходимые под-расчеты.
+        Все цены берутся из снимка прайса catalog, обращений к БД нет.
+        Возвращает ответ в виде dict без валидации по схеме, соответствующей detail:
+        CalculateResponseSchema ('full'), CalculateSectionsResponseSchema ('sections')
+        или CalculateTotalsResponseSchema ('totals').
         """
+        with_details = detail == 'full'
+
         # --- 0. Предварительные расчеты (Обозначения) ---
         A_house = req.house.length_m * req.house.width_m
         
@@ -41,25 +75,25 @@ class PricingEngine:
                 A_porch += (req.porch.extra.length_m or 0) * (req.porch.extra.width_m or 0)
         
         # --- 1. Базовая цена ---
-        base_price = self._get_base_price(db, req, A_house)
+        base_price = self._get_base_price(catalog, req, A_house)
 
         # --- 2. Дополнения ---
         # 2.1 Потолки, конёк, вынос крыши (отдельные таблицы)
-        roof_costs, roof_details = self._calculate_roof_costs(db, req, A_house)
+        roof_costs, roof_details = self._calculate_roof_costs(catalog, req, A_house, with_details)
 
         # 2.2 Перегородки (отдельная таблица)
-        partitions_cost, partitions_details = self._calculate_partitions_cost(db, req)
+        partitions_cost, partitions_details = self._calculate_partitions_cost(catalog, req, with_details)
         
         # 2.3 Прочие "допы" (используем существующий метод _calculate_generic_addons_cost)
-        generic_addons_cost, generic_addons_details = self._calculate_generic_addons_cost(db, req, A_house)
+        generic_addons_cost, generic_addons_details = self._calculate_generic_addons_cost(catalog, req, A_house, with_details)
 
         all_addons_details = roof_details + partitions_details + generic_addons_details
         
         # --- 3. Окна и двери ---
-        windows_cost, windows_details = self._calculate_windows_price(db, req)
+        windows_cost, windows_details = self._calculate_windows_price(catalog, req, with_details)
         # Применяем логику замещения: вычитаем стоимость стандартных окон только если выбраны новые окна
         if req.windows and len(req.windows) > 0:
-            replacement_delta = self._handle_replacements(db, req, A_house)
+            replacement_delta = self._handle_replacements(catalog, req, A_house)
             windows_cost_after_replacement = windows_cost - replacement_delta
         else:
             # Если окна не выбраны, стандартные остаются (уже включены в базовую цену)
@@ -68,8 +102,7 @@ class PricingEngine:
         windows_doors_cost = windows_cost_after_replacement + doors_cost
 
         # --- 4. Доставка ---
-        delivery_cost = self._get_delivery_price(db, req)
-        delivery_cost_with_details, delivery_details = self._calculate_delivery_cost(db, req)
+        delivery_cost, delivery_details = self._calculate_delivery_cost(catalog, req, with_details)
         if delivery_details:
             all_addons_details.append(delivery_details)
 
@@ -82,35 +115,113 @@ class PricingEngine:
         final_price = subtotal + commission_rub
 
         # --- 6. Сборка ответа ---
-        response = CalculateResponseSchema(
-            Габариты=GabaritySchema(
-                Площадь_теплого_контура_м2=A_house,
-                Площадь_террас_м2=A_terrace,
-                Площадь_крылец_м2=A_porch,
-                Высота_потолка_м=req.ceiling.height_m,
-                Тип_потолка=req.ceiling.type,
-                Повышение_конька_см=req.ceiling.ridge_delta_cm or 0,
-                Вынос_крыши=req.roof.overhang_cm,
-            ),
-            Окна_и_двери=OknaIDveriSchema(
-                Стандартные_окна=windows_details,
-                Двери=doors_details,
-                Итого_по_разделу_руб=round(windows_doors_cost, 2)
-            ),
-            Конструктив=KonstruktivSchema(
-                База_руб=round(base_price, 2),
-                Дополнения=all_addons_details,
-                Доставка_руб=round(delivery_cost, 2)
-            ),
-            Итоговая_стоимость=ItogovayaStoimostSchema(
-                Итого_без_комиссии_руб=round(subtotal, 2),
-                Комиссия_руб=round(commission_rub, 2),
-                Окончательная_цена_руб=round(final_price, 2),
-            )
+        return self._build_response(
+            catalog, req, A_house, A_terrace, A_porch, base_price, all_addons_details,
+            windows_details, doors_details, windows_doors_cost, delivery_cost, subtotal, commission_rub, final_price,
+            detail, roof_costs + partitions_cost + generic_addons_cost,
         )
-        return response
 
-    def _get_base_price(self, db: Session, req: CalculateRequestSchema, A_house: float) -> float:
+    def _build_response(self, catalog: PriceCatalog, req: CalculateRequestSchema, A_house: float, A_terrace: float,
+                        A_porch: float, base_price: float, all_addons_details: list, windows_details: list,
+                        doors_details: list, windows_doors_cost: float, delivery_cost: float, subtotal: float,
+                        commission_rub: float, final_price: float, detail: DetailLevel = 'full',
+                        addons_cost: float = 0.0) -> Dict[str, Any]:
+        """
+        Сборка ответа из результатов этапов (отдельный метод - отдельный этап в метриках).
+        Числа приводятся к типам полей схемы (float/int), как это сделала бы валидация.
+        """
+        totals = {
+            "Итого_без_комиссии_руб": float(round(subtotal, 2)),
+            "Комиссия_руб": float(round(commission_rub, 2)),
+            "Окончательная_цена_руб": float(round(final_price, 2)),
+        }
+        if detail == 'totals':
+            return {"Итоговая_стоимость": totals, "Версия_прайса": catalog.version}
+
+        dimensions = {
+            "Площадь_теплого_контура_м2": float(A_house),
+            "Площадь_террас_м2": float(A_terrace),
+            "Площадь_крылец_м2": float(A_porch),
+            "Высота_потолка_м": float(req.ceiling.height_m),
+            "Тип_потолка": req.ceiling.type,
+            "Повышение_конька_см": int(req.ceiling.ridge_delta_cm or 0),
+            "Вынос_крыши": req.roof.overhang_cm,
+        }
+        if detail == 'sections':
+            return {
+                "Габариты": dimensions,
+                "Окна_и_двери": {"Итого_по_разделу_руб": float(round(windows_doors_cost, 2))},
+                "Конструктив": {
+                    "База_руб": float(round(base_price, 2)),
+                    "Дополнения_руб": float(round(addons_cost, 2)),
+                    "Доставка_руб": float(round(delivery_cost, 2)),
+                },
+                "Итоговая_стоимость": totals,
+                "Версия_прайса": catalog.version,
+            }
+
+        return {
+            "Габариты": dimensions,
+            "Окна_и_двери": {
+                "Стандартные_окна": windows_details,
+                "Двери": doors_details,
+                "Итого_по_разделу_руб": float(round(windows_doors_cost, 2)),
+            },
+            "Конструктив": {
+                "База_руб": float(round(base_price, 2)),
+                "Дополнения": all_addons_details,
+                "Доставка_руб": float(round(delivery_cost, 2)),
+            },
+            "Итоговая_стоимость": totals,
+            "Версия_прайса": catalog.version,
+        }
+
+    def calculate_batch(self, catalog: PriceCatalog, payloads: Sequence[Any],
+                        detail: DetailLevel = 'full') -> List[Dict[str, Any]]:
+        """
+        Пакетный расчет: все элементы считаются по одному снимку прайса.
+
+        Возвращает элементы BatchCalculateItemSchema в виде dict без валидации
+        (Результат - calculate_document с уровнем detail). Ошибка валидации или
+        расчета одного элемента (в том числе элемент - не объект) не прерывает
+        пакет - она возвращается в поле Ошибка соответствующего элемента.
+        Порядок результатов совпадает с порядком входных данных.
+
+        С detail='totals' корректные элементы считаются одним проходом
+        VectorizedPricingEngine (NumPy), остальные уровни - по одному.
+        """
+        results: List[Dict[str, Any]] = []
+        valid = []
+        for index, payload in enumerate(payloads):
+            try:
+                if isinstance(payload, CalculateRequestSchema):
+                    req = payload
+                else:
+                    req = CalculateRequestSchema.model_validate(payload)
+            except ValidationError as e:
+                results.append(_batch_error(index, 'validation', f"Некорректные параметры расчета ({e.error_count()} ошибок)",
+                                            e.errors(include_url=False, include_context=False)))
+                continue
+            results.append(None)
+            valid.append((index, req))
+
+        if detail == 'totals' and valid:
+            # numpy загружается только для пакетных расчетов (см. tests/test_startup.py)
+            from src.vectorized_engine import VectorizedPricingEngine
+            totals = VectorizedPricingEngine(catalog).calculate_totals([req for _, req in valid])
+            for i, (index, _) in enumerate(valid):
+                document = {"Итоговая_стоимость": totals.item_dict(i), "Версия_прайса": catalog.version}
+                results[index] = {"Индекс": index, "Результат": document, "Ошибка": None}
+            return results
+
+        for index, req in valid:
+            try:
+                results[index] = {"Индекс": index, "Результат": self.calculate_document(catalog, req, detail), "Ошибка": None}
+            except Exception as e:
+                results[index] = _batch_error(index, 'calculation', str(e))
+        return results
+
+    def _get_base_price(self, catalog: PriceCatalog, req: CalculateRequestSchema, A_house: float) -> float:
         """
         Расчет базовой цены (матрица стр. 1–5 прайса).
         """
@@ -119,23 +230,13 @@ class PricingEngine:
         else: # 'rafters'
             storey_type_code = 'mansard'
         
-        price_per_sqm = db.query(models.BasePriceM2.price_rub).join(
-            models.BuildTechnology, models.BasePriceM2.tech_id == models.BuildTechnology.id
-        ).join(
-            models.InsulationBrand, models.BasePriceM2.brand_id == models.InsulationBrand.id
-        ).join(
-            models.InsulationThickness, models.BasePriceM2.thickness_id == models.InsulationThickness.id
-        ).join(
-            models.StoreyType, models.BasePriceM2.storey_type_id == models.StoreyType.id
-        ).join(
-            models.Contour, models.BasePriceM2.contour_id == models.Contour.id
-        ).filter(
-            models.BuildTechnology.code == req.insulation.build_tech,
-            models.InsulationBrand.code == req.insulation.brand,
-            models.InsulationThickness.mm == req.insulation.mm,
-            models.StoreyType.code == storey_type_code,
-            models.Contour.code == 'warm'
-        ).scalar()
+        price_per_sqm = catalog.base_price(
+            req.insulation.build_tech,
+            req.insulation.brand,
+            req.insulation.mm,
+            storey_type_code,
+            'warm'
+        )
 
         if price_per_sqm is None:
             # TODO: Add proper error handling for missing prices
@@ -144,7 +245,8 @@ class PricingEngine:
         base_price = float(price_per_sqm) * A_house
         return base_price
 
-    def _calculate_roof_costs(self, db: Session, req: CalculateRequestSchema, A_house: float) -> tuple[float, list[DopolneniyaItem]]:
+    def _calculate_roof_costs(self, catalog: PriceCatalog, req: CalculateRequestSchema, A_house: float,
+                              with_details: bool = True) -> tuple[float, list[dict]]:
         """
         Расчет стоимости допов по потолку и кровле (стр. 20 прайса).
         """
@@ -152,48 +254,55 @@ class PricingEngine:
         details = []
 
         # 1. Стоимость за высоту потолка
-        price_model = db.query(models.CeilingHeightPrice).filter_by(height_m=req.ceiling.height_m).first()
-        if price_model and price_model.price_per_m2 > 0:
-            cost = float(price_model.price_per_m2) * A_house
+        price_per_m2 = catalog.ceiling_height_price(req.ceiling.height_m)
+        if price_per_m2 and price_per_m2 > 0:
+            cost = float(price_per_m2) * A_house
             total_cost += cost
-            details.append(DopolneniyaItem(Код="CEILING_H", Наименование=f"Увеличение высоты потолка до {req.ceiling.height_m}м", Расчёт=f"{A_house:.2f}м² × {price_model.price_per_m2}₽", Сумма_руб=cost))
+            if with_details:
+                details.append(_addon_item("CEILING_H", f"Увеличение высоты потолка до {req.ceiling.height_m}м", f"{A_house:.2f}м² × {price_per_m2}₽", cost))
 
         # 2. Стоимость за повышение конька (только для 'flat')
         if req.ceiling.type == 'flat' and req.ceiling.ridge_delta_cm is not None and req.ceiling.ridge_delta_cm > 0:
             ridge_height_m = 1.5 + (req.ceiling.ridge_delta_cm / 10) # Примерная логика, нужна точная
-            price_model = db.query(models.RidgeHeightPrice).filter_by(ridge_height_m=ridge_height_m).first()
-            if price_model and price_model.price_per_m2 > 0:
-                cost = float(price_model.price_per_m2) * A_house
+            price_per_m2 = catalog.ridge_height_price(ridge_height_m)
+            if price_per_m2 and price_per_m2 > 0:
+                cost = float(price_per_m2) * A_house
                 total_cost += cost
-                details.append(DopolneniyaItem(Код="RIDGE_H", Наименование=f"Увеличение конька на {req.ceiling.ridge_delta_cm}см", Расчёт=f"{A_house:.2f}м² × {price_model.price_per_m2}₽", Сумма_руб=cost))
+                if with_details:
+                    details.append(_addon_item("RIDGE_H", f"Увеличение конька на {req.ceiling.ridge_delta_cm}см", f"{A_house:.2f}м² × {price_per_m2}₽", cost))
 
         # 3. Стоимость за вынос крыши (std - бесплатно)
         if req.roof.overhang_cm != 'std':
             overhang_cm_val = int(req.roof.overhang_cm)
-            price_model = db.query(models.RoofOverhangPrice).filter_by(overhang_cm=overhang_cm_val).first()
-            if price_model and price_model.price_per_m2 > 0:
-                cost = float(price_model.price_per_m2) * A_house
+            price_per_m2 = catalog.roof_overhang_price(overhang_cm_val)
+            if price_per_m2 and price_per_m2 > 0:
+                cost = float(price_per_m2) * A_house
                 total_cost += cost
-                details.append(DopolneniyaItem(Код="OVERHANG", Наименование=f"Увеличение выноса крыши до {overhang_cm_val}см", Расчёт=f"{A_house:.2f}м² × {price_model.price_per_m2}₽", Сумма_руб=cost))
+                if with_details:
+                    details.append(_addon_item("OVERHANG", f"Увеличение выноса крыши до {overhang_cm_val}см", f"{A_house:.2f}м² × {price_per_m2}₽", cost))
 
         return total_cost, details
 
-    def _calculate_partitions_cost(self, db: Session, req: CalculateRequestSchema) -> tuple[float, list[DopolneniyaItem]]:
+    def _calculate_partitions_cost(self, catalog: PriceCatalog, req: CalculateRequestSchema,
+                                   with_details: bool = True) -> tuple[float, list[dict]]:
         """
         Расчет стоимости перегородок (стр. 21 прайса).
         """
         if not req.partitions.enabled or not req.partitions.type or req.partitions.type == 'none' or not req.partitions.run_m:
             return 0.0, []
         
-        price_model = db.query(models.PartitionPrice).filter_by(type=req.partitions.type).first()
+        price_model = catalog.partition_price(req.partitions.type)
         if not price_model:
             return 0.0, []
         
         cost = float(price_model.price_per_pm) * req.partitions.run_m
-        details = [DopolneniyaItem(Код="PARTITIONS", Наименование=f"Перегородки ({price_model.type.value})", Расчёт=f"{req.partitions.run_m}п.м. × {price_model.price_per_pm}₽", Сумма_руб=cost)]
+        if not with_details:
+            return cost, []
+        details = [_addon_item("PARTITIONS", f"Перегородки ({price_model.type})", f"{req.partitions.run_m}п.м. × {price_model.price_per_pm}₽", cost)]
         return cost, details
 
-    def _calculate_generic_addons_cost(self, db: Session, req: CalculateRequestSchema, A_house: float) -> tuple[float, list[DopolneniyaItem]]:
+    def _calculate_generic_addons_cost(self, catalog: PriceCatalog, req: CalculateRequestSchema, A_house: float,
+                                       with_details: bool = True) -> tuple[float, list[dict]]:
         """
         Расчет стоимости прочих "допов" (стр. 11–19, 21 прайса).
         """
@@ -202,43 +311,45 @@ class PricingEngine:
         if not req.addons:
             return total_cost, details
 
-        addon_codes = [addon.code for addon in req.addons]
-        db_addons = {addon.code: addon for addon in db.query(models.Addon).filter(models.Addon.code.in_(addon_codes)).all()}
-
         for addon_req in req.addons:
-            db_addon = db_addons.get(addon_req.code)
+            db_addon = catalog.addon(addon_req.code)
             if not db_addon:
                 continue
 
             price = float(db_addon.price)
-            calc_mode = db_addon.calc_mode.name
+            calc_mode = db_addon.calc_mode
             cost = 0.0
             calc_str = ""
 
             if calc_mode == 'AREA':
                 cost = price * A_house
-                calc_str = f"{A_house:.2f}м² × {price}₽"
+                if with_details:
+                    calc_str = f"{A_house:.2f}м² × {price}₽"
             elif calc_mode in ('RUN_M', 'PERIMETER'):
                 P_perimeter = (req.house.length_m + req.house.width_m) * 2
                 cost = price * P_perimeter
-                calc_str = f"{P_perimeter:.2f}п.м. × {price}₽"
+                if with_details:
+                    calc_str = f"{P_perimeter:.2f}п.м. × {price}₽"
             elif calc_mode == 'ROOF_L_SIDES':
                 L_long = max(req.house.length_m, req.house.width_m)
                 sides = db_addon.params.get('sides', 2)
                 reserve_m = db_addon.params.get('reserve_m', 1)
                 cost = price * (L_long + reserve_m) * sides
-                calc_str = f"({L_long}+{reserve_m})м × {sides} стороны × {price}₽"
+                if with_details:
+                    calc_str = f"({L_long}+{reserve_m})м × {sides} стороны × {price}₽"
             elif calc_mode == 'COUNT':
                 cost = price * addon_req.quantity
-                calc_str = f"{addon_req.quantity}шт × {price}₽"
+                if with_details:
+                    calc_str = f"{addon_req.quantity}шт × {price}₽"
             
             if cost > 0:
                 total_cost += cost
-                details.append(DopolneniyaItem(Код=db_addon.code, Наименование=db_addon.title, Расчёт=calc_str, Сумма_руб=cost))
+                if with_details:
+                    details.append(_addon_item(db_addon.code, db_addon.title, calc_str, cost))
 
         return total_cost, details
 
-    def _get_delivery_price(self, db: Session, req: CalculateRequestSchema) -> float:
+    def _get_delivery_price(self, catalog: PriceCatalog, req: CalculateRequestSchema) -> float:
         """
         Расчет стоимости доставки по фиксированной формуле (стр. 29 прайса).
         
@@ -251,24 +362,23 @@ class PricingEngine:
         cost = (req.delivery.distance_km - 100) * 120
         return cost
 
-    def _calculate_delivery_cost(self, db: Session, req: CalculateRequestSchema) -> tuple[float, DopolneniyaItem | None]:
+    def _calculate_delivery_cost(self, catalog: PriceCatalog, req: CalculateRequestSchema,
+                                 with_details: bool = True) -> tuple[float, dict | None]:
         """
         Расчет стоимости доставки (стр. 29 прайса).
         Использует метод _get_delivery_price для получения цены.
         """
-        cost = self._get_delivery_price(db, req)
+        cost = self._get_delivery_price(catalog, req)
         if cost == 0:
             return 0.0, None
+        if not with_details:
+            return cost, None
 
-        details = DopolneniyaItem(
-            Код="DELIVERY",
-            Наименование="Доставка",
-            Расчёт=f"({req.delivery.distance_km}км - 100км) × 120₽",
-            Сумма_руб=cost
-        )
+        details = _addon_item("DELIVERY", "Доставка", f"({req.delivery.distance_km}км - 100км) × 120₽", cost)
         return cost, details
 
-    def _calculate_windows_price(self, db: Session, req: CalculateRequestSchema) -> tuple[float, list[StandardWindowItem]]:
+    def _calculate_windows_price(self, catalog: PriceCatalog, req: CalculateRequestSchema,
+                                 with_details: bool = True) -> tuple[float, list[dict]]:
         """
         Расчет стоимости окон (стр. 23-24 прайса).
         
@@ -283,47 +393,32 @@ class PricingEngine:
             return total_cost, windows_details
 
         for window_req in req.windows:
-            # 1. Найти базовую цену окна по размеру и типу
-            base_price_model = db.query(models.WindowBasePrice).filter_by(
-                width_cm=window_req.width_cm,
-                height_cm=window_req.height_cm,
-                type=window_req.type
-            ).first()
+            # 1. Цена за штуку из готовой сетки прайса (базовая цена × множитель модификаторов).
+            # Важно: логика модификаторов НЕ аддитивная - в сетке хранится точная комбинация,
+            # а если комбинации нет в прайсе, используется множитель 1.0
+            price_per_unit = catalog.window_unit_price(
+                window_req.width_cm,
+                window_req.height_cm,
+                window_req.type,
+                window_req.dual_chamber,
+                window_req.laminated
+            )
             
-            if not base_price_model:
+            if price_per_unit is None:
                 # Если окно не найдено, пропускаем его
                 continue
             
-            base_price = float(base_price_model.base_price_rub)
-            
-            # 2. Определить комбинацию модификаторов и найти соответствующий multiplier
-            # Важно: логика НЕ аддитивная! Ищем точную комбинацию в БД
-            modifier = db.query(models.WindowModifier).filter_by(
-                two_chambers=window_req.dual_chamber,
-                laminated=window_req.laminated
-            ).first()
-            
-            if not modifier:
-                # Если модификатор не найден, используем базовый множитель 1.0
-                multiplier = 1.0
-            else:
-                multiplier = float(modifier.multiplier)
-            
-            # 3. Рассчитать цену окна: Базовая_Цена * Множитель * Количество
-            price_per_unit = base_price * multiplier
+            # 2. Рассчитать цену окна: Цена_шт * Количество
             total_price = price_per_unit * window_req.quantity
             total_cost += total_price
+            if not with_details:
+                continue
             
-            # 4. Формируем строку размера для отображения
+            # 3. Формируем строку размера для отображения
             size_str = f"{window_req.width_cm}×{window_req.height_cm}"
             
             # Формируем описание типа окна
-            type_str_map = {
-                'gluh': 'глухое',
-                'povorot': 'поворотное',
-                'povorot_otkid': 'поворотно-откидное'
-            }
-            type_str = type_str_map.get(window_req.type, window_req.type)
+            type_str = WINDOW_TYPE_TITLES.get(window_req.type, window_req.type)
             
             # Добавляем информацию о модификаторах в описание, если они есть
             mods = []
@@ -334,18 +429,18 @@ class PricingEngine:
             if mods:
                 type_str += f" ({', '.join(mods)})"
             
-            # 5. Добавляем детали в список для ответа
-            windows_details.append(StandardWindowItem(
-                Размер=size_str,
-                Тип=type_str,
-                Колво=window_req.quantity,
-                Цена_шт_руб=round(price_per_unit, 2),
-                Сумма_руб=round(total_price, 2)
-            ))
+            # 4. Добавляем детали в список для ответа
+            windows_details.append({
+                "Размер": size_str,
+                "Тип": type_str,
+                "Колво": int(window_req.quantity),
+                "Цена_шт_руб": float(round(price_per_unit, 2)),
+                "Сумма_руб": float(round(total_price, 2)),
+            })
         
         return total_cost, windows_details
 
-    def _handle_replacements(self, db: Session, req: CalculateRequestSchema, A_house: float) -> float:
+    def _handle_replacements(self, catalog: PriceCatalog, req: CalculateRequestSchema, A_house: float) -> float:
         """
         Реализует логику замещения стандартных окон (стр. 3, 6 прайса).
         
@@ -362,17 +457,7 @@ class PricingEngine:
             storey_type_code = 'mansard'
         
         # Находим стандартное включение для текущей конфигурации
-        std_inclusion = db.query(models.StdInclusion).join(
-            models.BuildTechnology, models.StdInclusion.tech_id == models.BuildTechnology.id
-        ).join(
-            models.Contour, models.StdInclusion.contour_id == models.Contour.id
-        ).join(
-            models.StoreyType, models.StdInclusion.storey_type_id == models.StoreyType.id
-        ).filter(
-            models.BuildTechnology.code == req.insulation.build_tech,
-            models.Contour.code == 'warm',
-            models.StoreyType.code == storey_type_code
-        ).first()
+        std_inclusion = catalog.std_inclusion(req.insulation.build_tech, 'warm', storey_type_code)
         
         if not std_inclusion:
             # Если стандартное включение не найдено, не вычитаем ничего
@@ -393,31 +478,82 @@ class PricingEngine:
         if std_windows_qty == 0:
             return 0.0
         
-        # 3. Находим базовую цену стандартного окна (100×100, однокамерное, без ламинации)
-        std_window_base = db.query(models.WindowBasePrice).filter_by(
-            width_cm=std_inclusion.included_window_width_cm,
-            height_cm=std_inclusion.included_window_height_cm,
-            type=std_inclusion.included_window_type
-        ).first()
+        # 3. Находим цену стандартного окна (100×100, однокамерное, без ламинации)
+        # в той же сетке цен, что и выбранные окна
+        std_window_price_per_unit = catalog.window_unit_price(
+            std_inclusion.window_width_cm,
+            std_inclusion.window_height_cm,
+            std_inclusion.window_type,
+            False,
+            False
+        )
         
-        if not std_window_base:
+        if std_window_price_per_unit is None:
             # Если стандартное окно не найдено в базе цен, не вычитаем
             return 0.0
         
-        # 4. Стандартное окно - однокамерное без ламинации, значит multiplier = 1.0
-        # Находим модификатор для однокамерного без ламинации
-        std_modifier = db.query(models.WindowModifier).filter_by(
-            two_chambers=False,
-            laminated=False
-        ).first()
-        
-        if std_modifier:
-            std_multiplier = float(std_modifier.multiplier)
-        else:
-            std_multiplier = 1.0
-        
-        # 5. Рассчитываем стоимость стандартных окон
-        std_window_price_per_unit = float(std_window_base.base_price_rub) * std_multiplier
+        # 4. Рассчитываем стоимость стандартных окон
         std_windows_total_cost = std_window_price_per_unit * std_windows_qty
         
         return std_windows_total_cost
+
+
+class AsyncPricingEngine:
+    """
+    Асинхронный вариант PricingEngine для async-эндпоинтов.
+
+    Единственная операция ввода-вывода - получение снимка прайса: при холодном
+    старте разделы прайса (база, кровля, перегородки, допы, окна) загружаются
+    параллельно через асинхронный engine. Сам расчет выполняется в памяти
+    синхронным PricingEngine и не требует ожидания.
+    Если передан cache (QuoteCache), готовые ответы берутся из него; для
+    calculate_json в кэше лежит уже сериализованный JSON.
+    """
+
+    def __init__(self, store: CatalogStore, cache: Any = None, engine: PricingEngine | None = None):
+        self.store = store
+        self.cache = cache
+        self.engine = engine or PricingEngine()
+
+    async def calculate_total(self, req: CalculateRequestSchema) -> CalculateResponseSchema:
+        catalog = await self.store.get_async()
+        if self.cache is None:
+            return self.engine.calculate_total(catalog, req)
+        return self.cache.get_or_compute(catalog, req, lambda: self.engine.calculate_total(catalog, req))
+
+    async def calculate_json(self, req: CalculateRequestSchema, detail: DetailLevel = 'full') -> bytes:
+        """
+        Расчет сразу в виде тела ответа /calculate (JSON в UTF-8), без сборки и валидации моделей.
+        detail - объем ответа (см. PricingEngine.calculate_document); в кэше у каждого свой ключ.
+        """
+        catalog = await self.store.get_async()
+        compute = lambda: json_response.dumps(self.engine.calculate_document(catalog, req, detail))
+        if self.cache is None:
+            return compute()
+        return self.cache.get_or_compute(catalog, req, compute, variant=f':json:{detail}', ordered=detail == 'full')
+
+
+# Этап расчета -> метод PricingEngine, время и запросы которого попадают в метрики
+PRICING_STAGES = {
+    'total': 'calculate_document',
+    'base_price': '_get_base_price',
+    'roof': '_calculate_roof_costs',
+    'partitions': '_calculate_partitions_cost',
+    'addons': '_calculate_generic_addons_cost',
+    'windows': '_calculate_windows_price',
+    'replacements': '_handle_replacements',
+    'delivery': '_calculate_delivery_cost',
+    'response': '_build_response',
+}
+
+
+def instrument_pricing_engine(cls: type = PricingEngine, registry: metrics.MetricsRegistry = metrics.registry) -> None:
+    """Включает замер этапов расчета для класса cls (по умолчанию - PricingEngine)."""
+    duration = registry.histogram(
+        'pricing_stage_duration_seconds', 'Время этапа расчета стоимости', ('stage',), metrics.STAGE_BUCKETS)
+    queries = registry.counter('pricing_stage_queries', 'Запросы к БД, выполненные на этапе расчета', ('stage',))
+    metrics.instrument_methods(cls, PRICING_STAGES, duration, queries)
+
+
+if metrics.METRICS_ENABLED:
+    instrument_pricing_engine()
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from src.schemas import CalculateRequestSchema
+from src.price_catalog import PriceCatalog
+
+
+def _normalize_terrace_porch(value: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # Выключенные террасы/крыльца не влияют на расчет - убираем их из ключа
+    if not value:
+        return None
+    components = {name: component for name, component in value.items() if component and component.get('enabled')}
+    return components or None
+
+
+def canonical_request(req: CalculateRequestSchema, ordered: bool = True) -> Dict[str, Any]:
+    """
+    Приводит запрос к каноническому виду: значения по умолчанию отброшены,
+    выключенные террасы/крыльца и перегородки нормализованы. Запросы с одинаковым
+    каноническим видом дают одинаковый ответ.
+
+    Строки Дополнения и Стандартные_окна в полном ответе идут в порядке запроса,
+    поэтому по умолчанию порядок допов и окон сохраняется; с ordered=False они
+    сортируются - для ответов без строк разбивки (итоги от порядка не зависят).
+    """
+    data = req.model_dump(exclude_defaults=True)
+    data['house'] = req.house.model_dump()
+    data['ceiling'] = req.ceiling.model_dump()
+    data['ceiling']['ridge_delta_cm'] = data['ceiling']['ridge_delta_cm'] or 0
+    data['insulation'] = req.insulation.model_dump()
+    data['delivery'] = req.delivery.model_dump()
+    data['roof'] = req.roof.model_dump()
+
+    if req.partitions.enabled:
+        data['partitions'] = req.partitions.model_dump()
+    else:
+        data['partitions'] = {'enabled': False}
+
+    for name in ('terrace', 'porch'):
+        normalized = _normalize_terrace_porch(data.pop(name, None))
+        if normalized:
+            data[name] = normalized
+
+    addons = [(addon.code, addon.quantity if addon.quantity is not None else -1) for addon in req.addons or []]
+    if not ordered:
+        addons.sort()
+    if addons:
+        data['addons'] = addons
+    else:
+        data.pop('addons', None)
+
+    windows = [(w.width_cm, w.height_cm, w.type, w.quantity, w.dual_chamber, w.laminated) for w in req.windows or []]
+    if not ordered:
+        windows.sort()
+    if windows:
+        data['windows'] = windows
+    else:
+        data.pop('windows', None)
+
+    return data
+
+
+def canonical_request_hash(req: CalculateRequestSchema, ordered: bool = True) -> str:
+    payload = json.dumps(canonical_request(req, ordered), sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class QuoteCache:
+    """
+    Ограниченный LRU/TTL кэш рассчитанных ответов.
+
+    Ключ - канонический хэш запроса плюс версия и хэш прайса, поэтому
+    публикация новой версии прайса делает все старые записи недостижимыми.
+    При первом обращении с более новой версией записи старых версий удаляются;
+    запросы, которые еще досчитываются на старом снимке, кэш не трогают
+    (их ответы не сохраняются).
+    Ограничен числом записей (max_entries) и оценкой занимаемой памяти
+    (max_bytes, по размеру JSON ответа).
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_s: float = 3600, max_bytes: int = 64 * 1024 * 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[int, str, str], Tuple[Any, int, float]]" = OrderedDict()
+        self._latest_version: Optional[int] = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def _check_catalog(self, catalog: PriceCatalog) -> bool:
+        """Учитывает версию прайса; False, если снимок старее последней увиденной версии."""
+        if self._latest_version is None or catalog.version > self._latest_version:
+            stale = [key for key in self._entries if key[0] < catalog.version]
+            if stale:
+                self.invalidations += 1
+            for key in stale:
+                self._bytes -= self._entries.pop(key)[1]
+            self._latest_version = catalog.version
+        return catalog.version == self._latest_version
+
+    def _evict_one(self) -> None:
+        _, (_, size, _) = self._entries.popitem(last=False)
+        self._bytes -= size
+        self.evictions += 1
+
+    def get(self, catalog: PriceCatalog, request_hash: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        key = (catalog.version, catalog.content_hash, request_hash)
+        with self._lock:
+            if not self._check_catalog(catalog):
+                self.misses += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, catalog: PriceCatalog, request_hash: str, value: Any, size: Optional[int] = None) -> None:
+        if not self.enabled:
+            return
+        if size is None:
+            size = len(value.model_dump_json()) if isinstance(value, BaseModel) else len(value)
+        if size > self.max_bytes:
+            return
+        key = (catalog.version, catalog.content_hash, request_hash)
+        with self._lock:
+            if not self._check_catalog(catalog):
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size, self._clock() + self.ttl_s)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._evict_one()
+
+    def get_or_compute(self, catalog: PriceCatalog, req: CalculateRequestSchema, compute: Callable[[], Any],
+                       variant: str = '', ordered: bool = True) -> Any:
+        """
+        variant отделяет разные представления одного расчета (например, модель и готовый JSON);
+        ordered=False - ответ не зависит от порядка допов и окон (см. canonical_request).
+        """
+        if not self.enabled:
+            return compute()
+        request_hash = canonical_request_hash(req, ordered) + variant
+        value = self.get(catalog, request_hash)
+        if value is None:
+            value = compute()
+            self.put(catalog, request_hash, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._latest_version = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+quote_cache = QuoteCache(
+    max_entries=int(os.getenv("QUOTE_CACHE_MAX_ENTRIES", "10000")),
+    ttl_s=float(os.getenv("QUOTE_CACHE_TTL_S", "3600")),
+    max_bytes=int(os.getenv("QUOTE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from typing import Any, Dict, List, Optional, Literal, Union
 
 # Schemas for Request Body of /calculate
 
@@ -112,3 +112,49 @@ class CalculateResponseSchema(BaseModel):
     Окна_и_двери: OknaIDveriSchema
     Конструктив: KonstruktivSchema
     Итоговая_стоимость: ItogovayaStoimostSchema
+    Версия_прайса: int = Field(..., description="Версия каталога цен, по которой выполнен расчет")
+
+
+# Сокращенные ответы /calculate (параметр detail): для конфигураторов,
+# пересчитывающих цену на каждое движение ползунка
+
+# full - полная разбивка (CalculateResponseSchema), sections - итоги по разделам без строк,
+# totals - только Итоговая_стоимость
+DetailLevel = Literal['full', 'sections', 'totals']
+
+class OknaIDveriItogSchema(BaseModel):
+    Итого_по_разделу_руб: float
+
+class KonstruktivItogSchema(BaseModel):
+    База_руб: float
+    Дополнения_руб: float = Field(..., description="Сумма строк Дополнения без доставки")
+    Доставка_руб: float
+
+class CalculateSectionsResponseSchema(BaseModel):
+    Габариты: GabaritySchema
+    Окна_и_двери: OknaIDveriItogSchema
+    Конструктив: KonstruktivItogSchema
+    Итоговая_стоимость: ItogovayaStoimostSchema
+    Версия_прайса: int
+
+class CalculateTotalsResponseSchema(BaseModel):
+    Итоговая_стоимость: ItogovayaStoimostSchema
+    Версия_прайса: int
+
+
+# Schemas for Response Body of /calculate/batch
+
+class BatchItemErrorSchema(BaseModel):
+    Тип: Literal['validation', 'calculation']
+    Сообщение: str
+    Детали: Optional[List[Dict[str, Any]]] = None
+
+class BatchCalculateItemSchema(BaseModel):
+    Индекс: int
+    # Схема результата зависит от параметра detail запроса
+    Результат: Optional[Union[CalculateResponseSchema, CalculateSectionsResponseSchema, CalculateTotalsResponseSchema]] = None
+    Ошибка: Optional[BatchItemErrorSchema] = None
+
+class BatchCalculateResponseSchema(BaseModel):
+    Версия_прайса: int
+    Результаты: List[BatchCalculateItemSchema]
@@ -0,0 +1,301 @@
+import functools
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.price_catalog import catalog_store
+
+logger = logging.getLogger(__name__)
+
+
+# Статусы задания синхронизации
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Режимы задания: полная синхронизация (по запросу) и синхронизация
+# только изменившихся листов (по расписанию, см. sync_service.sync_changed_sheets)
+FULL = "full"
+CHANGED = "changed"
+
+# Сколько завершенных заданий хранить для GET /admin/sync-jobs
+SYNC_JOB_HISTORY = 20
+
+
+@dataclass
+class SheetProgress:
+    """Прогресс одного листа: строки и время по этапам, ошибки."""
+    fetched_rows: Optional[int] = None
+    fetch_s: Optional[float] = None
+    transformed_rows: Optional[int] = None
+    rejected_rows: Optional[int] = None
+    transform_s: Optional[float] = None
+    loaded: Optional[Dict[str, int]] = None
+    load_s: Optional[float] = None
+    errors: List[str] = field(default_factory=list)
+
+
+@dataclass
+class SyncJob:
+    """Задание синхронизации. requests - сколько запросов на синхронизацию объединено в задание."""
+    id: str
+    mode: str = FULL
+    status: str = QUEUED
+    stage: Optional[str] = None
+    requests: int = 1
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    sheets: Dict[str, SheetProgress] = field(default_factory=dict)
+    report: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        if self.started_at is not None:
+            data["duration_s"] = round((self.finished_at or time.time()) - self.started_at, 3)
+        return data
+
+
+class _JobProgress:
+    """
+    Переносит события sync_service в SyncJob под блокировкой менеджера.
+    Реализует методы sync_service.SyncProgress; не наследует его, чтобы
+    модуль не импортировал gspread при старте приложения.
+    """
+
+    def __init__(self, manager: "SyncJobManager", job: SyncJob):
+        self._manager = manager
+        self._job = job
+
+    def _sheet(self, sheet: str) -> SheetProgress:
+        return self._job.sheets.setdefault(sheet, SheetProgress())
+
+    def stage(self, stage: str) -> None:
+        with self._manager._lock:
+            self._job.stage = stage
+
+    def sheet_fetched(self, sheet: str, rows: int, seconds: float) -> None:
+        with self._manager._lock:
+            progress = self._sheet(sheet)
+            progress.fetched_rows, progress.fetch_s = rows, round(seconds, 4)
+
+    def sheet_transformed(self, sheet: str, rows: int, rejected: int, seconds: float) -> None:
+        with self._manager._lock:
+            progress = self._sheet(sheet)
+            progress.transformed_rows, progress.rejected_rows, progress.transform_s = rows, rejected, round(seconds, 4)
+
+    def sheet_loaded(self, sheet: str, summary: Dict[str, int], seconds: float) -> None:
+        with self._manager._lock:
+            progress = self._sheet(sheet)
+            progress.loaded, progress.load_s = dict(summary), round(seconds, 4)
+
+    def sheet_failed(self, sheet: str, error: str) -> None:
+        with self._manager._lock:
+            self._sheet(sheet).errors.append(error)
+
+
+class SyncJobManager:
+    """
+    Запускает синхронизацию в фоновом потоке и хранит задания для опроса прогресса.
+
+    Одновременно выполняется не больше одной синхронизации. Запрос, пришедший,
+    пока задание еще не начало читать листы (подключение к Google, этап не
+    задан), присоединяется к нему - прочитанные данные будут не старше запроса.
+    Если задание уже читает листы или пишет в БД, запрос присоединяется
+    к единственному следующему заданию в очереди: оно стартует после текущего
+    и прочитает листы заново. Поэтому любая серия запросов дает не больше двух
+    синхронизаций.
+
+    Проверка по расписанию (start_schedule) запускает задание режима CHANGED
+    через run_changed_sync, только если никакое задание не выполняется и не
+    ждет в очереди. Проверки, не нашедшие изменений, в историю не попадают.
+    """
+
+    def __init__(self, run_sync: Callable[[Any], Dict[str, Any]],
+                 on_changed: Optional[Callable[[], Any]] = None, history: int = SYNC_JOB_HISTORY,
+                 run_changed_sync: Optional[Callable[[Any], Dict[str, Any]]] = None):
+        self._run_sync = run_sync
+        self._run_changed_sync = run_changed_sync or run_sync
+        self._on_changed = on_changed
+        self._history = history
+        self._jobs: "OrderedDict[str, SyncJob]" = OrderedDict()
+        self._current: Optional[SyncJob] = None
+        self._pending: Optional[SyncJob] = None
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._scheduler: Optional[threading.Thread] = None
+
+    def submit(self) -> Tuple[SyncJob, bool]:
+        """Запрашивает синхронизацию. Возвращает задание и признак объединения с существующим."""
+        with self._lock:
+            current = self._current
+            if current is not None and current.mode == FULL and current.stage is None:
+                current.requests += 1
+                return current, True
+            if self._pending is not None:
+                self._pending.requests += 1
+                return self._pending, True
+
+            job = SyncJob(id=uuid.uuid4().hex)
+            self._jobs[job.id] = job
+            self._trim()
+            if current is None:
+                self._start(job)
+            else:
+                self._pending = job
+            return job, False
+
+    def submit_scheduled(self) -> Optional[SyncJob]:
+        """Запускает проверку изменившихся листов; None, если синхронизация уже идет или ждет."""
+        with self._lock:
+            if self._current is not None or self._pending is not None:
+                return None
+            job = SyncJob(id=uuid.uuid4().hex, mode=CHANGED)
+            self._jobs[job.id] = job
+            self._trim()
+            self._start(job)
+            return job
+
+    def start_schedule(self, interval_s: float) -> None:
+        """Запускает фоновый поток, который раз в interval_s секунд проверяет изменения в листах."""
+        if self._scheduler is not None or interval_s <= 0:
+            return
+        self._stop.clear()
+
+        def _poll():
+            while not self._stop.wait(interval_s):
+                try:
+                    self.submit_scheduled()
+                except Exception:
+                    logger.exception("Scheduled sync check failed")
+
+        self._scheduler = threading.Thread(target=_poll, name="sync-scheduler", daemon=True)
+        self._scheduler.start()
+
+    def stop_schedule(self) -> None:
+        self._stop.set()
+        if self._scheduler is not None:
+            self._scheduler.join(timeout=5)
+            self._scheduler = None
+
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def snapshot(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Состояние задания (копия, безопасная для сериализации)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.as_dict() if job is not None else None
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Последние задания, новые первыми."""
+        with self._lock:
+            return [job.as_dict() for job in reversed(self._jobs.values())]
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> bool:
+        """Ждет завершения задания; False, если не дождались за timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._done:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job.finished:
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._done.wait(remaining)
+
+    def _trim(self) -> None:
+        while len(self._jobs) > self._history:
+            oldest = next(iter(self._jobs.values()))
+            if not oldest.finished:
+                break
+            self._jobs.popitem(last=False)
+
+    def _start(self, job: SyncJob) -> None:
+        # Вызывается под self._lock
+        self._current = job
+        job.status = RUNNING
+        job.started_at = time.time()
+        threading.Thread(target=self._run, args=(job,), name=f"sync-job-{job.id[:8]}", daemon=True).start()
+
+    def _run(self, job: SyncJob) -> None:
+        report, error = None, None
+        try:
+            run_sync = self._run_changed_sync if job.mode == CHANGED else self._run_sync
+            report = run_sync(_JobProgress(self, job))
+            error = report.get("error")
+        except Exception as e:
+            error = str(e)
+        if report is not None and report.get("changed") and self._on_changed is not None:
+            try:
+                self._on_changed()
+            except Exception:
+                # Данные уже опубликованы: снимок подхватит фоновый опрос версий
+                logger.exception("Catalog refresh after sync failed")
+
+        with self._done:
+            job.report = report
+            job.error = error
+            job.status = FAILED if error else SUCCEEDED
+            job.stage = None
+            job.finished_at = time.time()
+            self._current = None
+            if job.mode == CHANGED and not error and not report.get("sheets"):
+                # Проверка без изменений: не вытесняет из истории настоящие синхронизации
+                self._jobs.pop(job.id, None)
+            if self._pending is not None:
+                pending, self._pending = self._pending, None
+                self._start(pending)
+            self._trim()
+            self._done.notify_all()
+
+
+def _with_session(sync: Callable[..., Dict[str, Any]], progress: Any) -> Dict[str, Any]:
+    from src.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return sync(db, progress=progress)
+    finally:
+        db.close()
+
+
+def _default_run_sync(progress: Any) -> Dict[str, Any]:
+    from src.sync_service import sync_google_sheets_to_db
+    return _with_session(sync_google_sheets_to_db, progress)
+
+
+class _ChangedSync:
+    """
+    Проверка по расписанию: авторизованный клиент и ключ таблицы
+    (sync_service.GoogleSheetsConnection) живут между проверками, поэтому
+    проверка неизменившейся таблицы - один запрос files.get к Drive.
+    Задания выполняются по одному, блокировка не нужна.
+    """
+
+    def __init__(self):
+        self._connection = None
+
+    def __call__(self, progress: Any) -> Dict[str, Any]:
+        from src.sync_service import GoogleSheetsConnection, sync_changed_sheets
+
+        if self._connection is None:
+            self._connection = GoogleSheetsConnection()
+        return _with_session(functools.partial(sync_changed_sheets, connection=self._connection), progress)
+
+
+sync_jobs = SyncJobManager(_default_run_sync, on_changed=catalog_store.refresh,
+                           run_changed_sync=_ChangedSync())
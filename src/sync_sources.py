@@ -0,0 +1,174 @@
+"""
+Sheet sources for the price sync: exported XLSX workbooks and folders of
+CSV files (the live spreadsheet is sync_service.GoogleSheetsSource).
+
+A source yields the rows of one sheet lazily, as dicts keyed by the header
+row (the same shape as gspread's get_all_records), so a sync can transform
+and load a sheet chunk by chunk without holding the whole file in memory.
+"""
+import csv
+import hashlib
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+
+class SheetNotFound(LookupError):
+    """The source has no sheet with this name."""
+
+
+def _file_checksum(path: str, block_size: int = 1 << 16) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _records(header: Sequence[Any], rows: Iterable[Sequence[Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Turns value rows into dicts keyed by the header. Blank rows are held back
+    and only emitted if a non-blank row follows, so trailing blank rows of an
+    export disappear while blank rows in the middle reach validation (as with
+    get_all_records).
+    """
+    columns = [str(name).strip() if name is not None else '' for name in header]
+    blank: List[Dict[str, Any]] = []
+    for values in rows:
+        record = {name: value for name, value in zip(columns, values) if name}
+        if all(value is None or value == '' for value in record.values()):
+            blank.append(record)
+            continue
+        if blank:
+            yield from blank
+            blank = []
+        yield record
+
+
+class SheetSource(ABC):
+    """Where a sync reads sheets from."""
+
+    @property
+    @abstractmethod
+    def source_id(self) -> str:
+        """Identifies the source in sheet_checksums, so sources do not overwrite each other's checksums."""
+
+    @abstractmethod
+    def sheet_names(self) -> List[str]:
+        """Names of the sheets in the source."""
+
+    @abstractmethod
+    def iter_rows(self, sheet: str) -> Iterator[Dict[str, Any]]:
+        """Rows of a sheet, read lazily; raises SheetNotFound for a missing sheet."""
+
+    @abstractmethod
+    def checksums(self, sheet_names: Iterable[str]) -> Dict[str, str]:
+        """Content checksums of the sheets present in the source."""
+
+    def prefetch(self, sheet_names: Iterable[str], progress: Any = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Reads sheets up front, before any DB work (for remote sources).
+        Returns the rows of the sheets read; those are synced whole, the
+        others are streamed from iter_rows. File sources read nothing here.
+        """
+        return {}
+
+    def revision(self) -> Optional[str]:
+        """Revision of the whole source, if it has one that is cheaper to read than the checksums."""
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class CsvFolderSource(SheetSource):
+    """A folder with one `<sheet>.csv` file per sheet (UTF-8, header row first)."""
+
+    def __init__(self, path: str, delimiter: str = ','):
+        self.path = path
+        self.delimiter = delimiter
+
+    @property
+    def source_id(self) -> str:
+        return f"csv:{os.path.abspath(self.path)}"
+
+    def _file(self, sheet: str) -> str:
+        return os.path.join(self.path, f"{sheet}.csv")
+
+    def sheet_names(self) -> List[str]:
+        return sorted(name[:-4] for name in os.listdir(self.path) if name.endswith('.csv'))
+
+    def iter_rows(self, sheet: str) -> Iterator[Dict[str, Any]]:
+        path = self._file(sheet)
+        if not os.path.isfile(path):
+            raise SheetNotFound(sheet)
+        return self._read(path)
+
+    def _read(self, path: str) -> Iterator[Dict[str, Any]]:
+        # utf-8-sig: Excel puts a BOM in front of CSV exports
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f, delimiter=self.delimiter)
+            header = next(reader, None)
+            if header is None:
+                return
+            yield from _records(header, reader)
+
+    def checksums(self, sheet_names: Iterable[str]) -> Dict[str, str]:
+        return {
+            sheet: _file_checksum(self._file(sheet))
+            for sheet in sheet_names if os.path.isfile(self._file(sheet))
+        }
+
+
+class XlsxSource(SheetSource):
+    """
+    An XLSX workbook with one worksheet per sheet, e.g. KM_ADM_TABLE exported
+    with File > Download > Microsoft Excel. Read in openpyxl's read-only mode,
+    which streams the worksheet XML instead of loading the workbook. Formulas
+    are read as their cached values.
+    """
+
+    def __init__(self, path: str):
+        # Optional dependency: only needed for XLSX imports
+        from openpyxl import load_workbook
+
+        self.path = path
+        self._workbook = load_workbook(path, read_only=True, data_only=True)
+        self._checksum: Optional[str] = None
+
+    @property
+    def source_id(self) -> str:
+        return f"xlsx:{os.path.abspath(self.path)}"
+
+    def sheet_names(self) -> List[str]:
+        return list(self._workbook.sheetnames)
+
+    def iter_rows(self, sheet: str) -> Iterator[Dict[str, Any]]:
+        if sheet not in self._workbook.sheetnames:
+            raise SheetNotFound(sheet)
+        return self._read(sheet)
+
+    def _read(self, sheet: str) -> Iterator[Dict[str, Any]]:
+        rows = self._workbook[sheet].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        yield from _records(header, rows)
+
+    def checksums(self, sheet_names: Iterable[str]) -> Dict[str, str]:
+        # Worksheets are zipped together, so the whole file is the unit of change
+        if self._checksum is None:
+            self._checksum = _file_checksum(self.path)
+        return {sheet: self._checksum for sheet in sheet_names if sheet in self._workbook.sheetnames}
+
+    def close(self) -> None:
+        self._workbook.close()
+
+
+def open_source(path: str) -> SheetSource:
+    """Picks the source for a path: a folder of CSV files or an .xlsx workbook."""
+    if os.path.isdir(path):
+        return CsvFolderSource(path)
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        return XlsxSource(path)
+    raise ValueError(f"unsupported sync source {path!r}: expected a folder of CSV files or an .xlsx workbook")
@@ -0,0 +1,298 @@
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src.schemas import CalculateRequestSchema, CalculateResponseSchema, ItogovayaStoimostSchema
+from src.price_catalog import PriceCatalog
+from src.pricing_engine import PricingEngine
+
+
+# Коды режимов расчета допов в колонке addon_mode
+_MODE_AREA, _MODE_PERIMETER, _MODE_ROOF_L_SIDES, _MODE_COUNT, _MODE_NONE = range(5)
+_ADDON_MODES = {
+    'AREA': _MODE_AREA,
+    'RUN_M': _MODE_PERIMETER,
+    'PERIMETER': _MODE_PERIMETER,
+    'ROOF_L_SIDES': _MODE_ROOF_L_SIDES,
+    'COUNT': _MODE_COUNT,
+}
+
+
+class QuoteBatch:
+    """
+    Колоночное представление N запросов: по массиву на каждый параметр
+    и разреженные (COO) матрицы для допов и окон.
+    """
+
+    def __init__(self, **columns):
+        self.__dict__.update(columns)
+
+    def __len__(self):
+        return len(self.area)
+
+
+class QuoteTotals:
+    """
+    Итоги по разделам для N запросов (массивы длины N, без округления).
+    """
+
+    def __init__(self, base, roof, partitions, addons, windows, delivery, commission):
+        self.base = base
+        self.roof = roof
+        self.partitions = partitions
+        self.addons = addons
+        self.windows = windows
+        self.delivery = delivery
+        self.commission = commission
+        self.subtotal = base + roof + partitions + addons + windows + delivery
+        self.final = self.subtotal + commission
+
+    def __len__(self):
+        return len(self.final)
+
+    def item(self, i: int) -> ItogovayaStoimostSchema:
+        return ItogovayaStoimostSchema(**self.item_dict(i))
+
+    def item_dict(self, i: int) -> Dict[str, float]:
+        """Итоговая_стоимость i-го запроса в виде dict (как в PricingEngine.calculate_document)."""
+        # Округляем через round(), как в PricingEngine, а не через np.round
+        return {
+            "Итого_без_комиссии_руб": round(float(self.subtotal[i]), 2),
+            "Комиссия_руб": round(float(self.commission[i]), 2),
+            "Окончательная_цена_руб": round(float(self.final[i]), 2),
+        }
+
+
+class VectorizedPricingEngine:
+    """
+    Колоночный режим PricingEngine для больших пакетов (ночной перерасчет).
+
+    Прайс из PriceCatalog один раз раскладывается в массивы, запросы
+    кодируются в индексы этих массивов, а итоги всех разделов считаются
+    векторными выборками и произведениями. Детальная разбивка (DopolneniyaItem,
+    StandardWindowItem) строится только по запросу через обычный PricingEngine.
+    """
+
+    def __init__(self, catalog: PriceCatalog):
+        self.catalog = catalog
+
+        # Базовая цена: индекс по (build_tech, brand, mm, storey_type_code), контур 'warm'.
+        # Последний элемент каждого массива цен - 0 для ненайденных ключей (индекс -1).
+        self._base_index = {}
+        base_prices = []
+        for (tech, brand, mm, storey, contour), price in catalog.base_prices.items():
+            if contour == 'warm':
+                self._base_index[(tech, brand, mm, storey)] = len(base_prices)
+                base_prices.append(float(price))
+        self._base_prices = np.array(base_prices + [0.0])
+
+        # Допы по потолку и кровле: учитываются только положительные цены
+        self._ceiling_prices = {float(k): float(v) for k, v in catalog.ceiling_height_prices.items() if v and v > 0}
+        self._ridge_prices = {float(k): float(v) for k, v in catalog.ridge_height_prices.items() if v and v > 0}
+        self._overhang_prices = {k: float(v) for k, v in catalog.roof_overhang_prices.items() if v and v > 0}
+        self._partition_prices = {k: float(v.price_per_pm) for k, v in catalog.partition_prices.items()}
+
+        self._addon_index = {}
+        addon_prices, addon_modes, addon_reserve, addon_sides = [], [], [], []
+        for code, addon in catalog.addons.items():
+            self._addon_index[code] = len(addon_prices)
+            addon_prices.append(float(addon.price))
+            addon_modes.append(_ADDON_MODES.get(addon.calc_mode, _MODE_NONE))
+            addon_reserve.append(float(addon.params.get('reserve_m', 1)))
+            addon_sides.append(float(addon.params.get('sides', 2)))
+        self._addon_prices = np.array(addon_prices, dtype=np.float64)
+        self._addon_modes = np.array(addon_modes, dtype=np.int8)
+        self._addon_reserve = np.array(addon_reserve, dtype=np.float64)
+        self._addon_sides = np.array(addon_sides, dtype=np.float64)
+
+        # Окна: индекс по (width_cm, height_cm, type, two_chambers, laminated) в готовой сетке цен за штуку
+        self._window_index = {}
+        window_prices = []
+        for key, price in catalog.window_unit_prices.items():
+            self._window_index[key] = len(window_prices)
+            window_prices.append(price)
+        self._window_prices = np.array(window_prices + [0.0])
+
+        # Замещение стандартных окон: (build_tech, storey_type_code) -> (цена стандартного окна,
+        # отсортированные пороги max_m2, количество окон для каждого порога)
+        self._std_groups = {}
+        for (tech, contour, storey), inclusion in catalog.std_inclusions.items():
+            if contour != 'warm':
+                continue
+            rules = inclusion.area_to_qty
+            if not rules or not isinstance(rules, list):
+                continue
+            std_price = catalog.window_unit_price(inclusion.window_width_cm, inclusion.window_height_cm, inclusion.window_type, False, False)
+            if std_price is None:
+                continue
+            rules = sorted(rules, key=lambda x: x.get('max_m2', 0))
+            self._std_groups[(tech, storey)] = (
+                std_price,
+                np.array([rule.get('max_m2', 0) for rule in rules], dtype=np.float64),
+                np.array([rule.get('qty', 0) for rule in rules], dtype=np.float64),
+            )
+        self._std_keys = list(self._std_groups)
+        self._std_key_index = {key: i for i, key in enumerate(self._std_keys)}
+
+    def encode(self, reqs: Sequence[CalculateRequestSchema]) -> QuoteBatch:
+        """
+        Переводит запросы в колонки. Это единственный цикл по запросам на Python.
+        """
+        n = len(reqs)
+        length = np.empty(n)
+        width = np.empty(n)
+        base_idx = np.empty(n, dtype=np.intp)
+        roof_price = np.empty(n)
+        partition_cost = np.empty(n)
+        distance = np.empty(n)
+        commission = np.empty(n)
+        std_idx = np.full(n, -1, dtype=np.intp)
+
+        addon_req, addon_idx, addon_qty = [], [], []
+        window_req, window_idx, window_qty = [], [], []
+
+        base_index = self._base_index
+        ceiling_prices = self._ceiling_prices
+        ridge_prices = self._ridge_prices
+        overhang_prices = self._overhang_prices
+        partition_prices = self._partition_prices
+        addon_index = self._addon_index
+        window_index = self._window_index
+        std_key_index = self._std_key_index
+
+        for i, req in enumerate(reqs):
+            house = req.house
+            ceiling = req.ceiling
+            insulation = req.insulation
+            length[i] = house.length_m
+            width[i] = house.width_m
+
+            storey = 'one' if ceiling.type == 'flat' else 'mansard'
+            base_idx[i] = base_index.get((insulation.build_tech, insulation.brand, insulation.mm, storey), -1)
+
+            # Все допы по потолку и кровле считаются за м² теплого контура - суммируем ставки
+            price_m2 = ceiling_prices.get(ceiling.height_m, 0.0)
+            if ceiling.type == 'flat' and ceiling.ridge_delta_cm:
+                price_m2 += ridge_prices.get(1.5 + ceiling.ridge_delta_cm / 10, 0.0)
+            if req.roof.overhang_cm != 'std':
+                price_m2 += overhang_prices.get(int(req.roof.overhang_cm), 0.0)
+            roof_price[i] = price_m2
+
+            partitions = req.partitions
+            if partitions.enabled and partitions.type and partitions.type != 'none' and partitions.run_m:
+                partition_cost[i] = partition_prices.get(partitions.type, 0.0) * partitions.run_m
+            else:
+                partition_cost[i] = 0.0
+
+            for addon in req.addons or ():
+                idx = addon_index.get(addon.code)
+                if idx is not None:
+                    addon_req.append(i)
+                    addon_idx.append(idx)
+                    addon_qty.append(addon.quantity or 0)
+
+            if req.windows:
+                for window in req.windows:
+                    idx = window_index.get((window.width_cm, window.height_cm, window.type, window.dual_chamber, window.laminated))
+                    if idx is not None:
+                        window_req.append(i)
+                        window_idx.append(idx)
+                        window_qty.append(window.quantity)
+                std_idx[i] = std_key_index.get((insulation.build_tech, storey), -1)
+
+            distance[i] = req.delivery.distance_km
+            commission[i] = req.commission_rub
+
+        return QuoteBatch(
+            length=length,
+            width=width,
+            area=length * width,
+            base_idx=base_idx,
+            roof_price=roof_price,
+            partition_cost=partition_cost,
+            addon_req=np.array(addon_req, dtype=np.intp),
+            addon_idx=np.array(addon_idx, dtype=np.intp),
+            addon_qty=np.array(addon_qty, dtype=np.float64),
+            window_req=np.array(window_req, dtype=np.intp),
+            window_idx=np.array(window_idx, dtype=np.intp),
+            window_qty=np.array(window_qty, dtype=np.float64),
+            std_idx=std_idx,
+            distance=distance,
+            commission=commission,
+        )
+
+    def compute(self, batch: QuoteBatch) -> QuoteTotals:
+        """
+        Считает итоги всех разделов для закодированного пакета.
+        """
+        n = len(batch)
+        area = batch.area
+
+        base = self._base_prices[batch.base_idx] * area
+        roof = batch.roof_price * area
+
+        # Допы: стоимость каждой пары (запрос, доп), затем сумма по запросу
+        addons = np.zeros(n)
+        if len(batch.addon_req):
+            r = batch.addon_req
+            k = batch.addon_idx
+            mode = self._addon_modes[k]
+            perimeter = (batch.length[r] + batch.width[r]) * 2
+            l_long = np.maximum(batch.length[r], batch.width[r])
+            amount = np.select(
+                [mode == _MODE_AREA, mode == _MODE_PERIMETER, mode == _MODE_ROOF_L_SIDES, mode == _MODE_COUNT],
+                [area[r], perimeter, (l_long + self._addon_reserve[k]) * self._addon_sides[k], batch.addon_qty],
+                default=0.0,
+            )
+            cost = self._addon_prices[k] * amount
+            addons = np.bincount(r, weights=np.where(cost > 0, cost, 0.0), minlength=n)
+
+        # Окна: цена за штуку × количество, минус стандартные окна
+        windows = np.zeros(n)
+        if len(batch.window_req):
+            cost = self._window_prices[batch.window_idx] * batch.window_qty
+            windows = np.bincount(batch.window_req, weights=cost, minlength=n)
+
+        for group, key in enumerate(self._std_keys):
+            rows = np.flatnonzero(batch.std_idx == group)
+            if not len(rows):
+                continue
+            unit_price, max_m2, qty = self._std_groups[key]
+            rule = np.searchsorted(max_m2, area[rows], side='left')
+            std_qty = np.where(rule < len(qty), qty[np.minimum(rule, len(qty) - 1)], 0.0)
+            windows[rows] -= unit_price * std_qty
+
+        delivery = np.where(batch.distance <= 100, 0.0, (batch.distance - 100) * 120)
+
+        return QuoteTotals(
+            base=base,
+            roof=roof,
+            partitions=batch.partition_cost,
+            addons=addons,
+            windows=windows,
+            delivery=delivery,
+            commission=batch.commission,
+        )
+
+    def calculate_totals(self, reqs: Sequence[CalculateRequestSchema]) -> QuoteTotals:
+        return self.compute(self.encode(reqs))
+
+    def calculate(
+        self,
+        reqs: Sequence[CalculateRequestSchema],
+        detailed: bool = False,
+        detail_indices: Optional[Sequence[int]] = None
+    ) -> List[Union[ItogovayaStoimostSchema, CalculateResponseSchema]]:
+        """
+        Возвращает по элементу на запрос: итоговую стоимость, а для detailed=True
+        (или индексов из detail_indices) - полный ответ с разбивкой.
+        """
+        totals = self.calculate_totals(reqs)
+        if detailed:
+            detail_indices = range(len(reqs))
+        detail_indices = set(detail_indices or ())
+        scalar_engine = PricingEngine()
+        return [
+            scalar_engine.calculate_total(self.catalog, req) if i in detail_indices else totals.item(i)
+            for i, req in enumerate(reqs)
+        ]
@@ -7,11 +7,14 @@ import sys
 # Добавляем путь к корневой директории проекта
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src import models
-
 # Используем in-memory SQLite для тестов
 TEST_DATABASE_URL = "sqlite:///:memory:"
 
+# src.database создает engine при импорте: без явного DATABASE_URL это был бы PostgreSQL из Docker
+os.environ.setdefault("DATABASE_URL", TEST_DATABASE_URL)
+
+from src import models
+
 @pytest.fixture(scope="session")
 def engine():
     """Создает engine для подключения к тестовой БД на всю сессию."""
@@ -0,0 +1,112 @@
+"""
+Локальная замена клиента gspread для тестов и бенчмарков синхронизации
+без сети. Повторяет только используемую часть API: Client.open/open_by_key,
+запрос files.get к Drive через Client.http_client, Spreadsheet.worksheets/worksheet,
+Worksheet.get_all_records.
+"""
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, List
+
+import gspread
+
+
+class FakeWorksheet:
+    def __init__(self, client: "FakeClient", title: str, records: List[Dict[str, Any]]):
+        self._client = client
+        self.title = title
+        self.records = records
+
+    def get_all_records(self) -> List[Dict[str, Any]]:
+        self._client._api_call("values_get")
+        return [dict(row) for row in self.records]
+
+
+class FakeSpreadsheet:
+    def __init__(self, client: "FakeClient", title: str, sheets: Dict[str, List[Dict[str, Any]]]):
+        self._client = client
+        self.title = title
+        self.id = f"key-{title}"
+        self._worksheets = {name: FakeWorksheet(client, name, rows) for name, rows in sheets.items()}
+        # Как modifiedTime в Drive: меняется при любом изменении содержимого
+        self.modified_time = hashlib.sha256(
+            json.dumps(sheets, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()[:16]
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        self._client._api_call("fetch_sheet_metadata")
+        return list(self._worksheets.values())
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self._client._api_call("fetch_sheet_metadata")
+        try:
+            return self._worksheets[title]
+        except KeyError:
+            raise gspread.WorksheetNotFound(title)
+
+
+class FakeResponse:
+    def __init__(self, data: Dict[str, Any]):
+        self._data = data
+
+    def json(self) -> Dict[str, Any]:
+        return self._data
+
+
+class FakeHTTPClient:
+    """Client.http_client: только files.get к Drive (modifiedTime таблицы)."""
+
+    def __init__(self, client: "FakeClient"):
+        self._client = client
+
+    def request(self, method: str, endpoint: str, params: Dict[str, Any] = None) -> FakeResponse:
+        self._client._api_call("drive_files_get")
+        spreadsheet = self._client._by_key(endpoint.rsplit("/", 1)[-1])
+        return FakeResponse({"modifiedTime": spreadsheet.modified_time})
+
+
+class FakeClient:
+    """
+    Клиент с таблицами в памяти. latency_s имитирует задержку каждого
+    API-запроса; calls и max_in_flight позволяют проверить число запросов
+    и степень параллелизма.
+    """
+
+    def __init__(self, spreadsheets: Dict[str, Dict[str, List[Dict[str, Any]]]], latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.calls: List[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._spreadsheets = {title: FakeSpreadsheet(self, title, sheets) for title, sheets in spreadsheets.items()}
+        self.http_client = FakeHTTPClient(self)
+
+    def _api_call(self, name: str) -> None:
+        with self._lock:
+            self.calls.append(name)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency_s:
+                time.sleep(self.latency_s)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        self._api_call("open_by_key")
+        return self._by_key(key)
+
+    def _by_key(self, key: str) -> FakeSpreadsheet:
+        for spreadsheet in self._spreadsheets.values():
+            if spreadsheet.id == key:
+                return spreadsheet
+        raise gspread.SpreadsheetNotFound(key)
+
+    def open(self, title: str) -> FakeSpreadsheet:
+        self._api_call("open")
+        try:
+            return self._spreadsheets[title]
+        except KeyError:
+            raise gspread.SpreadsheetNotFound(title)
@@ -0,0 +1,89 @@
+import sys
+import os
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from src.schemas import BatchCalculateResponseSchema, CalculateRequestSchema
+from src.json_response import dumps
+from src.main import app
+from src.pricing_engine import PricingEngine
+from src.price_catalog import PriceCatalog, get_catalog
+from tests.test_pricing_engine import seed_database
+
+
+def make_payload(length_m=6.0, width_m=8.0, **overrides):
+    payload = {
+        "house": {"length_m": length_m, "width_m": width_m},
+        "ceiling": {"type": "flat", "height_m": 2.5},
+        "roof": {"overhang_cm": "std"},
+        "partitions": {"enabled": False},
+        "insulation": {"brand": "izobel", "mm": 100, "build_tech": "panel"},
+        "delivery": {"distance_km": 120},
+        "addons": [{"code": "ADDON_AREA"}],
+    }
+    payload.update(overrides)
+    return payload
+
+
+@pytest.fixture
+def catalog(db_session):
+    seed_database(db_session)
+    return PriceCatalog.load(db_session)
+
+
+class TestCalculateBatch:
+    def test_results_keep_input_order(self, catalog):
+        payloads = [make_payload(6.0, 6.0), make_payload(8.0, 10.0), make_payload(5.0, 5.0)]
+        results = PricingEngine().calculate_batch(catalog, payloads)
+
+        assert [item["Индекс"] for item in results] == [0, 1, 2]
+        for item, payload in zip(results, payloads):
+            single = PricingEngine().calculate_document(catalog, CalculateRequestSchema.model_validate(payload))
+            assert item["Ошибка"] is None
+            assert item["Результат"] == single
+
+    def test_errors_are_reported_per_item(self, catalog):
+        payloads = [make_payload(), make_payload(house={"length_m": -1, "width_m": 8.0}), {"house": {}}, make_payload()]
+        results = PricingEngine().calculate_batch(catalog, payloads)
+
+        assert results[0]["Результат"] is not None
+        assert results[1]["Ошибка"]["Тип"] == 'validation'
+        assert results[1]["Ошибка"]["Детали"][0]['loc'] == ('house', 'length_m')
+        assert results[2]["Ошибка"]["Тип"] == 'validation'
+        assert results[3]["Результат"] == results[0]["Результат"]
+
+    def test_items_match_response_schema(self, catalog):
+        results = PricingEngine().calculate_batch(catalog, [make_payload(), {"house": {}}])
+        response = {"Версия_прайса": catalog.version, "Результаты": results}
+
+        validated = BatchCalculateResponseSchema.model_validate(response)
+        assert dumps(response) == JSONResponse(validated.model_dump(mode="json")).body
+
+    def test_totals_are_computed_by_vectorized_engine(self, catalog, monkeypatch):
+        payloads = [make_payload(6.0, 6.0), None, make_payload(8.0, 10.0, delivery={"distance_km": 300})]
+        expected = [PricingEngine().calculate_document(catalog, CalculateRequestSchema.model_validate(payload), 'totals')
+                    for payload in payloads if payload is not None]
+        monkeypatch.setattr(PricingEngine, "calculate_document", None)
+
+        results = PricingEngine().calculate_batch(catalog, payloads, 'totals')
+
+        assert [item["Результат"] for item in results if item["Ошибка"] is None] == expected
+        assert results[1]["Ошибка"]["Тип"] == 'validation'
+
+
+class TestCalculateBatchEndpoint:
+    def test_non_object_items_are_reported_per_item(self, catalog):
+        app.dependency_overrides[get_catalog] = lambda: catalog
+        try:
+            response = TestClient(app).post("/calculate/batch", json=[make_payload(), None, "lead", 42])
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        results = response.json()["Результаты"]
+        assert results[0]["Ошибка"] is None and results[0]["Результат"]["Итоговая_стоимость"]
+        assert [item["Ошибка"]["Тип"] for item in results[1:]] == ['validation'] * 3
@@ -0,0 +1,54 @@
+import sys
+import os
+import copy
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.catalog import CATALOG_SIZES, CatalogSize, seed_synthetic_catalog
+from benchmarks.request_mix import generate_payloads
+from benchmarks.run import compare_with_baseline, run_benchmark
+from benchmarks.stats import latency_summary, percentile
+from src import models
+from src.price_catalog import PriceCatalog
+
+TINY = CatalogSize(addons=12, window_widths=6, window_heights=6, extra_brands=1, extra_thicknesses=1, contours=2, floors=2)
+
+
+class TestSyntheticCatalog:
+    def test_seeds_requested_sizes(self, db_session):
+        synthetic = seed_synthetic_catalog(db_session, TINY)
+        assert db_session.query(models.BasePriceM2).count() == TINY.base_price_rows
+        assert db_session.query(models.WindowBasePrice).count() == TINY.window_prices
+        catalog = PriceCatalog.load(db_session)
+        assert catalog.version is not None
+        assert catalog.addon(synthetic.addon_codes[-1]) is not None
+        assert catalog.window_base_price(100, 100, 'povorot_otkid') is not None
+
+    def test_request_mix_is_deterministic(self, db_session):
+        synthetic = seed_synthetic_catalog(db_session, TINY)
+        assert generate_payloads(synthetic, 50, seed=3) == generate_payloads(synthetic, 50, seed=3)
+        assert generate_payloads(synthetic, 50, seed=3) != generate_payloads(synthetic, 50, seed=4)
+
+
+class TestBenchmarkRun:
+    def test_reports_percentiles_and_compares_with_baseline(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(CATALOG_SIZES, 'tiny', TINY)
+        result = run_benchmark(f"sqlite:///{tmp_path / 'bench.db'}", 'tiny', requests=100, warmup=10, catalog_loads=2)
+        latency = result['calculate_total']['latency_ms']
+        assert result['backend'] == 'sqlite'
+        assert 0 < latency['p50'] <= latency['p95'] <= latency['p99'] <= latency['max']
+        assert compare_with_baseline(result, result) == []
+
+        slower = copy.deepcopy(result)
+        slower['calculate_total']['latency_ms']['p95'] *= 2
+        slower['calculate_total']['throughput_rps'] /= 2
+        regressions = compare_with_baseline(result, slower)
+        assert any(r.startswith('throughput_rps') for r in regressions)
+        assert any(r.startswith('calculate_total.p95') for r in regressions)
+
+
+class TestStats:
+    def test_percentile_interpolates(self):
+        assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+        assert percentile([5.0], 99) == 5.0
+        assert latency_summary([0.001, 0.002])['max'] == 2.0
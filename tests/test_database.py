@@ -0,0 +1,77 @@
+import sys
+import os
+import logging
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from src import database, models
+from src.database import instrument_queries, track_queries
+from src.price_catalog import PriceCatalog
+from src.pricing_engine import PricingEngine
+from tests.test_price_catalog import seed_windows, full_req  # noqa: F401 (фикстура)
+from tests.test_pricing_engine import seed_database
+
+# Запросов на загрузку снимка прайса: по одному на раздел, рост числа означает N+1
+CATALOG_LOAD_QUERY_BUDGET = 10
+
+
+@pytest.fixture
+def tracked_engine(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'queries.db'}")
+    instrument_queries(db_engine)
+    models.Base.metadata.create_all(bind=db_engine)
+    yield db_engine
+    db_engine.dispose()
+
+
+class TestTrackQueries:
+    def test_counts_queries_inside_block_only(self, tracked_engine):
+        with tracked_engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+            with track_queries() as stats:
+                conn.execute(text('SELECT 2'))
+                conn.execute(text('SELECT 3'))
+            conn.execute(text('SELECT 4'))
+        assert stats.count == 2
+        assert stats.seconds > 0
+
+    def test_nested_blocks_are_independent(self, tracked_engine):
+        with tracked_engine.connect() as conn:
+            with track_queries() as outer:
+                conn.execute(text('SELECT 1'))
+                with track_queries() as inner:
+                    conn.execute(text('SELECT 2'))
+                conn.execute(text('SELECT 3'))
+        assert (outer.count, inner.count) == (2, 1)
+
+    def test_slow_query_is_logged_with_parameters(self, tracked_engine, monkeypatch, caplog):
+        monkeypatch.setattr(database, 'SLOW_QUERY_MS', 1e-6)
+        with caplog.at_level(logging.WARNING, logger='src.database'), tracked_engine.connect() as conn:
+            conn.execute(text('SELECT :value'), {'value': 'marker-42'})
+        assert any('SELECT ?' in r.getMessage() and 'marker-42' in r.getMessage() for r in caplog.records)
+
+    def test_fast_queries_are_not_logged(self, tracked_engine, monkeypatch, caplog):
+        monkeypatch.setattr(database, 'SLOW_QUERY_MS', 60_000)
+        with caplog.at_level(logging.WARNING, logger='src.database'), tracked_engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+        assert not caplog.records
+
+
+class TestQuoteQueryBudget:
+    def test_standard_quote_stays_within_query_budget(self, tracked_engine, full_req):
+        with Session(tracked_engine) as db:
+            seed_database(db)
+            seed_windows(db)
+            with track_queries() as load_stats:
+                catalog = PriceCatalog.load(db)
+
+        with track_queries() as quote_stats:
+            PricingEngine().calculate_total(catalog, full_req)
+
+        assert load_stats.count <= CATALOG_LOAD_QUERY_BUDGET
+        # Расчет идет по снимку прайса: ни одного запроса на окна, замены и т.д.
+        assert quote_stats.count == 0
@@ -0,0 +1,132 @@
+import sys
+import os
+import json
+import math
+import asyncio
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.responses import JSONResponse
+
+from src import json_response
+from src.json_response import dumps
+from src import pricing_engine
+from src.pricing_engine import PricingEngine, AsyncPricingEngine
+from src.quote_cache import QuoteCache
+from src.schemas import CalculateResponseSchema, CalculateSectionsResponseSchema, CalculateTotalsResponseSchema
+from tests.test_price_catalog import catalog, full_req  # noqa: F401 (фикстуры)
+
+CONTENT = {
+    "Цена_руб": [0.0, 0.1, 1234567.89, 50.629999999999995, 1e-05, 1.5e16, 12, -3],
+    "Текст": "Перегородки (insul50)\n\t\"кавычки\" \\ \x01 ₽ × м²",
+    "Пусто": None,
+    "Флаги": [True, False],
+}
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(json_response, "orjson", None)
+    elif json_response.orjson is None:
+        pytest.skip("orjson не установлен")
+
+
+class TestDumps:
+    def test_bytes_match_json_response(self, encoder):
+        assert dumps(CONTENT) == JSONResponse(CONTENT).body
+        assert dumps({"a": 1.0}) == JSONResponse({"a": 1.0}).body
+
+    @pytest.mark.parametrize("value", [2.5e-05, -6.4e-05, 1e-05, 9.99e-06, 0.0001, 10.00001, 1e16])
+    def test_single_float_matches_json_response(self, encoder, value):
+        # Отдельно от CONTENT: там 1.5e16 и так уводит весь ответ в json
+        assert dumps({"a": value}) == JSONResponse({"a": value}).body
+
+    def test_nan_is_rejected_like_json_response(self, encoder):
+        with pytest.raises(ValueError):
+            dumps({"Сумма_руб": math.nan})
+
+
+class TestCalculateDocument:
+    def test_document_serializes_like_validated_response(self, catalog, full_req):
+        document = PricingEngine().calculate_document(catalog, full_req)
+        validated = CalculateResponseSchema.model_validate(document)
+
+        # Так /calculate отдавал ответ раньше: response_model + JSONResponse
+        assert dumps(document) == JSONResponse(validated.model_dump(mode="json")).body
+        assert document["Конструктив"]["Дополнения"][0]["Код"] == "CEILING_H"
+        assert isinstance(document["Габариты"]["Площадь_террас_м2"], float)
+
+    def test_tiny_house_serializes_like_json_response(self, catalog, full_req):
+        req = full_req.model_copy(update={"house": full_req.house.model_copy(update={"length_m": 0.005, "width_m": 0.005})})
+        document = PricingEngine().calculate_document(catalog, req)
+
+        assert document["Габариты"]["Площадь_теплого_контура_м2"] == pytest.approx(2.5e-05)
+        assert dumps(document) == JSONResponse(document).body
+
+    def test_calculate_total_returns_schema(self, catalog, full_req):
+        engine = PricingEngine()
+        assert engine.calculate_total(catalog, full_req).model_dump() == engine.calculate_document(catalog, full_req)
+
+
+class StaticStore:
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    async def get_async(self):
+        return self.catalog
+
+
+class TestDetailLevels:
+    def test_sparse_documents_match_full_totals(self, catalog, full_req):
+        engine = PricingEngine()
+        full = engine.calculate_document(catalog, full_req)
+        sections = engine.calculate_document(catalog, full_req, 'sections')
+        totals = engine.calculate_document(catalog, full_req, 'totals')
+
+        assert CalculateTotalsResponseSchema.model_validate(totals).model_dump() == totals
+        assert CalculateSectionsResponseSchema.model_validate(sections).model_dump() == sections
+        assert totals == {"Итоговая_стоимость": full["Итоговая_стоимость"], "Версия_прайса": catalog.version}
+        assert sections["Габариты"] == full["Габариты"]
+        assert sections["Окна_и_двери"] == {"Итого_по_разделу_руб": full["Окна_и_двери"]["Итого_по_разделу_руб"]}
+        addons = [item["Сумма_руб"] for item in full["Конструктив"]["Дополнения"] if item["Код"] != "DELIVERY"]
+        assert sections["Конструктив"]["Дополнения_руб"] == pytest.approx(sum(addons))
+        assert sections["Конструктив"]["Доставка_руб"] == full["Конструктив"]["Доставка_руб"] > 0
+
+    @pytest.mark.parametrize("detail", ["sections", "totals"])
+    def test_sparse_modes_skip_detail_rows(self, catalog, full_req, monkeypatch, detail):
+        def unexpected(*args):
+            raise AssertionError("строка разбивки в сокращенном режиме")
+
+        monkeypatch.setattr(pricing_engine, "_addon_item", unexpected)
+        monkeypatch.setattr(pricing_engine, "WINDOW_TYPE_TITLES", None)
+        document = PricingEngine().calculate_document(catalog, full_req, detail)
+        assert document["Итоговая_стоимость"]["Окончательная_цена_руб"] > 0
+
+    def test_cached_json_per_detail_level(self, catalog, full_req):
+        cache = QuoteCache()
+        engine = AsyncPricingEngine(StaticStore(catalog), cache=cache)
+
+        full = asyncio.run(engine.calculate_json(full_req))
+        totals = asyncio.run(engine.calculate_json(full_req, 'totals'))
+
+        assert set(json.loads(totals)) == {"Итоговая_стоимость", "Версия_прайса"}
+        assert json.loads(full)["Итоговая_стоимость"] == json.loads(totals)["Итоговая_стоимость"]
+        assert asyncio.run(engine.calculate_json(full_req, 'totals')) == totals
+        assert cache.stats()["entries"] == 2 and cache.stats()["hits"] == 1
+
+    def test_cached_breakdown_follows_request_order(self, catalog, full_req):
+        cache = QuoteCache()
+        engine = AsyncPricingEngine(StaticStore(catalog), cache=cache)
+        reordered = full_req.model_copy(update={"addons": list(reversed(full_req.addons))})
+
+        def codes(body):
+            return [item["Код"] for item in json.loads(body)["Конструктив"]["Дополнения"] if item["Код"].startswith("ADDON")]
+
+        assert codes(asyncio.run(engine.calculate_json(full_req))) == ["ADDON_AREA", "ADDON_COUNT"]
+        assert codes(asyncio.run(engine.calculate_json(reordered))) == ["ADDON_COUNT", "ADDON_AREA"]
+        # Итоги от порядка не зависят - одна запись на оба запроса
+        asyncio.run(engine.calculate_json(full_req, 'totals'))
+        asyncio.run(engine.calculate_json(reordered, 'totals'))
+        assert cache.stats()["entries"] == 3
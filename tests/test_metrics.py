@@ -0,0 +1,81 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, text
+
+from src import metrics
+from src.metrics import MetricsRegistry
+from src.pricing_engine import PricingEngine, PRICING_STAGES, instrument_pricing_engine
+from tests.test_price_catalog import catalog, full_req  # noqa: F401 (фикстуры)
+
+
+class TestMetricsRegistry:
+    def test_renders_prometheus_text(self):
+        registry = MetricsRegistry()
+        registry.counter('requests', 'Requests', ('path',)).labels('/calculate').inc(3)
+        hist = registry.histogram('latency_seconds', 'Latency', ('stage',), buckets=(0.1, 1.0))
+        hist.labels('roof').observe(0.05)
+        hist.labels('roof').observe(2.0)
+        registry.register_collector('cache', 'Cache', lambda: {(('counter', 'hits'),): 7})
+
+        lines = registry.render().splitlines()
+        assert '# TYPE requests counter' in lines
+        assert 'requests_total{path="/calculate"} 3' in lines
+        assert '# TYPE latency_seconds histogram' in lines
+        assert 'latency_seconds_bucket{stage="roof",le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{stage="roof",le="+Inf"} 2' in lines
+        assert 'latency_seconds_count{stage="roof"} 2' in lines
+        assert 'cache{counter="hits"} 7' in lines
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter('errors', 'Errors', ('message',)).labels('say "hi"\n').inc()
+        assert 'errors_total{message="say \\"hi\\"\\n"} 1' in registry.render()
+
+
+class TestPricingStageMetrics:
+    def test_every_stage_is_timed(self, catalog, full_req):
+        class Engine(PricingEngine):
+            pass
+
+        registry = MetricsRegistry()
+        instrument_pricing_engine(Engine, registry)
+        Engine().calculate_total(catalog, full_req)
+
+        duration = registry.histogram('pricing_stage_duration_seconds', '', ('stage',))
+        for stage in PRICING_STAGES:
+            assert duration.labels(stage).count == 1, stage
+        assert duration.labels('total').sum >= duration.labels('base_price').sum
+
+    def test_instrumenting_twice_does_not_double_count(self, catalog, full_req):
+        class Engine(PricingEngine):
+            pass
+
+        registry = MetricsRegistry()
+        instrument_pricing_engine(Engine, registry)
+        instrument_pricing_engine(Engine, registry)
+        Engine().calculate_total(catalog, full_req)
+        assert registry.histogram('pricing_stage_duration_seconds', '', ('stage',)).labels('roof').count == 1
+
+    def test_queries_are_counted_per_stage(self, catalog, full_req, monkeypatch):
+        monkeypatch.setattr(metrics, 'METRICS_ENABLED', True)
+        db_engine = create_engine('sqlite://')
+        metrics.count_queries(db_engine)
+
+        class Engine(PricingEngine):
+            def _calculate_delivery_cost(self, catalog, req, with_details=True):
+                with db_engine.connect() as conn:
+                    conn.execute(text('SELECT 1'))
+                    conn.execute(text('SELECT 2'))
+                return super()._calculate_delivery_cost(catalog, req, with_details)
+
+        registry = MetricsRegistry()
+        instrument_pricing_engine(Engine, registry)
+        Engine().calculate_total(catalog, full_req)
+
+        queries = registry.counter('pricing_stage_queries', '', ('stage',))
+        assert queries.labels('delivery').value == 2
+        assert queries.labels('roof').value == 0
+        assert 'pricing_stage_queries_total{stage="delivery"} 2' in registry.render()
@@ -0,0 +1,62 @@
+import sys
+import os
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import QueuePool
+
+from src.metrics import Histogram
+from src.pool_metrics import PoolStats, instrumented_pool_class
+
+
+@pytest.fixture
+def pooled_engine(tmp_path):
+    stats = PoolStats("test")
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=instrumented_pool_class(QueuePool, stats),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    stats.attach(engine.pool)
+    yield engine, stats
+    engine.dispose()
+
+
+class TestHistogram:
+    def test_cumulative_buckets(self):
+        hist = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            hist.observe(value)
+        assert hist.cumulative_counts() == [1, 3, 4]
+        assert hist.snapshot()["count"] == 4
+
+
+class TestPoolStats:
+    def test_checkouts_and_wait_time_are_recorded(self, pooled_engine):
+        engine, stats = pooled_engine
+        for _ in range(3):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+
+        snapshot = stats.snapshot()
+        assert snapshot["pool_class"] == "InstrumentedQueuePool"
+        assert snapshot["checkouts"] == 3
+        assert snapshot["checkins"] == 3
+        assert snapshot["connects"] == 1
+        assert snapshot["size"] == 1
+        assert snapshot["checked_out"] == 0
+        assert snapshot["wait_seconds"]["count"] == 3
+
+    def test_exhausted_pool_counts_timeout(self, pooled_engine):
+        engine, stats = pooled_engine
+        with engine.connect():
+            assert stats.snapshot()["checked_out"] == 1
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+
+        assert stats.timeouts == 1
+        assert stats.wait_seconds.sum >= 0.05
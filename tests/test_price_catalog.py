@@ -0,0 +1,276 @@
+import sys
+import os
+from decimal import Decimal
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.schemas import CalculateRequestSchema, HouseSchema, CeilingSchema, RoofSchema, PartitionsSchema, InsulationSchema, DeliverySchema, WindowSelectionSchema, AddonSchema
+from src.pricing_engine import PricingEngine
+from src.price_catalog import PriceCatalog, CatalogStore, publish_catalog_version, rebuild_base_price_lookup, ensure_base_price_lookup
+from src import models
+from tests.test_pricing_engine import seed_database
+
+
+def seed_windows(db_session):
+    """Добавляет окна, модификаторы и стандартное включение к базовому сидеру."""
+    tech_panel = db_session.query(models.BuildTechnology).filter_by(code='panel').one()
+    contour_warm = db_session.query(models.Contour).filter_by(code='warm').one()
+    storey_one = db_session.query(models.StoreyType).filter_by(code='one').one()
+    db_session.add_all([
+        models.WindowBasePrice(width_cm=100, height_cm=100, type='povorot_otkid', base_price_rub=Decimal('8000')),
+        models.WindowBasePrice(width_cm=150, height_cm=150, type='povorot_otkid', base_price_rub=Decimal('14400')),
+        models.WindowModifier(two_chambers=False, laminated=False, multiplier=Decimal('1.0')),
+        models.WindowModifier(two_chambers=True, laminated=True, multiplier=Decimal('1.7')),
+        models.StdInclusion(
+            tech_id=tech_panel.id, contour_id=contour_warm.id, storey_type_id=storey_one.id,
+            included_window_width_cm=100, included_window_height_cm=100, included_window_type='povorot_otkid',
+            area_to_qty=[{"max_m2": 36, "qty": 2}, {"max_m2": 9999, "qty": 4}],
+        ),
+    ])
+    db_session.commit()
+
+
+@pytest.fixture
+def catalog(db_session):
+    seed_database(db_session)
+    seed_windows(db_session)
+    return PriceCatalog.load(db_session)
+
+
+@pytest.fixture
+def full_req():
+    return CalculateRequestSchema(
+        house=HouseSchema(length_m=6.0, width_m=8.0),
+        ceiling=CeilingSchema(type='flat', height_m=2.5),
+        roof=RoofSchema(overhang_cm='30'),
+        partitions=PartitionsSchema(enabled=True, type='plain', run_m=10),
+        insulation=InsulationSchema(brand='izobel', mm=100, build_tech='panel'),
+        delivery=DeliverySchema(distance_km=150.0),
+        addons=[AddonSchema(code='ADDON_AREA'), AddonSchema(code='ADDON_COUNT', quantity=2)],
+        windows=[WindowSelectionSchema(width_cm=150, height_cm=150, type='povorot_otkid', quantity=2, dual_chamber=True, laminated=True)],
+        commission_rub=30000.0,
+    )
+
+
+class TestPriceCatalog:
+    def test_indexes_by_codes(self, catalog):
+        assert catalog.base_price('panel', 'izobel', 100, 'one', 'warm') == Decimal('10000')
+        assert catalog.base_price('panel', 'technonicol', 100, 'one', 'warm') is None
+        assert catalog.ceiling_height_price(2.5) == Decimal('100')
+        assert catalog.roof_overhang_price(30) == Decimal('150')
+        assert catalog.partition_price('plain').price_per_pm == Decimal('1000')
+        assert catalog.addon('ADDON_ROOF').params['reserve_m'] == 1.5
+        assert catalog.window_base_price(150, 150, 'povorot_otkid') == Decimal('14400')
+        assert catalog.window_modifier(True, True) == Decimal('1.7')
+        assert catalog.std_inclusion('panel', 'warm', 'one').window_type == 'povorot_otkid'
+
+    def test_is_immutable(self, catalog):
+        with pytest.raises(AttributeError):
+            catalog.addons = {}
+        with pytest.raises(TypeError):
+            catalog.addons['NEW'] = None
+
+    def test_calculate_total_without_session(self, catalog, full_req, db_session):
+        db_session.close()
+        result = PricingEngine().calculate_total(catalog, full_req)
+
+        area = 48.0
+        expected = (
+            10000 * area            # база
+            + 100 * area            # высота потолка 2.5
+            + 150 * area            # вынос 30см
+            + 1000 * 10             # перегородки
+            + 100 * area + 5000 * 2  # допы
+            + 14400 * 1.7 * 2 - 8000 * 4  # окна минус 4 стандартных
+            + (150 - 100) * 120     # доставка
+        )
+        assert result.Итоговая_стоимость.Итого_без_комиссии_руб == pytest.approx(expected)
+        assert result.Итоговая_стоимость.Окончательная_цена_руб == pytest.approx(expected + 30000)
+        assert [item.Код for item in result.Конструктив.Дополнения] == ['CEILING_H', 'OVERHANG', 'PARTITIONS', 'ADDON_AREA', 'ADDON_COUNT', 'DELIVERY']
+
+
+class TestCatalogStore:
+    def test_loads_lazily_once(self, db_session):
+        seed_database(db_session)
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return db_session
+
+        store = CatalogStore(factory)
+        first = store.get()
+        assert store.get() is first
+        assert len(calls) == 1
+
+    def test_reload_swaps_snapshot(self, db_session):
+        seed_database(db_session)
+        store = CatalogStore(lambda: db_session)
+        old = store.get()
+        db_session.add(models.Addon(code='NEW_ADDON', title='New', calc_mode='AREA', price=Decimal('1')))
+        db_session.commit()
+        new = store.reload(db_session)
+        assert store.get() is new
+        assert old.addon('NEW_ADDON') is None
+        assert new.addon('NEW_ADDON') is not None
+
+
+class TestCatalogVersions:
+    def test_publish_is_monotonic_and_skips_unchanged_content(self, db_session):
+        seed_database(db_session)
+        first = publish_catalog_version(db_session)
+        assert publish_catalog_version(db_session).id == first.id
+
+        db_session.add(models.Addon(code='NEW_ADDON', title='New', calc_mode='AREA', price=Decimal('1')))
+        db_session.commit()
+        second = publish_catalog_version(db_session)
+        assert second.id > first.id
+        assert second.content_hash != first.content_hash
+
+    def test_refresh_swaps_only_on_new_version(self, db_session, full_req):
+        seed_database(db_session)
+        publish_catalog_version(db_session)
+        store = CatalogStore(lambda: db_session)
+        in_flight = store.get()
+        assert store.refresh() is False
+
+        db_session.query(models.BasePriceM2).update({models.BasePriceM2.price_rub: Decimal('20000')})
+        rebuild_base_price_lookup(db_session)
+        db_session.commit()
+        # Пока версия не опубликована, воркер продолжает считать по старому снимку
+        assert store.refresh() is False
+        version_id = publish_catalog_version(db_session).id
+        assert store.refresh() is True
+
+        assert store.get().version == version_id
+        assert in_flight.base_price('panel', 'izobel', 100, 'one', 'warm') == Decimal('10000')
+        result = PricingEngine().calculate_total(store.get(), full_req)
+        assert result.Версия_прайса == version_id
+        assert result.Конструктив.База_руб == pytest.approx(20000 * 48.0)
+
+    def test_refresh_closes_session_when_snapshot_fails(self):
+        closed = []
+
+        class FailingSession:
+            def get_bind(self):
+                raise RuntimeError("SET TRANSACTION failed")
+
+            def close(self):
+                closed.append(1)
+
+        store = CatalogStore(FailingSession)
+        with pytest.raises(RuntimeError):
+            store.refresh()
+        assert closed == [1]
+
+
+class TestWindowPriceGrid:
+    def test_unit_prices_cover_all_modifier_combinations(self, catalog):
+        assert catalog.window_unit_price(150, 150, 'povorot_otkid', True, True) == pytest.approx(14400 * 1.7)
+        assert catalog.window_unit_price(150, 150, 'povorot_otkid', False, False) == pytest.approx(14400)
+        # Комбинации нет в прайсе - множитель 1.0
+        assert catalog.window_unit_price(150, 150, 'povorot_otkid', True, False) == pytest.approx(14400)
+        assert catalog.window_unit_price(120, 150, 'povorot_otkid', False, False) is None
+
+    def test_many_window_lines(self, catalog, full_req):
+        full_req.windows = [
+            WindowSelectionSchema(width_cm=150, height_cm=150, type='povorot_otkid', quantity=1, dual_chamber=bool(i % 2), laminated=bool(i % 2))
+            for i in range(15)
+        ] + [WindowSelectionSchema(width_cm=999, height_cm=999, type='gluh')]
+        cost, details = PricingEngine()._calculate_windows_price(catalog, full_req)
+        assert len(details) == 15
+        assert cost == pytest.approx(14400 * 8 + 14400 * 1.7 * 7)
+
+
+class TestBasePriceLookup:
+    def test_rebuild_flattens_codes(self, db_session):
+        seed_database(db_session)
+        row = db_session.query(models.BasePriceLookup).filter_by(brand='neman_plus', mm=200).one()
+        assert (row.build_tech, row.storey_type_code, row.contour_code) == ('frame', 'mansard', 'warm')
+        assert row.price_rub == Decimal('18000')
+        assert db_session.query(models.BasePriceLookup).count() == db_session.query(models.BasePriceM2).count()
+
+    def test_lookup_key_is_unique(self, db_session):
+        index = next(i for i in models.BasePriceLookup.__table__.indexes if i.name == 'uniq_base_price_lookup')
+        assert index.unique
+        assert [c.name for c in index.columns] == [
+            'build_tech', 'brand', 'mm', 'storey_type_code', 'contour_code', 'floor_no', 'frame_thickness_mm']
+
+    def test_duplicate_source_rows_keep_first(self, db_session):
+        seed_database(db_session)
+        first = db_session.query(models.BasePriceM2).order_by(models.BasePriceM2.id).first()
+        db_session.add(models.BasePriceM2(
+            tech_id=first.tech_id, contour_id=first.contour_id, brand_id=first.brand_id,
+            thickness_id=first.thickness_id, storey_type_id=first.storey_type_id, price_rub=Decimal('1')))
+        rebuild_base_price_lookup(db_session)
+        assert PriceCatalog.load(db_session).base_price('panel', 'izobel', 100, 'one', 'warm') == Decimal('10000')
+
+    def test_ensure_builds_missing_lookup_once(self, db_session):
+        seed_database(db_session)
+        db_session.query(models.BasePriceLookup).delete()
+        assert ensure_base_price_lookup(db_session) is True
+        assert ensure_base_price_lookup(db_session) is False
+        assert PriceCatalog.load(db_session).base_price('panel', 'izobel', 150, 'one', 'warm') == Decimal('12000')
+
+
+class TestAsyncCatalogLoading:
+    def test_load_async_matches_sync_load(self, tmp_path):
+        import asyncio
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import Session
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        db_path = tmp_path / "catalog.db"
+        sync_engine = create_engine(f"sqlite:///{db_path}")
+        models.Base.metadata.create_all(bind=sync_engine)
+        with Session(sync_engine) as db:
+            seed_database(db)
+            seed_windows(db)
+            publish_catalog_version(db)
+            expected = PriceCatalog.load(db)
+
+        async def load():
+            async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+            try:
+                store = CatalogStore(lambda: None, async_sessionmaker(async_engine))
+                return await store.get_async()
+            finally:
+                await async_engine.dispose()
+
+        catalog = asyncio.run(load())
+        assert catalog.version == expected.version == 1
+        assert catalog.content_hash == expected.content_hash
+
+    def test_load_async_falls_back_to_one_snapshot_when_version_keeps_changing(self, tmp_path, monkeypatch):
+        import asyncio
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import Session
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        from src import price_catalog
+
+        db_path = tmp_path / "catalog.db"
+        sync_engine = create_engine(f"sqlite:///{db_path}")
+        models.Base.metadata.create_all(bind=sync_engine)
+        with Session(sync_engine) as db:
+            seed_database(db)
+            expected = PriceCatalog.load(db)
+
+        # Каждая проверка видит новую версию - параллельная загрузка не сходится
+        versions = iter(range(1, 100))
+        snapshots = []
+        monkeypatch.setattr(price_catalog, 'latest_catalog_version_id', lambda db: next(versions))
+        monkeypatch.setattr(price_catalog, 'begin_snapshot', lambda db: snapshots.append(db) or db)
+
+        async def load():
+            async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+            try:
+                return await PriceCatalog.load_async(async_sessionmaker(async_engine), max_attempts=2)
+            finally:
+                await async_engine.dispose()
+
+        catalog = asyncio.run(load())
+        assert len(snapshots) == 1
+        # 2 попытки по 2 проверки версии, затем загрузка в одной транзакции
+        assert catalog.version == 5
+        assert catalog.content_hash == expected.content_hash
@@ -7,6 +7,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from src.schemas import CalculateRequestSchema, HouseSchema, CeilingSchema, RoofSchema, PartitionsSchema, InsulationSchema, DeliverySchema, WindowSelectionSchema, AddonSchema
 from src.pricing_engine import PricingEngine
+from src.price_catalog import PriceCatalog, rebuild_base_price_lookup
 from src import models
 
 def seed_database(db_session):
@@ -66,6 +67,8 @@ def seed_database(db_session):
         models.Addon(code='ADDON_COUNT', title='Count Addon', calc_mode='COUNT', price=Decimal('5000')),
         models.Addon(code='ADDON_ROOF', title='Roof Addon', calc_mode='ROOF_L_SIDES', price=Decimal('300'), params={'sides': 2, 'reserve_m': 1.5}),
     ])
+    db_session.flush()
+    rebuild_base_price_lookup(db_session)
     db_session.commit()
 
 @pytest.fixture
@@ -99,14 +102,14 @@ class TestBasePrice:
         base_req.insulation.build_tech = tech
         base_req.ceiling.type = 'rafters' if storey == 'mansard' else 'flat'
         area = base_req.house.length_m * base_req.house.width_m
-        price = engine_instance._get_base_price(db_session, base_req, area)
+        price = engine_instance._get_base_price(PriceCatalog.load(db_session), base_req, area)
         assert price == pytest.approx(expected_price_m2 * area)
 
     def test_price_not_found(self, engine_instance, base_req, db_session):
         seed_database(db_session)
         base_req.insulation.brand = 'technonicol'
         area = base_req.house.length_m * base_req.house.width_m
-        price = engine_instance._get_base_price(db_session, base_req, area)
+        price = engine_instance._get_base_price(PriceCatalog.load(db_session), base_req, area)
         assert price == 0.0
 
 class TestRoofCosts:
@@ -115,7 +118,7 @@ class TestRoofCosts:
         seed_database(db_session)
         base_req.ceiling.height_m = height
         area = base_req.house.length_m * base_req.house.width_m
-        cost, _ = engine_instance._calculate_roof_costs(db_session, base_req, area)
+        cost, _ = engine_instance._calculate_roof_costs(PriceCatalog.load(db_session), base_req, area)
         assert cost == pytest.approx(area * expected_add)
 
     @pytest.mark.parametrize("overhang, expected_add", [('std', 0), ('30', 150), ('40', 200), ('50', 250)])
@@ -123,7 +126,7 @@ class TestRoofCosts:
         seed_database(db_session)
         base_req.roof.overhang_cm = overhang
         area = base_req.house.length_m * base_req.house.width_m
-        cost, _ = engine_instance._calculate_roof_costs(db_session, base_req, area)
+        cost, _ = engine_instance._calculate_roof_costs(PriceCatalog.load(db_session), base_req, area)
         assert cost == pytest.approx(area * expected_add)
 
     def test_ridge_height_ignored_for_rafters(self, engine_instance, base_req, db_session):
@@ -131,7 +134,7 @@ class TestRoofCosts:
         base_req.ceiling.type = 'rafters'
         base_req.ceiling.ridge_delta_cm = 50
         area = base_req.house.length_m * base_req.house.width_m
-        cost, _ = engine_instance._calculate_roof_costs(db_session, base_req, area)
+        cost, _ = engine_instance._calculate_roof_costs(PriceCatalog.load(db_session), base_req, area)
         assert cost == 0.0
 
     @pytest.mark.parametrize("delta_cm", [10, 50])
@@ -139,7 +142,7 @@ class TestRoofCosts:
         seed_database(db_session)
         base_req.ceiling.ridge_delta_cm = delta_cm
         area = base_req.house.length_m * base_req.house.width_m
-        cost, _ = engine_instance._calculate_roof_costs(db_session, base_req, area)
+        cost, _ = engine_instance._calculate_roof_costs(PriceCatalog.load(db_session), base_req, area)
         assert cost == 0.0
 
 class TestPartitions:
@@ -149,7 +152,7 @@ class TestPartitions:
         base_req.partitions.enabled = True
         base_req.partitions.type = part_type
         base_req.partitions.run_m = run_m
-        cost, _ = engine_instance._calculate_partitions_cost(db_session, base_req)
+        cost, _ = engine_instance._calculate_partitions_cost(PriceCatalog.load(db_session), base_req)
         assert cost == pytest.approx(run_m * expected_price_pm)
 
     @pytest.mark.parametrize("enabled, p_type, p_run_m", [(False, 'plain', 10), (True, 'none', 10), (True, 'plain', 0), (True, 'plain', None)])
@@ -158,7 +161,7 @@ class TestPartitions:
         base_req.partitions.enabled = enabled
         base_req.partitions.type = p_type
         base_req.partitions.run_m = p_run_m
-        cost, _ = engine_instance._calculate_partitions_cost(db_session, base_req)
+        cost, _ = engine_instance._calculate_partitions_cost(PriceCatalog.load(db_session), base_req)
         assert cost == 0.0
 
 class TestAddons:
@@ -166,7 +169,7 @@ class TestAddons:
         seed_database(db_session)
         base_req.addons = [AddonSchema(code='ADDON_AREA')]
         area = base_req.house.length_m * base_req.house.width_m
-        cost, _ = engine_instance._calculate_generic_addons_cost(db_session, base_req, area)
+        cost, _ = engine_instance._calculate_generic_addons_cost(PriceCatalog.load(db_session), base_req, area)
         assert cost == pytest.approx(100 * area)
 
     def test_addon_perimeter(self, engine_instance, base_req, db_session):
@@ -174,14 +177,14 @@ class TestAddons:
         base_req.addons = [AddonSchema(code='ADDON_PERIMETER')]
         area = base_req.house.length_m * base_req.house.width_m
         perimeter = (base_req.house.length_m + base_req.house.width_m) * 2
-        cost, _ = engine_instance._calculate_generic_addons_cost(db_session, base_req, area)
+        cost, _ = engine_instance._calculate_generic_addons_cost(PriceCatalog.load(db_session), base_req, area)
         assert cost == pytest.approx(200 * perimeter)
 
     def test_addon_count(self, engine_instance, base_req, db_session):
         seed_database(db_session)
         base_req.addons = [AddonSchema(code='ADDON_COUNT', quantity=5)]
         area = base_req.house.length_m * base_req.house.width_m
-        cost, _ = engine_instance._calculate_generic_addons_cost(db_session, base_req, area)
+        cost, _ = engine_instance._calculate_generic_addons_cost(PriceCatalog.load(db_session), base_req, area)
         assert cost == pytest.approx(5000 * 5)
 
     def test_addon_roof_l_sides(self, engine_instance, base_req, db_session):
@@ -189,12 +192,12 @@ class TestAddons:
         base_req.addons = [AddonSchema(code='ADDON_ROOF')]
         area = base_req.house.length_m * base_req.house.width_m
         l_long = max(base_req.house.length_m, base_req.house.width_m)
-        cost, _ = engine_instance._calculate_generic_addons_cost(db_session, base_req, area)
+        cost, _ = engine_instance._calculate_generic_addons_cost(PriceCatalog.load(db_session), base_req, area)
         assert cost == pytest.approx(300 * (l_long + 1.5) * 2)
 
     def test_addon_not_found(self, engine_instance, base_req, db_session):
         seed_database(db_session)
         base_req.addons = [AddonSchema(code='FAKE_ADDON')]
         area = base_req.house.length_m * base_req.house.width_m
-        cost, _ = engine_instance._calculate_generic_addons_cost(db_session, base_req, area)
+        cost, _ = engine_instance._calculate_generic_addons_cost(PriceCatalog.load(db_session), base_req, area)
         assert cost == 0.0
@@ -0,0 +1,119 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.schemas import CalculateRequestSchema
+from src.price_catalog import PriceCatalog
+from src.quote_cache import QuoteCache, canonical_request_hash
+from tests.test_batch import make_payload
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def req(**overrides) -> CalculateRequestSchema:
+    return CalculateRequestSchema.model_validate(make_payload(**overrides))
+
+
+class TestCanonicalRequestHash:
+    def test_addon_and_window_order_is_kept_unless_unordered(self):
+        windows = [
+            {"width_cm": 100, "height_cm": 100, "type": "gluh"},
+            {"width_cm": 150, "height_cm": 150, "type": "povorot", "quantity": 2},
+        ]
+        a = req(addons=[{"code": "A"}, {"code": "B", "quantity": 3}], windows=windows)
+        b = req(addons=[{"code": "B", "quantity": 3}, {"code": "A"}], windows=list(reversed(windows)))
+        # Строки разбивки идут в порядке запроса
+        assert canonical_request_hash(a) != canonical_request_hash(b)
+        assert canonical_request_hash(a, ordered=False) == canonical_request_hash(b, ordered=False)
+
+    def test_defaults_and_disabled_components_are_normalized(self):
+        plain = req()
+        explicit = req(
+            terrace={"primary": {"enabled": False, "length_m": 3, "width_m": 2}},
+            porch={},
+            partitions={"enabled": False, "type": "plain", "run_m": 10},
+            commission_rub=0,
+        )
+        assert canonical_request_hash(plain) == canonical_request_hash(explicit)
+
+    def test_price_relevant_fields_change_hash(self):
+        base = canonical_request_hash(req())
+        assert canonical_request_hash(req(terrace={"primary": {"enabled": True, "length_m": 3, "width_m": 2}})) != base
+        assert canonical_request_hash(req(addons=[{"code": "ADDON_AREA", "quantity": 2}])) != base
+        assert canonical_request_hash(req(commission_rub=100)) != base
+
+
+class TestQuoteCache:
+    def test_hit_and_miss_counters(self):
+        cache = QuoteCache(max_entries=10)
+        catalog = PriceCatalog.empty()
+        calls = []
+        compute = lambda: calls.append(1) or "quote"
+
+        assert cache.get_or_compute(catalog, req(), compute) == "quote"
+        assert cache.get_or_compute(catalog, req(), compute) == "quote"
+        assert len(calls) == 1
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_lru_eviction_by_entries_and_bytes(self):
+        cache = QuoteCache(max_entries=2, max_bytes=100)
+        catalog = PriceCatalog.empty()
+        cache.put(catalog, "a", "x" * 10)
+        cache.put(catalog, "b", "x" * 10)
+        cache.get(catalog, "a")
+        cache.put(catalog, "c", "x" * 10)
+        assert cache.get(catalog, "b") is None
+        assert cache.get(catalog, "a") is not None
+
+        cache.put(catalog, "d", "x" * 95)
+        assert cache.stats()["entries"] == 1
+        assert cache.stats()["bytes"] == 95
+        assert cache.stats()["evictions"] == 3
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = QuoteCache(ttl_s=10, clock=clock)
+        catalog = PriceCatalog.empty()
+        cache.put(catalog, "a", "quote")
+        clock.now = 9
+        assert cache.get(catalog, "a") == "quote"
+        clock.now = 10
+        assert cache.get(catalog, "a") is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_new_catalog_version_drops_older_versions(self):
+        cache = QuoteCache()
+        old = PriceCatalog.empty()
+        new = PriceCatalog({}, {}, {}, {}, {}, {}, {}, {}, {}, version=2)
+        cache.put(old, "a", "quote")
+        assert cache.get(new, "a") is None
+        assert cache.stats()["entries"] == 0
+        assert cache.stats()["invalidations"] == 1
+
+    def test_in_flight_requests_on_old_version_keep_new_entries(self):
+        cache = QuoteCache()
+        old = PriceCatalog.empty()
+        new = PriceCatalog({}, {}, {}, {}, {}, {}, {}, {}, {}, version=2)
+        cache.put(new, "a", "new quote")
+
+        # Запрос, начатый до подмены снимка, досчитывается на старой версии
+        assert cache.get(old, "a") is None
+        cache.put(old, "b", "old quote")
+        assert cache.get(new, "a") == "new quote"
+        assert cache.stats()["entries"] == 1
+        assert cache.stats()["invalidations"] == 0
+
+    def test_disabled_cache_always_computes(self):
+        cache = QuoteCache(max_entries=0)
+        calls = []
+        for _ in range(2):
+            cache.get_or_compute(PriceCatalog.empty(), req(), lambda: calls.append(1) or "quote")
+        assert len(calls) == 2
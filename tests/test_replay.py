@@ -0,0 +1,77 @@
+import sys
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.replay import (
+    Sample, _HttpClient, latency_chart, load_payloads, run_closed_loop, run_open_loop, summarize,
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        status = 422 if body.get("fail") else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+PAYLOADS = [json.dumps({"house": {"length_m": 6, "width_m": 8}}).encode(), json.dumps({"house": {}, "fail": True}).encode()]
+
+
+class TestReplay:
+    def test_load_payloads_skips_foreign_lines(self, tmp_path):
+        path = tmp_path / "traffic.jsonl"
+        path.write_text("\n".join([
+            json.dumps({"request_id": "user-001", "title": "not a quote"}),
+            json.dumps({"house": {"length_m": 6, "width_m": 8}}),
+            json.dumps({"payload": {"house": {"length_m": 9, "width_m": 9}}}),
+            "not json",
+        ]), encoding="utf-8")
+        assert [json.loads(p)["house"]["length_m"] for p in load_payloads(str(path))] == [6, 9]
+
+    def test_closed_loop_counts_errors(self, server_url):
+        samples, elapsed = run_closed_loop(_HttpClient(server_url, 5), PAYLOADS, clients=4, count=40)
+        report = summarize(samples, elapsed)
+        assert report["requests"] == 40
+        assert report["statuses"] == {200: 20, 422: 20}
+        assert report["error_rate"] == 0.5
+
+    def test_open_loop_keeps_schedule(self, server_url):
+        samples, elapsed = run_open_loop(_HttpClient(server_url, 5), PAYLOADS[:1], rate=200, count=40)
+        assert len(samples) == 40
+        assert sorted(s.sent_at for s in samples)[-1] == pytest.approx(39 / 200)
+        assert all(s.ok for s in samples)
+
+    def test_connection_errors_are_reported_as_status_zero(self):
+        client = _HttpClient("http://127.0.0.1:9", 0.5)
+        samples, elapsed = run_closed_loop(client, PAYLOADS[:1], clients=1, count=2)
+        assert summarize(samples, elapsed)["statuses"] == {0: 2}
+
+    def test_latency_chart_has_row_per_window(self):
+        samples = [Sample(sent_at=i / 10, latency=0.001 * (i + 1), status=200) for i in range(100)]
+        lines = latency_chart(samples, max_rows=10).splitlines()
+        assert len(lines) == 11
+        assert lines[-1].split("|")[1].strip() == "█" * 40
@@ -0,0 +1,95 @@
+import sys
+import os
+import json
+import subprocess
+import textwrap
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Бюджет на импорт src.main в чистом процессе (секунды); сейчас ~0.7 с, почти все - fastapi и sqlalchemy
+IMPORT_BUDGET_S = 5.0
+
+# Модули, которые не должны загружаться при старте воркера
+LAZY_MODULES = ('gspread', 'oauth2client', 'pandas', 'numpy', 'src.sync_service', 'src.vectorized_engine')
+
+
+def run_python(code: str, **env: str) -> dict:
+    """Выполняет код в отдельном процессе (чистый sys.modules) и возвращает JSON из последней строки вывода."""
+    result = subprocess.run(
+        [sys.executable, '-c', textwrap.dedent(code)],
+        cwd=ROOT, env={**os.environ, **env}, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestStartup:
+    def test_import_is_fast_lazy_and_does_not_touch_database(self):
+        # База в несуществующем каталоге: любое подключение при импорте упадет
+        result = run_python('''
+            import json, sys, time
+            started = time.perf_counter()
+            import src.main
+            elapsed = time.perf_counter() - started
+            print(json.dumps({"import_s": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+        ''' % (LAZY_MODULES,), DATABASE_URL='sqlite:////nonexistent-dir/startup.db')
+        assert result['loaded'] == []
+        assert result['import_s'] < IMPORT_BUDGET_S
+
+    def test_startup_creates_schema_and_warms_catalog(self, tmp_path):
+        result = run_python('''
+            import json, time
+            from fastapi.testclient import TestClient
+            from src.main import app
+            with TestClient(app) as client:
+                deadline = time.monotonic() + 10
+                while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                print(json.dumps(client.get("/ready").json()))
+        ''', DATABASE_URL=f"sqlite:///{tmp_path / 'app.db'}", CATALOG_POLL_INTERVAL_S='0')
+        assert result['status'] == 'ready'
+        assert result['catalog_version'] == 0
+
+    def test_ready_without_warmup(self, tmp_path):
+        result = run_python('''
+            import json
+            from fastapi.testclient import TestClient
+            from src.main import app
+            with TestClient(app) as client:
+                response = client.get("/ready")
+                print(json.dumps({"status_code": response.status_code, **response.json()}))
+        ''', DATABASE_URL=f"sqlite:///{tmp_path / 'app.db'}", CATALOG_WARMUP='false', CATALOG_POLL_INTERVAL_S='0')
+        assert result == {'status_code': 200, 'status': 'ready', 'catalog_version': None}
+
+    def test_ready_after_failed_warmup_once_catalog_loads(self, tmp_path):
+        result = run_python('''
+            import json, threading
+            from fastapi.testclient import TestClient
+            from src.main import app
+            from src.price_catalog import catalog_store
+
+            warmup_failed = threading.Event()
+
+            async def failing_load():
+                warmup_failed.set()
+                raise RuntimeError("БД еще не поднялась")
+
+            catalog_store.get_async = failing_load
+            with TestClient(app) as client:
+                warmup_failed.wait(10)
+                before = client.get("/ready").status_code
+                del catalog_store.get_async
+                calculated = client.post("/calculate", json={
+                    "house": {"length_m": 6, "width_m": 8},
+                    "ceiling": {"type": "flat", "height_m": 2.5},
+                    "roof": {"overhang_cm": "std"},
+                    "partitions": {"enabled": False},
+                    "insulation": {"brand": "izobel", "mm": 100, "build_tech": "panel"},
+                    "delivery": {"distance_km": 0},
+                }).status_code
+                after = client.get("/ready")
+                print(json.dumps({"before": before, "calculate": calculated, "after": after.status_code, **after.json()}))
+        ''', DATABASE_URL=f"sqlite:///{tmp_path / 'app.db'}", CATALOG_POLL_INTERVAL_S='0')
+        assert result == {'before': 503, 'calculate': 200, 'after': 200, 'status': 'ready', 'catalog_version': 0}
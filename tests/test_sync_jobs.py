@@ -0,0 +1,231 @@
+import sys
+import os
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.sync_jobs import FAILED, SUCCEEDED, SyncJobManager
+
+
+class _ControlledSync:
+    """Синхронизация, которую тест останавливает до чтения листов и на этапах fetching и writing."""
+
+    def __init__(self, report=None, error=None):
+        self.report = report or {"changed": True, "error": None}
+        self.error = error
+        self.started = threading.Event()
+        self.fetching = threading.Event()
+        self.writing = threading.Event()
+        # Подключение к Google по умолчанию не задерживается; тест может сбросить событие
+        self.release_start = threading.Event()
+        self.release_start.set()
+        self.release_fetch = threading.Event()
+        self.release_write = threading.Event()
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, progress):
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            self.started.set()
+            assert self.release_start.wait(5)
+            progress.stage("fetching")
+            progress.sheet_fetched("addons", 3, 0.01)
+            self.fetching.set()
+            assert self.release_fetch.wait(5)
+            progress.stage("writing")
+            progress.sheet_transformed("addons", 3, 1, 0.001)
+            progress.sheet_loaded("addons", {"inserted": 2, "updated": 0, "deleted": 0}, 0.002)
+            self.writing.set()
+            assert self.release_write.wait(5)
+            if self.error:
+                raise RuntimeError(self.error)
+            return dict(self.report)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def release(self):
+        self.release_start.set()
+        self.release_fetch.set()
+        self.release_write.set()
+
+
+class TestSyncJobManager:
+    def test_job_reports_progress_and_refreshes_catalog(self):
+        sync, refreshed = _ControlledSync(), []
+        manager = SyncJobManager(sync, on_changed=lambda: refreshed.append(True))
+        job, merged = manager.submit()
+        assert not merged
+
+        sync.release_fetch.set()
+        assert sync.writing.wait(5)
+        running = manager.snapshot(job.id)
+        assert running["status"] == "running" and running["stage"] == "writing"
+        assert running["sheets"]["addons"]["rejected_rows"] == 1
+
+        sync.release_write.set()
+        assert manager.wait(job.id, 5)
+        done = manager.snapshot(job.id)
+        assert done["status"] == SUCCEEDED
+        assert done["sheets"]["addons"]["loaded"]["inserted"] == 2
+        assert done["report"]["changed"] is True
+        assert refreshed == [True]
+
+    def test_requests_before_fetch_merge_into_running_job(self):
+        sync = _ControlledSync()
+        sync.release_start.clear()
+        manager = SyncJobManager(sync)
+        first, _ = manager.submit()
+        assert sync.started.wait(5)
+        second, merged = manager.submit()
+        assert merged and second is first and first.requests == 2
+
+        sync.release()
+        assert manager.wait(first.id, 5)
+        assert sync.calls == 1
+
+    def test_requests_during_fetch_get_a_follow_up_job(self):
+        sync = _ControlledSync()
+        manager = SyncJobManager(sync)
+        first, _ = manager.submit()
+        assert sync.fetching.wait(5)
+        # Листы, прочитанные до запроса, могут быть старше него
+        follow_up, merged = manager.submit()
+        assert not merged and follow_up is not first
+
+        sync.release()
+        assert manager.wait(first.id, 5) and manager.wait(follow_up.id, 5)
+        assert sync.calls == 2
+
+    def test_requests_during_write_share_one_follow_up_job(self):
+        sync = _ControlledSync()
+        manager = SyncJobManager(sync)
+        first, _ = manager.submit()
+        sync.release_fetch.set()
+        assert sync.writing.wait(5)
+
+        follow_up, merged = manager.submit()
+        assert not merged and follow_up is not first
+        again, merged = manager.submit()
+        assert merged and again is follow_up and follow_up.requests == 2
+
+        sync.release_write.set()
+        assert manager.wait(first.id, 5) and manager.wait(follow_up.id, 5)
+        assert sync.calls == 2
+        assert sync.max_running == 1
+        assert [job["id"] for job in manager.jobs()] == [follow_up.id, first.id]
+
+    @pytest.mark.parametrize("sync", [
+        _ControlledSync(error="boom"),
+        _ControlledSync(report={"changed": False, "error": "boom"}),
+    ])
+    def test_failure_is_recorded_without_refresh(self, sync):
+        refreshed = []
+        manager = SyncJobManager(sync, on_changed=lambda: refreshed.append(True))
+        job, _ = manager.submit()
+        sync.release()
+        assert manager.wait(job.id, 5)
+        snapshot = manager.snapshot(job.id)
+        assert snapshot["status"] == FAILED
+        assert "boom" in snapshot["error"]
+        assert refreshed == []
+
+    def test_refresh_failure_is_logged_and_job_succeeds(self, caplog):
+        def failing_refresh():
+            raise RuntimeError("db down")
+
+        manager = SyncJobManager(lambda progress: {"changed": True, "error": None}, on_changed=failing_refresh)
+        with caplog.at_level("ERROR", logger="src.sync_jobs"):
+            job, _ = manager.submit()
+            assert manager.wait(job.id, 5)
+
+        assert manager.snapshot(job.id)["status"] == SUCCEEDED
+        record = next(r for r in caplog.records if r.getMessage() == "Catalog refresh after sync failed")
+        assert record.exc_info[1].args == ("db down",)
+
+    def test_history_keeps_latest_jobs(self):
+        manager = SyncJobManager(lambda progress: {"changed": False, "error": None}, history=2)
+        ids = []
+        for _ in range(4):
+            job, _ = manager.submit()
+            assert manager.wait(job.id, 5)
+            ids.append(job.id)
+        assert [job["id"] for job in manager.jobs()] == ids[:1:-1]
+        assert manager.snapshot(ids[0]) is None
+
+    def test_scheduled_checks_skip_busy_manager_and_hide_no_op_runs(self):
+        sync = _ControlledSync()
+        checks = []
+
+        def run_changed(progress):
+            checks.append(True)
+            return {"sheets": [], "changed": False, "error": None}
+
+        manager = SyncJobManager(sync, run_changed_sync=run_changed)
+        job, _ = manager.submit()
+        assert manager.submit_scheduled() is None
+
+        sync.release()
+        assert manager.wait(job.id, 5)
+        check = manager.submit_scheduled()
+        assert check is not None and check.mode == "changed"
+        assert manager.wait(check.id, 5)
+        assert checks == [True]
+        assert [j["id"] for j in manager.jobs()] == [job.id]
+
+    def test_scheduler_failure_is_logged_with_traceback(self, caplog):
+        manager = SyncJobManager(lambda progress: {"changed": False, "error": None})
+        failed = threading.Event()
+
+        def failing_submit():
+            failed.set()
+            raise RuntimeError("boom")
+
+        manager.submit_scheduled = failing_submit
+        with caplog.at_level("ERROR", logger="src.sync_jobs"):
+            manager.start_schedule(0.01)
+            assert failed.wait(5)
+            manager.stop_schedule()
+
+        record = next(r for r in caplog.records if r.getMessage() == "Scheduled sync check failed")
+        assert record.exc_info[1].args == ("boom",)
+
+    def test_manual_request_does_not_merge_into_scheduled_check(self):
+        sync = _ControlledSync()
+        manager = SyncJobManager(lambda progress: {"changed": False, "error": None}, run_changed_sync=sync)
+        check = manager.submit_scheduled()
+        assert sync.fetching.wait(5)
+
+        job, merged = manager.submit()
+        assert not merged and job is not check and job.mode == "full"
+        sync.release()
+        assert manager.wait(job.id, 5)
+        assert manager.snapshot(job.id)["status"] == SUCCEEDED
+
+
+class TestChangedSync:
+    def test_connection_is_kept_between_checks(self, monkeypatch):
+        from src import sync_jobs, sync_service
+
+        connections = []
+
+        def fake_check(db, progress=None, connection=None):
+            connections.append(connection)
+            return {"sheets": [], "changed": False, "error": None}
+
+        monkeypatch.setattr(sync_service, "sync_changed_sheets", fake_check)
+        monkeypatch.setattr(sync_jobs, "_with_session", lambda sync, progress: sync(None, progress=progress))
+        check = sync_jobs._ChangedSync()
+        check(None)
+        check(None)
+
+        assert isinstance(connections[0], sync_service.GoogleSheetsConnection)
+        assert connections[1] is connections[0]
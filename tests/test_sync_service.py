@@ -0,0 +1,376 @@
+import sys
+import os
+from decimal import Decimal
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import models
+from src import sync_service
+from src.price_catalog import PriceCatalog
+from src.sync_service import SPREADSHEET_TITLE, ReferenceResolver, compile_transformer, fetch_all_sheets, sync_google_sheets_to_db, transform_data
+from tests.fake_gspread import FakeClient
+
+
+SHEETS = {
+    "addons": [
+        {"code": "A1", "title": "Доп 1", "calc_mode": "AREA", "price": "100,50", "params": "{}", "active": "TRUE"},
+        {"code": "A2", "title": "Доп 2", "calc_mode": "COUNT", "price": 300, "params": "", "active": "TRUE"},
+    ],
+    "window_base_prices": [{"width_cm": 100, "height_cm": 100, "type": "gluh", "base_price_rub": 5000}],
+    "doors": [{"code": "D1", "title": "Дверь", "price_rub": 15000}],
+    "ceiling_height_prices": [{"height_m": 2.5, "price_per_m2": 0}],
+}
+
+
+def fake_client(latency_s=0.0):
+    return FakeClient({SPREADSHEET_TITLE: SHEETS}, latency_s=latency_s)
+
+
+def full_client(sheets=SHEETS):
+    """A spreadsheet with every SYNC_MAP sheet (the ones missing from `sheets` are empty)."""
+    return FakeClient({SPREADSHEET_TITLE: {name: sheets.get(name, []) for name in sync_service.SYNC_MAP}})
+
+
+class TestFetchAllSheets:
+    def test_spreadsheet_is_opened_once(self):
+        gc = fake_client()
+        sheets = fetch_all_sheets(gc, ["addons", "doors", "missing"])
+
+        assert gc.calls.count("open") == 1
+        assert gc.calls.count("fetch_sheet_metadata") == 1
+        assert len(sheets["addons"]) == 2
+        assert sheets["missing"] == []
+        assert list(sheets) == ["addons", "doors", "missing"]
+
+    def test_sheets_are_fetched_concurrently_within_limit(self):
+        gc = fake_client(latency_s=0.02)
+        fetch_all_sheets(gc, SHEETS.keys(), max_workers=2)
+        assert gc.max_in_flight == 2
+
+    def test_missing_spreadsheet_returns_empty_sheets(self):
+        sheets = fetch_all_sheets(FakeClient({}), ["addons"])
+        assert sheets == {"addons": []}
+
+
+class TestTransformData:
+    def test_converts_by_column_type(self):
+        rows = transform_data(models.Addon, [
+            {"code": 101, "title": "Доп", "calc_mode": "ROOF_L_SIDES", "price": "1 234,50",
+             "params": '{"sides": 2}', "active": "FALSE"},
+        ])
+        assert rows == [{"code": "101", "title": "Доп", "calc_mode": "ROOF_L_SIDES", "price": Decimal("1234.50"),
+                         "params": {"sides": 2}, "active": False}]
+
+    def test_bad_cells_are_reported_not_loaded(self):
+        rejections = []
+        rows = transform_data(models.WindowBasePrice, [
+            {"width_cm": 100, "height_cm": 100, "type": "gluh", "base_price_rub": 5000},
+            {"width_cm": "сто", "height_cm": 100, "type": "round", "base_price_rub": 5000},
+            {"width_cm": 100, "height_cm": 120, "type": "gluh"},
+        ], rejections)
+
+        assert len(rows) == 1
+        assert [r["row"] for r in rejections] == [3, 4]
+        assert [e["column"] for e in rejections[0]["errors"]] == ["width_cm", "type"]
+        assert rejections[1]["errors"][0] == {"column": "base_price_rub", "value": None, "error": "required value is missing"}
+
+    def test_transformer_is_compiled_once_per_model(self):
+        assert compile_transformer(models.Addon) is compile_transformer(models.Addon)
+
+
+class TestSyncGoogleSheetsToDb:
+    def test_fetch_happens_before_writes(self, db_session, monkeypatch):
+        gc = fake_client()
+        writes = []
+        original = sync_service.sync_sheet_to_db
+
+        def recording_sync(*args):
+            writes.append(len(gc.calls))
+            return original(*args)
+
+        monkeypatch.setattr(sync_service, "sync_sheet_to_db", recording_sync)
+        sync_google_sheets_to_db(db_session, gc=gc)
+
+        assert writes and set(writes) == {len(gc.calls)}
+        assert db_session.query(models.Addon).count() == 2
+        assert db_session.query(models.Door).one().code == "D1"
+        assert db_session.query(models.CatalogVersion).count() == 1
+
+    def test_progress_receives_stages_and_sheet_events(self, db_session):
+        events = []
+
+        class Recorder(sync_service.SyncProgress):
+            def stage(self, stage):
+                events.append(("stage", stage))
+
+            def sheet_fetched(self, sheet, rows, seconds):
+                events.append(("fetched", sheet, rows))
+
+            def sheet_loaded(self, sheet, summary, seconds):
+                events.append(("loaded", sheet, summary["inserted"]))
+
+        sync_google_sheets_to_db(db_session, gc=fake_client(), progress=Recorder())
+
+        assert [e[1] for e in events if e[0] == "stage"] == ["fetching", "writing", "publishing"]
+        assert ("fetched", "addons", 2) in events
+        assert ("loaded", "addons", 2) in events
+
+
+class TestDiffSync:
+    def sync(self, db_session, sheets):
+        return sync_google_sheets_to_db(db_session, gc=FakeClient({SPREADSHEET_TITLE: sheets}))
+
+    def test_unchanged_sheets_are_a_no_op(self, db_session):
+        first = self.sync(db_session, SHEETS)
+        assert first["changed"] and first["tables"]["addons"] == {"inserted": 2, "updated": 0, "deleted": 0}
+        assert {"table": "addons", "rows": 2, "method": "executemany"}.items() <= first["loads"][0].items()
+        ids = [a.id for a in db_session.query(models.Addon).order_by(models.Addon.code)]
+        audit_rows = db_session.query(models.PriceAudit).count()
+
+        statements = []
+        event.listen(db_session.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+        second = self.sync(db_session, SHEETS)
+
+        assert second["changed"] is False
+        assert second["catalog_version"] is None
+        assert not [s for s in statements if not s.lstrip().upper().startswith("SELECT")]
+        assert [a.id for a in db_session.query(models.Addon).order_by(models.Addon.code)] == ids
+        assert db_session.query(models.PriceAudit).count() == audit_rows
+
+    def test_changes_are_applied_and_audited(self, db_session):
+        self.sync(db_session, SHEETS)
+        a1_id = db_session.query(models.Addon).filter_by(code="A1").one().id
+
+        sheets = dict(SHEETS)
+        sheets["addons"] = [
+            {**SHEETS["addons"][0], "price": "120"},
+            {"code": "A3", "title": "Доп 3", "calc_mode": "AREA", "price": 10, "active": "TRUE"},
+        ]
+        report = self.sync(db_session, sheets)
+
+        assert report["tables"]["addons"] == {"inserted": 1, "updated": 1, "deleted": 1}
+        assert report["tables"]["doors"] == {"inserted": 0, "updated": 0, "deleted": 0}
+        a1 = db_session.query(models.Addon).filter_by(code="A1").one()
+        assert a1.id == a1_id and float(a1.price) == 120
+        assert {a.code for a in db_session.query(models.Addon)} == {"A1", "A3"}
+
+        audit = db_session.query(models.PriceAudit).filter_by(entity="addons", action="update").one()
+        assert audit.entity_id == a1_id
+        assert audit.payload == {"before": {"price": "100.50"}, "after": {"price": "120.00"}}
+        assert db_session.query(models.PriceAudit).filter_by(entity="addons", action="delete").count() == 1
+
+
+class TestSingleTransactionPublish:
+    def test_failed_table_leaves_catalog_untouched(self, db_session, monkeypatch):
+        original = sync_service.apply_table_diff
+
+        def failing_apply(db, model, diff):
+            if model is models.Door:
+                raise RuntimeError("boom")
+            original(db, model, diff)
+
+        monkeypatch.setattr(sync_service, "apply_table_diff", failing_apply)
+        report = sync_google_sheets_to_db(db_session, gc=fake_client())
+
+        # addons were staged before doors failed, but nothing was committed
+        assert report["catalog_version"] is None
+        assert report["changed"] is False
+        assert "boom" in report["error"]
+        assert db_session.query(models.Addon).count() == 0
+        assert db_session.query(models.CatalogVersion).count() == 0
+
+    def test_version_is_committed_with_data(self, db_session):
+        sync_google_sheets_to_db(db_session, gc=fake_client())
+        commits = []
+        event.listen(db_session, "after_commit", lambda session: commits.append(1))
+        sheets = dict(SHEETS)
+        sheets["doors"] = [{"code": "D1", "title": "Дверь", "price_rub": 16000}]
+        sheets["ceiling_height_prices"] = [{"height_m": 2.5, "price_per_m2": 50}]
+        report = sync_google_sheets_to_db(db_session, gc=FakeClient({SPREADSHEET_TITLE: sheets}))
+
+        assert report["catalog_version"] == 2
+        assert commits == [1]
+
+
+def seed_references(db_session):
+    db_session.add_all([
+        models.BuildTechnology(code="panel", title="Панель"),
+        models.InsulationBrand(code="izobel", title="Изобел"),
+        models.InsulationThickness(mm=100),
+        models.StoreyType(code="one", title="Одноэтажный"),
+        models.Contour(code="warm", title="Теплый"),
+    ])
+    db_session.flush()
+
+
+def base_price_row(**overrides):
+    row = {"build_tech": "panel", "brand": "izobel", "mm": 100, "storey_type": "one", "contour": "warm", "price_rub": "15000"}
+    row.update(overrides)
+    return row
+
+
+class TestReferenceResolver:
+    def test_base_prices_sync_by_codes(self, db_session):
+        seed_references(db_session)
+        statements = []
+        event.listen(db_session.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+        rows = [base_price_row(price_rub=str(15000 + i), floor_no=i) for i in range(200)]
+        report = sync_google_sheets_to_db(db_session, gc=FakeClient({SPREADSHEET_TITLE: {"base_price_m2": rows}}))
+
+        assert report["tables"]["base_price_m2"]["inserted"] == 200
+        # One lookup per reference table, not per row
+        assert sum("FROM build_technologies" in s for s in statements) == 1
+        catalog = PriceCatalog.load(db_session)
+        assert catalog.base_price("panel", "izobel", 100, "one", "warm") == Decimal("15000.00")
+
+    def test_unknown_codes_are_rejected_in_bulk(self, db_session):
+        seed_references(db_session)
+        rejections = []
+        rows, row_numbers = ReferenceResolver(db_session, unknown="reject").resolve(
+            "base_price_m2", [base_price_row(), base_price_row(brand="rockwool"), base_price_row(mm="сто")], rejections)
+
+        assert len(rows) == 1 and rows[0]["brand_id"] is not None
+        assert row_numbers == [2]
+        assert [r["row"] for r in rejections] == [3, 4]
+        assert rejections[0]["errors"][0]["error"] == "unknown insulation_brands code 'rockwool'"
+
+    def test_unknown_codes_can_be_created(self, db_session):
+        seed_references(db_session)
+        resolver = ReferenceResolver(db_session, unknown="create")
+        rows, _ = resolver.resolve("base_price_m2", [base_price_row(brand="rockwool", mm=150), base_price_row(brand="rockwool")])
+
+        assert len(rows) == 2
+        assert resolver.created == {"insulation_brands": 1, "insulation_thicknesses": 1}
+        assert db_session.query(models.InsulationBrand).filter_by(code="rockwool").one().title == "rockwool"
+
+
+class TestChangeDetectedSync:
+    def test_first_check_syncs_everything_and_stores_checksums(self, db_session):
+        report = sync_service.sync_changed_sheets(db_session, gc=full_client())
+        assert set(report["sheets"]) == set(sync_service.SYNC_MAP)
+        assert report["changed"] is True
+        assert set(sync_service.load_sheet_checksums(db_session)) == set(sync_service.SYNC_MAP)
+
+    def test_unchanged_spreadsheet_costs_one_revision_read_and_no_writes(self, db_session):
+        gc = full_client()
+        connection = sync_service.GoogleSheetsConnection(gc)
+        sync_service.sync_changed_sheets(db_session, connection=connection)
+        calls = len(gc.calls)
+        statements = []
+        event.listen(db_session.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        report = sync_service.sync_changed_sheets(db_session, connection=connection)
+
+        assert report["sheets"] == [] and report["changed"] is False and report["error"] is None
+        # The client and the spreadsheet key are kept: no lookup by title, only Drive files.get
+        assert gc.calls[calls:] == ["drive_files_get"]
+        assert all(s.lstrip().upper().startswith("SELECT") for s in statements)
+
+    def test_kept_connection_opens_spreadsheet_by_key_for_changes(self, db_session):
+        gc = full_client()
+        connection = sync_service.GoogleSheetsConnection(gc)
+        sync_service.sync_changed_sheets(db_session, connection=connection)
+        spreadsheet = gc.open(SPREADSHEET_TITLE)
+        spreadsheet.worksheet("doors").records = [{"code": "D1", "title": "Дверь", "price_rub": 17000}]
+        spreadsheet.modified_time = "edited"
+        calls = len(gc.calls)
+
+        report = sync_service.sync_changed_sheets(db_session, connection=connection)
+
+        assert report["sheets"] == ["doors"]
+        assert gc.calls[calls:calls + 3] == ["drive_files_get", "open_by_key", "fetch_sheet_metadata"]
+        assert "open" not in gc.calls[calls:]
+
+    def test_missing_spreadsheet_is_looked_up_by_title_again(self, db_session):
+        connection = sync_service.GoogleSheetsConnection(full_client())
+        sync_service.sync_changed_sheets(db_session, connection=connection)
+        connection.key = "deleted"
+
+        report = sync_service.sync_changed_sheets(db_session, connection=connection)
+        assert report["error"] and connection.key is None
+        assert sync_service.sync_changed_sheets(db_session, connection=connection)["error"] is None
+        assert connection.key == f"key-{SPREADSHEET_TITLE}"
+
+    def test_only_changed_sheets_are_resynced_from_one_fetch(self, db_session):
+        sync_service.sync_changed_sheets(db_session, gc=full_client())
+        sheets = {**SHEETS, "doors": [{"code": "D1", "title": "Дверь", "price_rub": 17000}]}
+        gc = full_client(sheets)
+
+        report = sync_service.sync_changed_sheets(db_session, gc=gc)
+
+        assert report["sheets"] == ["doors"]
+        assert report["tables"] == {"doors": {"inserted": 0, "updated": 1, "deleted": 0}}
+        # Every sheet is read once: the rows read for the check are the rows synced
+        assert gc.calls.count("values_get") == len(sync_service.SYNC_MAP)
+        assert gc.calls.count("open") == 1
+        assert float(db_session.query(models.Door).one().price_rub) == 17000
+        assert sync_service.sync_changed_sheets(db_session, gc=gc)["sheets"] == []
+        assert gc.calls.count("values_get") == len(sync_service.SYNC_MAP)
+
+    def test_new_revision_with_same_content_only_updates_revision(self, db_session):
+        sync_service.sync_changed_sheets(db_session, gc=full_client())
+        gc = full_client()
+        gc.open(SPREADSHEET_TITLE).modified_time = "edited-and-reverted"
+
+        report = sync_service.sync_changed_sheets(db_session, gc=gc)
+
+        assert report["sheets"] == [] and report["changed"] is False
+        assert {revision for _, revision in sync_service.load_sheet_state(db_session).values()} == {"edited-and-reverted"}
+        assert db_session.query(models.CatalogVersion).count() == 1
+        calls = len(gc.calls)
+        sync_service.sync_changed_sheets(db_session, gc=gc)
+        assert "values_get" not in gc.calls[calls:]
+
+    def test_failed_fetch_keeps_old_checksum(self, db_session, monkeypatch):
+        sync_service.sync_changed_sheets(db_session, gc=full_client())
+        before = sync_service.load_sheet_state(db_session)["doors"]
+        sheets = {**SHEETS, "doors": [{"code": "D1", "title": "Дверь", "price_rub": 17000}]}
+        original = sync_service.fetch_sheet_data
+
+        def failing_doors(ws, progress=None):
+            if ws.title == "doors":
+                progress.sheet_failed(ws.title, "boom")
+                return []
+            return original(ws, progress)
+
+        monkeypatch.setattr(sync_service, "fetch_sheet_data", failing_doors)
+        report = sync_service.sync_changed_sheets(db_session, gc=full_client(sheets))
+
+        assert report["sheets"] == [] and report["changed"] is False
+        assert "doors" in report["error"]
+        assert sync_service.load_sheet_state(db_session)["doors"] == before
+
+        monkeypatch.setattr(sync_service, "fetch_sheet_data", original)
+        report = sync_service.sync_changed_sheets(db_session, gc=full_client(sheets))
+        assert report["sheets"] == ["doors"] and report["changed"] is True
+
+    def test_sheet_whose_first_sync_failed_is_retried(self, db_session, monkeypatch):
+        original = sync_service.fetch_sheet_data
+
+        def failing_doors(ws, progress=None):
+            if ws.title == "doors":
+                progress.sheet_failed(ws.title, "boom")
+                return []
+            return original(ws, progress)
+
+        monkeypatch.setattr(sync_service, "fetch_sheet_data", failing_doors)
+        sync_service.sync_changed_sheets(db_session, gc=full_client())
+        assert "doors" not in sync_service.load_sheet_state(db_session)
+
+        # The spreadsheet is unchanged, but doors has never been synced
+        monkeypatch.setattr(sync_service, "fetch_sheet_data", original)
+        report = sync_service.sync_changed_sheets(db_session, gc=full_client())
+        assert report["sheets"] == ["doors"]
+        assert db_session.query(models.Door).count() == 1
+        assert sync_service.sync_changed_sheets(db_session, gc=full_client())["sheets"] == []
+
+    def test_sheet_added_to_sync_map_is_synced(self, db_session, monkeypatch):
+        before, after = full_client(), full_client()
+        sync_map = dict(sync_service.SYNC_MAP)
+        monkeypatch.setattr(sync_service, "SYNC_MAP", {k: v for k, v in sync_map.items() if k != "doors"})
+        sync_service.sync_changed_sheets(db_session, gc=before)
+
+        monkeypatch.setattr(sync_service, "SYNC_MAP", sync_map)
+        report = sync_service.sync_changed_sheets(db_session, gc=after)
+        assert report["sheets"] == ["doors"]
@@ -0,0 +1,188 @@
+import sys
+import os
+import csv
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import models
+from src import sync_service
+from src.sync_service import SPREADSHEET_TITLE, sync_google_sheets_to_db, sync_source_to_db
+from src.sync_sources import CsvFolderSource, SheetNotFound, SheetSource, XlsxSource, open_source
+from tests.fake_gspread import FakeClient
+from tests.test_sync_service import SHEETS, base_price_row, full_client, seed_references
+
+
+def write_csv(folder, sheet, rows, header=None):
+    header = header or list(rows[0])
+    with open(folder / f"{sheet}.csv", "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow([row.get(column, "") for column in header])
+
+
+def addon_rows(count, price="10"):
+    return [{"code": f"A{i}", "title": f"Доп {i}", "calc_mode": "COUNT", "price": price, "active": "TRUE"} for i in range(count)]
+
+
+def table_rows(db_session, model):
+    columns = [c.key for c in model.__table__.columns if c.key != "id"]
+    return sorted(tuple(str(getattr(row, c)) for c in columns) for row in db_session.query(model))
+
+
+class TestSheetSource:
+    def test_is_abstract(self):
+        with pytest.raises(TypeError):
+            SheetSource()
+
+    def test_sources_have_distinct_ids(self, tmp_path):
+        csv_source = CsvFolderSource(str(tmp_path))
+        google_source = sync_service.GoogleSheetsSource(FakeClient({SPREADSHEET_TITLE: SHEETS}))
+        assert csv_source.source_id == f"csv:{tmp_path}"
+        assert google_source.source_id == sync_service.GOOGLE_SOURCE_ID
+
+
+class TestCsvFolderSource:
+    def test_reads_rows_lazily_and_drops_trailing_blank_rows(self, tmp_path):
+        write_csv(tmp_path, "doors", [
+            {"code": "D1", "title": "Дверь", "price_rub": "15000"},
+            {"code": "", "title": "", "price_rub": ""},
+            {"code": "D2", "title": "Дверь 2", "price_rub": "16000"},
+            {"code": "", "title": "", "price_rub": ""},
+        ])
+        source = open_source(str(tmp_path))
+        rows = source.iter_rows("doors")
+
+        assert not isinstance(rows, list)
+        assert [row["code"] for row in rows] == ["D1", "", "D2"]
+        assert source.sheet_names() == ["doors"]
+        assert set(source.checksums(["doors", "addons"])) == {"doors"}
+        with pytest.raises(SheetNotFound):
+            source.iter_rows("addons")
+
+
+class TestXlsxSource:
+    def test_reads_worksheets_as_records(self, tmp_path):
+        openpyxl = pytest.importorskip("openpyxl")
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = "window_base_prices"
+        sheet.append(["width_cm", "height_cm", "type", "base_price_rub"])
+        sheet.append([100, 100, "gluh", 5000.5])
+        sheet.append([None, None, None, None])
+        path = tmp_path / "KM_ADM_TABLE.xlsx"
+        workbook.save(path)
+
+        source = open_source(str(path))
+        try:
+            assert isinstance(source, XlsxSource)
+            assert list(source.iter_rows("window_base_prices")) == [
+                {"width_cm": 100, "height_cm": 100, "type": "gluh", "base_price_rub": 5000.5},
+            ]
+            assert list(source.checksums(["window_base_prices", "doors"])) == ["window_base_prices"]
+        finally:
+            source.close()
+
+    def test_unsupported_path_is_rejected(self, tmp_path):
+        with pytest.raises(ValueError):
+            open_source(str(tmp_path / "prices.ods"))
+
+
+class TestSyncSourceToDb:
+    def test_matches_google_sheets_sync(self, db_session, tmp_path):
+        for sheet, rows in SHEETS.items():
+            write_csv(tmp_path, sheet, rows)
+        report = sync_source_to_db(db_session, CsvFolderSource(str(tmp_path)), chunk_size=1)
+        from_files = {model: table_rows(db_session, model) for model in (models.Addon, models.Door, models.WindowBasePrice)}
+
+        assert report["error"] is None and report["changed"] is True
+        assert report["tables"]["addons"] == {"inserted": 2, "updated": 0, "deleted": 0}
+        assert report["loads"][0]["rows"] == 2
+        # Re-syncing the same data from Google Sheets is a no-op
+        again = sync_google_sheets_to_db(db_session, gc=FakeClient({SPREADSHEET_TITLE: SHEETS}))
+        assert again["changed"] is False
+        assert {model: table_rows(db_session, model) for model in from_files} == from_files
+
+    def test_rows_are_streamed_in_chunks(self, db_session, tmp_path):
+        write_csv(tmp_path, "addons", addon_rows(50))
+        source = CsvFolderSource(str(tmp_path))
+        pulled = []
+
+        def counting_rows(sheet):
+            for row in CsvFolderSource.iter_rows(source, sheet):
+                pulled.append(row)
+                yield row
+
+        source.iter_rows = counting_rows
+        pulled_at_first_insert = []
+
+        def before_execute(conn, cursor, statement, *args):
+            if statement.startswith("INSERT INTO addons") and not pulled_at_first_insert:
+                pulled_at_first_insert.append(len(pulled))
+
+        event.listen(db_session.get_bind(), "before_cursor_execute", before_execute)
+        report = sync_source_to_db(db_session, source, sheets=["addons"], chunk_size=10)
+
+        assert report["tables"]["addons"]["inserted"] == 50
+        assert pulled_at_first_insert == [10]
+
+    def test_changes_are_diffed_across_chunks(self, db_session, tmp_path):
+        write_csv(tmp_path, "addons", addon_rows(30))
+        sync_source_to_db(db_session, CsvFolderSource(str(tmp_path)), sheets=["addons"], chunk_size=7)
+        ids = {a.code: a.id for a in db_session.query(models.Addon)}
+
+        rows = addon_rows(30)
+        rows[3]["price"] = "12"
+        del rows[20]
+        rows.append({**rows[5], "price": "99"})  # a later duplicate of A5 wins
+        rows.append({"code": "B1", "title": "Новая", "calc_mode": "AREA", "price": "1", "active": "TRUE"})
+        write_csv(tmp_path, "addons", rows)
+        report = sync_source_to_db(db_session, CsvFolderSource(str(tmp_path)), sheets=["addons"], chunk_size=7)
+
+        assert report["tables"]["addons"] == {"inserted": 1, "updated": 2, "deleted": 1}
+        addons = {a.code: a for a in db_session.query(models.Addon)}
+        assert float(addons["A3"].price) == 12 and addons["A3"].id == ids["A3"]
+        assert float(addons["A5"].price) == 99
+        assert "A20" not in addons and "B1" in addons
+        audit = db_session.query(models.PriceAudit).filter_by(entity="addons", action="insert", entity_id=addons["B1"].id)
+        assert audit.count() == 1
+
+    def test_rejections_keep_sheet_row_numbers_and_rows(self, db_session, tmp_path):
+        seed_references(db_session)
+        rows = [base_price_row(floor_no=floor) for floor in range(1, 6)]
+        write_csv(tmp_path, "base_price_m2", rows)
+        sync_source_to_db(db_session, CsvFolderSource(str(tmp_path)), sheets=["base_price_m2"], chunk_size=2)
+
+        rows = rows[:3] + [base_price_row(floor_no=9, brand="rockwool")]
+        write_csv(tmp_path, "base_price_m2", rows)
+        report = sync_source_to_db(db_session, CsvFolderSource(str(tmp_path)), sheets=["base_price_m2"], chunk_size=2)
+
+        assert [r["row"] for r in report["rejected"]] == [5]
+        # With rejected rows, rows missing from the sheet are kept
+        assert report["tables"]["base_price_m2"] == {"inserted": 0, "updated": 0, "deleted": 0}
+        assert db_session.query(models.BasePriceM2).count() == 5
+
+    def test_missing_sheets_are_skipped(self, db_session, tmp_path):
+        write_csv(tmp_path, "doors", SHEETS["doors"])
+        source = CsvFolderSource(str(tmp_path))
+        report = sync_source_to_db(db_session, source, sheets=["doors", "addons"])
+        assert set(report["tables"]) == {"doors"}
+        assert set(sync_service.load_sheet_checksums(db_session, source.source_id)) == {"doors"}
+
+    def test_file_imports_keep_their_own_checksums(self, db_session, tmp_path):
+        sync_google_sheets_to_db(db_session, gc=full_client())
+        google_state = sync_service.load_sheet_state(db_session)
+        write_csv(tmp_path, "doors", [{"code": "D1", "title": "Дверь", "price_rub": "17000"}])
+        source = CsvFolderSource(str(tmp_path))
+
+        sync_source_to_db(db_session, source, sheets=["doors"])
+
+        assert set(sync_service.load_sheet_checksums(db_session, source.source_id)) == {"doors"}
+        assert sync_service.load_sheet_state(db_session) == google_state
+        # The scheduler still sees the spreadsheet as checked at its current revision
+        gc = full_client()
+        assert sync_service.sync_changed_sheets(db_session, gc=gc)["sheets"] == []
+        assert gc.calls == ["open", "drive_files_get"]
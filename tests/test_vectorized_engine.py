@@ -0,0 +1,87 @@
+import sys
+import os
+import random
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.schemas import CalculateRequestSchema, ItogovayaStoimostSchema, CalculateResponseSchema
+from src.pricing_engine import PricingEngine
+from src.price_catalog import PriceCatalog
+from src.vectorized_engine import VectorizedPricingEngine
+from tests.test_pricing_engine import seed_database
+from tests.test_price_catalog import seed_windows
+
+
+def random_request(rnd: random.Random) -> CalculateRequestSchema:
+    return CalculateRequestSchema.model_validate({
+        "house": {"length_m": rnd.choice([5, 6, 7.5, 8, 12]), "width_m": rnd.choice([4, 6, 8])},
+        "ceiling": {
+            "type": rnd.choice(["flat", "rafters"]),
+            "height_m": rnd.choice([2.4, 2.5, 2.6, 2.7, 2.8, 3.0]),
+            "ridge_delta_cm": rnd.choice([None, 0, 10, 50]),
+        },
+        "roof": {"overhang_cm": rnd.choice(["std", "30", "40", "50"])},
+        "partitions": {
+            "enabled": rnd.random() < 0.5,
+            "type": rnd.choice([None, "none", "plain", "insul50", "insul100"]),
+            "run_m": rnd.choice([None, 0, 5, 12.5]),
+        },
+        "insulation": {
+            "brand": rnd.choice(["izobel", "neman_plus", "technonicol"]),
+            "mm": rnd.choice([100, 150, 200]),
+            "build_tech": rnd.choice(["panel", "frame"]),
+        },
+        "delivery": {"distance_km": rnd.choice([0, 100, 140, 300])},
+        "addons": [
+            {"code": rnd.choice(["ADDON_AREA", "ADDON_PERIMETER", "ADDON_COUNT", "ADDON_ROOF", "FAKE_ADDON"]), "quantity": rnd.randint(1, 4)}
+            for _ in range(rnd.randint(0, 4))
+        ],
+        "windows": [
+            {
+                "width_cm": rnd.choice([100, 120, 150]),
+                "height_cm": rnd.choice([100, 150]),
+                "type": "povorot_otkid",
+                "quantity": rnd.randint(1, 3),
+                "dual_chamber": rnd.random() < 0.5,
+                "laminated": rnd.random() < 0.5,
+            }
+            for _ in range(rnd.randint(0, 3))
+        ],
+        "commission_rub": rnd.choice([0, 30000]),
+    })
+
+
+@pytest.fixture
+def catalog(db_session):
+    seed_database(db_session)
+    seed_windows(db_session)
+    return PriceCatalog.load(db_session)
+
+
+class TestVectorizedPricingEngine:
+    def test_totals_match_scalar_engine(self, catalog):
+        rnd = random.Random(42)
+        reqs = [random_request(rnd) for _ in range(500)]
+        totals = VectorizedPricingEngine(catalog).calculate_totals(reqs)
+        scalar = PricingEngine()
+
+        for i, req in enumerate(reqs):
+            expected = scalar.calculate_total(catalog, req)
+            assert totals.item(i) == expected.Итоговая_стоимость
+            assert totals.base[i] == pytest.approx(expected.Конструктив.База_руб, abs=0.01)
+            assert totals.windows[i] == pytest.approx(expected.Окна_и_двери.Итого_по_разделу_руб, abs=0.01)
+
+    def test_details_only_when_asked(self, catalog):
+        rnd = random.Random(7)
+        reqs = [random_request(rnd) for _ in range(5)]
+        engine = VectorizedPricingEngine(catalog)
+
+        assert all(isinstance(item, ItogovayaStoimostSchema) for item in engine.calculate(reqs))
+        mixed = engine.calculate(reqs, detail_indices=[1, 3])
+        assert [isinstance(item, CalculateResponseSchema) for item in mixed] == [False, True, False, True, False]
+        assert mixed[1] == PricingEngine().calculate_total(catalog, reqs[1])
+
+    def test_empty_batch(self, catalog):
+        totals = VectorizedPricingEngine(catalog).calculate_totals([])
+        assert len(totals) == 0